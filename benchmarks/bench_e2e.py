@@ -0,0 +1,197 @@
+"""
+End-to-end benchmarks against the local fakes in benchmarks/fakes.py.
+
+    python benchmarks/bench_e2e.py [--scenario rename|jotform|all] [--files 200]
+        [--submissions 1000] [--latency-ms 20] [--throttle 0.02] [--errors 0.01]
+        [--file-kb 512] [--cuts 0.1] [--out results.jsonl]
+
+Scenarios
+  rename   the watch-folder flow after the dialog: upload to Downloads, then
+           provision the customer tree and move the file (Organizer)
+  jotform  one JotformPoller.poll_once() over N submissions, staging every
+           photo and PDF to SharePoint; --cuts drops that fraction of photo
+           downloads halfway, to exercise resume
+Each scenario runs in its own process with a throwaway home directory so peak
+RSS and the provisioning ledger are per scenario. Reports files/sec, p50/p95
+per item, requests by route and peak RSS; one JSON line per scenario is
+appended to --out.
+"""
+import argparse, json, os, platform, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "e2e.jsonl")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+
+
+def _configure(graph_url: str, jotform_url: str = "", forms=()):
+    from sloan.config import current_config, update_config
+
+    def f(c):
+        c["graph"].update({"base_url": graph_url, "drive_id": "bench"})
+        c["jotform"].update({"base_url": jotform_url, "api_key": "bench", "enabled": False,
+                             "stage_to_sharepoint": True, "cursors": {}})
+        for key, form_id in zip(("measure_sheet_form_id", "completion_form_id"), list(forms) + ["", ""]):
+            c["jotform"][key] = form_id
+        c["metrics"]["http_port"] = 0
+    update_config(f)
+    return current_config()
+
+
+def _summary(name: str, items: int, elapsed: float, per_item, servers, **extra):
+    from sloan.utils.metrics import percentile
+    reqs = {}
+    for label, srv in servers:
+        for route, n in sorted(srv.requests.items()):
+            reqs[f"{label} {route}"] = n
+    total = sum(reqs.values())
+    return {"scenario": name, "items": items, "elapsed_s": round(elapsed, 3),
+            "per_sec": round(items / elapsed, 2) if elapsed else None,
+            "p50_ms": round(percentile(per_item, 0.50) * 1000, 1) if per_item else None,
+            "p95_ms": round(percentile(per_item, 0.95) * 1000, 1) if per_item else None,
+            "requests_total": total, "requests_per_item": round(total / items, 2) if items else None,
+            "requests": reqs, "peak_rss_mb": peak_rss_mb(), **extra}
+
+
+def scenario_rename(args, faults):
+    from fakes import FakeGraph
+    from sloan.services.graph_client import GraphClient
+    from sloan.services.organizer import Organizer
+
+    payload = os.urandom(args.file_kb * 1024)
+    work = tempfile.mkdtemp(prefix="sloan-bench-")
+    customers = max(1, args.files // 10)   # ~10 files per customer, like a typical job
+    with FakeGraph(faults) as fg:
+        cfg = _configure(fg.base_url)
+        graph = GraphClient(cfg, token_provider=lambda: "bench")
+        org = Organizer(cfg, graph)
+        per_item = []
+        t0 = time.perf_counter()
+        for i in range(args.files):
+            name = f"Customer {i % customers:04d} InitialP {i:05d} 2026-01-01.jpg"
+            local = os.path.join(work, name)
+            with open(local, "wb") as f:
+                f.write(payload)
+            t = time.perf_counter()
+            dl = cfg["organizer"].get("downloads_folder_path", "/Downloads").strip("/")
+            up = graph.upload_small(f"{dl}/{name}", local)
+            org.move_uploaded_to_customer(up, f"Customer {i % customers:04d}", "InitialP")
+            per_item.append(time.perf_counter() - t)
+            os.remove(local)
+        elapsed = time.perf_counter() - t0
+        return _summary("rename", args.files, elapsed, per_item, [("graph", fg)],
+                        customers=customers, file_kb=args.file_kb)
+
+
+def scenario_jotform(args, faults):
+    import threading
+    from fakes import Faults, FakeGraph, FakeJotform
+    from sloan.services.graph_client import GraphClient
+    from sloan.services.jotform_poller import JotformPoller
+    from sloan.utils.metrics import STAGE_SECONDS
+
+    # Jotform's own faults are latency only: the poller has no retry policy of
+    # its own, so an injected 429 there aborts the round (reported, not hidden)
+    jf_faults = Faults(latency_ms=faults.latency_ms, jitter_ms=faults.jitter_ms)
+    forms = {"240678032902151": args.submissions}
+    with FakeGraph(faults) as fg, FakeJotform(jf_faults, forms=forms, file_bytes=args.file_kb * 1024,
+                                                      cut_rate=args.cuts) as fj:
+        cfg = _configure(fg.base_url, fj.base_url, forms=list(forms))
+        graph = GraphClient(cfg, token_provider=lambda: "bench")
+        poller = JotformPoller(cfg, graph, threading.Event(), log_fn=lambda *a, **k: None)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            poller.poll_once(cfg)
+        except Exception as ex:
+            error = repr(ex)
+        elapsed = time.perf_counter() - t0
+        per_item = STAGE_SECONDS.recent(stage="jf_submission")
+        files = len(fg.files_under(cfg["organizer"].get("downloads_folder_path", "/Downloads")))
+        return _summary("jotform", len(per_item), elapsed, per_item, [("graph", fg), ("jotform", fj)],
+                        files_staged=files, files_per_sec=round(files / elapsed, 2) if elapsed else None,
+                        error=error)
+
+
+SCENARIOS = {"rename": scenario_rename, "jotform": scenario_jotform}
+
+
+def _child(args):
+    from fakes import Faults
+    faults = Faults(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                    throttle_rate=args.throttle, error_rate=args.errors)
+    print(json.dumps(SCENARIOS[args.scenario](args, faults)))
+    from sloan.utils.log import flush
+    flush()
+
+
+def _print(res):
+    print(f"\n[{res['scenario']}] {res['items']} items in {res['elapsed_s']:.2f}s "
+          f"-> {res['per_sec']}/s  p50 {res['p50_ms']} ms  p95 {res['p95_ms']} ms  "
+          f"peak RSS {res['peak_rss_mb'] and round(res['peak_rss_mb'], 1)} MB")
+    if res.get("files_per_sec") is not None:
+        print(f"  files staged: {res['files_staged']} ({res['files_per_sec']}/s)")
+    if res.get("error"):
+        print(f"  aborted: {res['error']}")
+    print(f"  requests: {res['requests_total']} ({res['requests_per_item']} per item)")
+    for route, n in res["requests"].items():
+        print(f"    {route:<40} {n}")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--scenario", default="all", choices=["all"] + list(SCENARIOS))
+    p.add_argument("--files", type=int, default=200, help="files for the rename scenario")
+    p.add_argument("--submissions", type=int, default=1000)
+    p.add_argument("--file-kb", type=int, default=256)
+    p.add_argument("--latency-ms", type=float, default=0.0)
+    p.add_argument("--jitter-ms", type=float, default=0.0)
+    p.add_argument("--throttle", type=float, default=0.0, help="fraction of Graph requests answered 429")
+    p.add_argument("--errors", type=float, default=0.0, help="fraction of Graph requests answered 503")
+    p.add_argument("--cuts", type=float, default=0.0, help="fraction of Jotform file bodies cut off halfway")
+    p.add_argument("--out", default=DEFAULT_OUT)
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        return _child(args)
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    for name in names:
+        with tempfile.TemporaryDirectory(prefix="sloan-bench-home-") as home:
+            env = dict(os.environ)
+            env["PYTHONPATH"] = SRC + os.pathsep + env.get("PYTHONPATH", "")
+            env["HOME"] = env["USERPROFILE"] = home
+            argv = [a for a in sys.argv[1:]]
+            if "--scenario" in argv:
+                i = argv.index("--scenario")
+                del argv[i:i + 2]
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--scenario", name] + argv,
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"[{name}] failed:\n{proc.stderr}", file=sys.stderr)
+                continue
+            res = json.loads(proc.stdout.strip().splitlines()[-1])
+        res.update({"ts": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+                    "args": {k: v for k, v in vars(args).items() if k not in ("out", "child", "scenario")}})
+        _print(res)
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(res) + "\n")
+
+
+if __name__ == "__main__":
+    main()
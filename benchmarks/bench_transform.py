@@ -0,0 +1,157 @@
+"""
+Benchmark for the image transform stage (services/transform.py).
+
+    python benchmarks/bench_transform.py [--photos 24] [--mbps 20] [--workers 0]
+        [--max-px 2560] [--quality 82] [--out results.jsonl]
+
+Generates phone-sized JPEGs (4032x3024, ~6-10 MB, some with EXIF orientation
+6), then reports:
+  encode   transform time serial (1 worker) vs the pool, bytes in/out
+  e2e      upload of every photo to the fake Graph drive through a link capped
+           at --mbps (transfer.max_mbps), originals vs transformed, with
+           transforms overlapping uploads the way JotformPoller does it
+One JSON line per run is appended to --out. Needs Pillow.
+"""
+import argparse, json, os, platform, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "transform.jsonl")
+
+
+def make_photos(n: int, folder: str):
+    """Smooth gradients plus sensor-like noise, saved at q95 like a phone camera."""
+    import random
+    from PIL import Image, ImageFilter
+    paths = []
+    w, h = 4032, 3024
+    for i in range(n):
+        rnd = random.Random(i)
+        base = Image.new("RGB", (32, 24))
+        base.putdata([(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)) for _ in range(32 * 24)])
+        img = base.resize((w, h), Image.BICUBIC)
+        noise = Image.effect_noise((w, h), 24).convert("RGB")
+        img = Image.blend(img, noise, 0.18).filter(ImageFilter.DETAIL)
+        exif = Image.Exif()
+        exif[0x0110] = "Bench Phone"            # Model
+        if i % 3 == 0:
+            exif[0x0112] = 6                    # rotate 90 CW on display
+        p = os.path.join(folder, f"photo_{i:03d}.jpg")
+        img.save(p, "JPEG", quality=95, exif=exif.tobytes())
+        paths.append(p)
+    return paths
+
+
+def _check_orientation(src: str, out: str) -> bool:
+    """A photo tagged orientation 6 must come out portrait with no orientation tag."""
+    from PIL import Image
+    with Image.open(src) as a, Image.open(out) as b:
+        rotated = a.getexif().get(0x0112) == 6
+        portrait = b.height > b.width
+        return (portrait == rotated) and not b.getexif().get(0x0112) and b.getexif().get(0x0110) == "Bench Phone"
+
+
+def bench_encode(args, photos):
+    from sloan.services.transform import Transformer
+    res = {}
+    for label, workers in (("serial", 1), ("pool", args.workers)):
+        tr = Transformer({"transform": {"enabled": True, "workers": workers,
+                                        "rules": {"P": {"max_px": args.max_px, "quality": args.quality}}}})
+        tr.process(photos[0], "P")  # spawn the workers outside the timing
+        t0 = time.perf_counter()
+        outs = [tr.finish(p, f) for p, f in [(p, tr.submit(p, "P")) for p in photos]]
+        elapsed = time.perf_counter() - t0
+        size_in = sum(os.path.getsize(p) for p in photos)
+        size_out = sum(os.path.getsize(o) for o in outs)
+        res[label] = {"workers": tr.workers, "elapsed_s": round(elapsed, 3),
+                      "photos_per_s": round(len(photos) / elapsed, 2)}
+        res["bytes_in"], res["bytes_out"] = size_in, size_out
+        res["orientation_ok"] = all(_check_orientation(p, o) for p, o in zip(photos, outs) if o != p)
+        for p, o in zip(photos, outs):
+            tr.cleanup(p, o)
+        tr.shutdown()
+    res["saved_pct"] = round(100 * (1 - res["bytes_out"] / res["bytes_in"]), 1)
+    return res
+
+
+def bench_e2e(args, photos):
+    from fakes import FakeGraph
+    from bench_e2e import _configure
+    from sloan.config import current_config, update_config
+    from sloan.services.graph_client import GraphClient
+    from sloan.services.transform import Transformer
+
+    res = {}
+    with FakeGraph() as fg:
+        _configure(fg.base_url)
+
+        def f(c):
+            c["transfer"]["max_mbps"] = args.mbps
+        update_config(f)
+        cfg = current_config()
+        graph = GraphClient(cfg, token_provider=lambda: "bench")
+        for label, enabled in (("original", False), ("transformed", True)):
+            tr = Transformer({"transform": {"enabled": enabled, "workers": args.workers,
+                                            "rules": {"InitialP": {"max_px": args.max_px, "quality": args.quality}}}})
+            if enabled:
+                tr.process(photos[0], "InitialP")  # warm the pool
+            sent = 0
+            t0 = time.perf_counter()
+            staged = [(p, tr.submit(p, "InitialP")) for p in photos]
+            for i, (p, fut) in enumerate(staged):
+                src = tr.finish(p, fut)
+                graph.upload_small(f"Downloads/{label}/{i:03d}.jpg", src)
+                sent += os.path.getsize(src)
+                tr.cleanup(p, src)
+            elapsed = time.perf_counter() - t0
+            tr.shutdown()
+            res[label] = {"elapsed_s": round(elapsed, 2), "bytes_uploaded": sent,
+                          "photos_per_s": round(len(photos) / elapsed, 2)}
+    res["speedup"] = round(res["original"]["elapsed_s"] / res["transformed"]["elapsed_s"], 2)
+    return res
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--photos", type=int, default=24)
+    p.add_argument("--mbps", type=float, default=20.0, help="upload link for the e2e run (0 = unlimited)")
+    p.add_argument("--workers", type=int, default=0, help="pool size (0 = CPU count - 1)")
+    p.add_argument("--max-px", type=int, default=2560)
+    p.add_argument("--quality", type=int, default=82)
+    p.add_argument("--out", default=DEFAULT_OUT)
+    args = p.parse_args()
+
+    # throwaway home before sloan is imported: APP_DIR (config, transform scratch) lives there
+    home = tempfile.mkdtemp(prefix="sloan-bench-home-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    folder = os.path.join(home, "photos"); os.makedirs(folder)
+    t0 = time.perf_counter()
+    photos = make_photos(args.photos, folder)
+    print(f"Generated {len(photos)} photos ({sum(map(os.path.getsize, photos)) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    enc = bench_encode(args, photos)
+    print(f"[encode] {enc['bytes_in'] / 1e6:.1f} MB -> {enc['bytes_out'] / 1e6:.1f} MB "
+          f"({enc['saved_pct']}% saved), orientation ok: {enc['orientation_ok']}")
+    for label in ("serial", "pool"):
+        r = enc[label]
+        print(f"  {label:<7} {r['workers']:>2} workers  {r['elapsed_s']:.2f}s  {r['photos_per_s']} photos/s")
+
+    e2e = bench_e2e(args, photos)
+    print(f"[e2e @ {args.mbps:g} Mbps] speedup x{e2e['speedup']}")
+    for label in ("original", "transformed"):
+        r = e2e[label]
+        print(f"  {label:<12} {r['elapsed_s']:.2f}s  {r['bytes_uploaded'] / 1e6:.1f} MB  {r['photos_per_s']} photos/s")
+
+    res = {"ts": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+           "cpus": os.cpu_count(), "args": {k: v for k, v in vars(args).items() if k != "out"},
+           "encode": enc, "e2e": e2e}
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(res) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Watcher benchmark: the real FolderWatcher / CreatedModifiedHandler /
+_is_file_stable against generated workloads in a temp folder. No Qt, runs
+headless (inotify on Linux).
+
+    python benchmarks/bench_watcher.py [--scenario single|burst|slow|browser|office|all]
+        [--files 1000] [--burst-seconds 1] [--quiet 1.5] [--slow-mb 8] [--slow-seconds 6]
+        [--repeat 20] [--out results.jsonl]
+
+Scenarios
+  single   one file at a time (--repeat times): plain detection latency
+  burst    --files files written within --burst-seconds
+  slow     one --slow-mb file written in small chunks over --slow-seconds;
+           a callback before the last write is a premature trigger
+  browser  name.pdf.crdownload written in chunks, then renamed to name.pdf
+  office   Word-style save: ~$ owner file, ~WRL temp written and renamed over
+           the document; only the document should be reported
+For every scenario: time from "file complete" (last write closed or final
+rename) to on_file_ready, p50/p99; callbacks that were duplicates, missed,
+premature or for temp names; peak thread count; CPU seconds; peak RSS.
+Each scenario runs in its own process with a throwaway home directory; one
+JSON line per scenario is appended to --out.
+"""
+import argparse, json, os, platform, shutil, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "watcher.jsonl")
+
+
+def _rss_mb():
+    """Current RSS (Linux), for the before/after picture next to peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Run:
+    """Ground truth for one scenario and what the watcher reported."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expected = {}   # final path -> time.perf_counter() it was complete (None while writing)
+        self.calls = {}      # path -> [callback times]
+        self.peak_threads = threading.active_count()
+        self._stop = threading.Event()
+
+    def expect(self, path):
+        with self.lock:
+            self.expected[os.path.abspath(path)] = None
+
+    def complete(self, path):
+        with self.lock:
+            self.expected[os.path.abspath(path)] = time.perf_counter()
+
+    def on_file_ready(self, path):
+        t = time.perf_counter()
+        with self.lock:
+            self.calls.setdefault(os.path.abspath(path), []).append(t)
+
+    def sample_threads(self):
+        while not self._stop.wait(0.01):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def wait(self, timeout: float, settle: float):
+        """Until every expected file was reported (or timeout), then `settle` more seconds for duplicates."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if all(p in self.calls for p in self.expected):
+                    break
+            time.sleep(0.05)
+        time.sleep(settle)
+        self._stop.set()
+
+    def summary(self):
+        from sloan.utils.metrics import percentile
+        lat, premature, duplicates, missed = [], 0, 0, 0
+        with self.lock:
+            for path, done in self.expected.items():
+                calls = self.calls.get(path, [])
+                if not calls:
+                    missed += 1
+                    continue
+                duplicates += len(calls) - 1
+                if done is None or calls[0] < done:
+                    premature += 1
+                else:
+                    lat.append(calls[0] - done)
+            unexpected = sum(len(v) for p, v in self.calls.items() if p not in self.expected)
+        ms = lambda q: round(percentile(lat, q) * 1000, 1) if lat else None
+        return {"expected": len(self.expected), "ready": len(lat), "p50_ms": ms(0.50), "p99_ms": ms(0.99),
+                "max_ms": round(max(lat) * 1000, 1) if lat else None, "duplicates": duplicates, "missed": missed,
+                "premature": premature, "unexpected": unexpected, "peak_threads": self.peak_threads}
+
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _trickle(path, total: int, seconds: float, chunk: int = 64 * 1024):
+    """Append `total` bytes over `seconds` (flushing each chunk, like a slow copy or download)."""
+    n = max(1, total // chunk)
+    with open(path, "wb") as f:
+        for _ in range(n):
+            f.write(os.urandom(chunk))
+            f.flush()
+            time.sleep(seconds / n)
+
+
+def scenario_single(args, run, folder):
+    for i in range(args.repeat):
+        p = os.path.join(folder, f"Single {i:03d}.jpg")
+        run.expect(p)
+        _write(p, os.urandom(200 * 1024))
+        run.complete(p)
+        # wait for this one before the next, so each measurement stands alone
+        deadline = time.perf_counter() + args.quiet + 5
+        while p not in run.calls and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+
+def scenario_burst(args, run, folder):
+    payload = os.urandom(32 * 1024)
+    gap = args.burst_seconds / max(1, args.files)
+    t0 = time.perf_counter()
+    for i in range(args.files):
+        p = os.path.join(folder, f"Burst {i:05d}.jpg")
+        run.expect(p)
+        _write(p, payload)
+        run.complete(p)
+        lag = t0 + (i + 1) * gap - time.perf_counter()
+        if lag > 0:
+            time.sleep(lag)
+
+
+def scenario_slow(args, run, folder):
+    p = os.path.join(folder, "Slow copy.pdf")
+    run.expect(p)
+    _trickle(p, args.slow_mb * 1024 * 1024, args.slow_seconds)
+    run.complete(p)
+
+
+def scenario_browser(args, run, folder):
+    for i in range(max(1, args.repeat // 4)):
+        final = os.path.join(folder, f"Download {i:02d}.pdf")
+        run.expect(final)
+        part = final + ".crdownload"
+        _trickle(part, 2 * 1024 * 1024, 1.0)
+        os.replace(part, final)
+        run.complete(final)
+
+
+def scenario_office(args, run, folder):
+    for i in range(max(1, args.repeat // 4)):
+        doc = os.path.join(folder, f"Quote {i:02d}.docx")
+        owner = os.path.join(folder, f"~$uote {i:02d}.docx")
+        tmp = os.path.join(folder, f"~WRL{i:04d}.tmp")
+        _write(owner, b"\0" * 162)             # Word's owner file while the document is open
+        run.expect(doc)
+        _write(doc, os.urandom(40 * 1024))
+        time.sleep(0.2)
+        _write(tmp, os.urandom(48 * 1024))     # save: write a temp, swap it in
+        os.replace(tmp, doc)
+        run.complete(doc)
+        time.sleep(0.5)
+        os.remove(owner)                      # document closed
+
+
+SCENARIOS = {"single": scenario_single, "burst": scenario_burst, "slow": scenario_slow,
+             "browser": scenario_browser, "office": scenario_office}
+
+
+def _child(args):
+    import resource
+    from sloan.watcher import FolderWatcher
+
+    folder = tempfile.mkdtemp(prefix="sloan-watch-")
+    run = Run()
+    rss_start = _rss_mb()
+    watcher = FolderWatcher({"watch_folder": folder, "watch": {"quiet_seconds": args.quiet}}, run.on_file_ready)
+    watcher.start()
+    time.sleep(0.2)  # let the observer thread settle before the first write
+    threading.Thread(target=run.sample_threads, daemon=True).start()
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    SCENARIOS[args.scenario](args, run, folder)
+    write_s = time.perf_counter() - t0
+    # the stability check gives up after checks * delay (~2.4 s); leave room for a long queue
+    run.wait(timeout=args.quiet + 30, settle=3.0)
+    elapsed, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    watcher.stop()
+    shutil.rmtree(folder, ignore_errors=True)
+    res = {"scenario": args.scenario, "write_s": round(write_s, 2), "elapsed_s": round(elapsed, 2),
+           "cpu_s": round(cpu, 2), "cpu_pct": round(100 * cpu / elapsed, 1), **run.summary(),
+           "rss_start_mb": rss_start and round(rss_start, 1),
+           "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    print(json.dumps(res))
+
+
+def _print(res):
+    print(f"\n[{res['scenario']}] {res['ready']}/{res['expected']} ready  p50 {res['p50_ms']} ms  "
+          f"p99 {res['p99_ms']} ms  max {res['max_ms']} ms")
+    print(f"  duplicates {res['duplicates']}  missed {res['missed']}  premature {res['premature']}  "
+          f"temp/unexpected {res['unexpected']}")
+    print(f"  peak threads {res['peak_threads']}  CPU {res['cpu_s']}s ({res['cpu_pct']}% of {res['elapsed_s']}s)  "
+          f"RSS {res['rss_start_mb']} -> peak {res['peak_rss_mb']} MB")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    p.add_argument("--scenario", default="all", choices=["all"] + list(SCENARIOS))
+    p.add_argument("--files", type=int, default=1000, help="files in the burst scenario")
+    p.add_argument("--burst-seconds", type=float, default=1.0)
+    p.add_argument("--quiet", type=float, default=1.5, help="watch.quiet_seconds")
+    p.add_argument("--slow-mb", type=int, default=8)
+    p.add_argument("--slow-seconds", type=float, default=6.0)
+    p.add_argument("--repeat", type=int, default=20, help="files in the single scenario (browser/office: a quarter)")
+    p.add_argument("--out", default=DEFAULT_OUT)
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.child:
+        return _child(args)
+    if not sys.platform.startswith("linux"):
+        print("note: peak RSS and thread sampling are tuned for Linux", file=sys.stderr)
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    for name in names:
+        with tempfile.TemporaryDirectory(prefix="sloan-bench-home-") as home:
+            env = dict(os.environ)
+            env["PYTHONPATH"] = SRC + os.pathsep + env.get("PYTHONPATH", "")
+            env["HOME"] = env["USERPROFILE"] = home
+            argv = [a for a in sys.argv[1:]]
+            if "--scenario" in argv:
+                i = argv.index("--scenario")
+                del argv[i:i + 2]
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--scenario", name] + argv,
+                                  env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"[{name}] failed:\n{proc.stderr}", file=sys.stderr)
+                continue
+            res = json.loads(proc.stdout.strip().splitlines()[-1])
+        res.update({"ts": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(),
+                    "args": {k: v for k, v in vars(args).items() if k not in ("out", "child", "scenario")}})
+        _print(res)
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(res) + "\n")
+
+
+if __name__ == "__main__":
+    main()
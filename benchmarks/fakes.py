@@ -0,0 +1,447 @@
+"""
+Local stand-ins for the Microsoft Graph drive API and the Jotform API, just
+enough of each for GraphClient, Organizer and JotformPoller:
+
+  Graph   GET    /v1.0/drives/{d}/root:/{path}                 item by path
+          GET    .../root/children, .../root:/{path}:/children, .../items/{id}/children  ($top + nextLink)
+          POST   ...children                                   create folder (conflictBehavior fail -> 409)
+          GET    .../items/{id}:/{name}                        child by name
+          PUT    .../root:/{path}:/content, .../items/{id}:/{name}:/content   (If-Match)
+          GET    .../root:/{path}:/content                     small files PUT above
+          POST   ...:/createUploadSession  +  PUT/DELETE /upload/{sid}
+          PATCH  .../items/{id}                                move / rename
+          DELETE .../items/{id}                                delete (file or empty folder)
+  Jotform GET    /form/{id}/submissions?limit&offset           ascending ids
+          GET    /submission/{sid}/pdf
+          GET    /files/{sid}/{name}                          Range / If-Range; cut_rate drops bodies halfway
+
+Both servers take a Faults object (latency, 429/503 injection) and count every
+request by route so a benchmark can report calls per file. JSON GETs carry an
+ETag and answer If-None-Match with 304 (etags=False turns that off). Stdlib only.
+"""
+import hashlib, json, random, re, threading, time, uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0        # added to every response
+    jitter_ms: float = 0.0         # uniform 0..jitter on top
+    throttle_rate: float = 0.0     # fraction of requests answered 429
+    error_rate: float = 0.0        # fraction answered 503
+    retry_after: int = 0           # Retry-After seconds sent with 429
+
+    def delay(self):
+        d = self.latency_ms + random.random() * self.jitter_ms
+        if d > 0:
+            time.sleep(d / 1000.0)
+
+    def inject(self) -> Optional[int]:
+        r = random.random()
+        if r < self.throttle_rate:
+            return 429
+        if r < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+
+class _Server:
+    """ThreadingHTTPServer on an ephemeral localhost port, run on a daemon thread."""
+    handler_cls = BaseHTTPRequestHandler
+
+    def __init__(self, faults: Optional[Faults] = None, etags: bool = True):
+        self.faults = faults or Faults()
+        self.etags = etags
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        owner = self
+
+        class _H(self.handler_cls):
+            server_owner = owner
+            protocol_version = "HTTP/1.1"
+            # one write per response and no Nagle, or keep-alive adds ~40 ms per call
+            wbufsize = 64 * 1024
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _H)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True,
+                                        name=f"fake-{type(self).__name__}")
+
+    def count(self, route: str):
+        with self._lock:
+            self.requests[route] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_owner: "_Server"
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status: int, payload=None, raw: Optional[bytes] = None, headers: Optional[Dict] = None):
+        body = raw if raw is not None else (json.dumps(payload).encode("utf-8") if payload is not None else b"")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        owner = self.server_owner
+        owner.faults.delay()
+        status = owner.faults.inject()
+        if status:
+            self._body()
+            owner.count(f"{method} {status}")
+            self._send(status, {"error": {"code": "injected"}},
+                       headers={"Retry-After": str(owner.faults.retry_after)} if status == 429 else None)
+            return
+        parts = urlsplit(self.path)
+        route, result = owner.handle(method, unquote(parts.path), parse_qs(parts.query), self.headers, self._body())
+        if owner.etags and method == "GET" and result[0] == 200 and len(result) == 2:
+            etag = '"%s"' % hashlib.sha1(json.dumps(result[1], sort_keys=True).encode("utf-8")).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                owner.count(f"{method} {route} 304")
+                self._send(304, headers={"ETag": etag})
+                return
+            result = (200, result[1], None, {"ETag": etag})
+        owner.count(f"{method} {route}")
+        self._send(*result)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+# -------------------- Graph --------------------
+class FakeGraph(_Server):
+    handler_cls = _Handler
+
+    def __init__(self, faults: Optional[Faults] = None, drive_id: str = "bench", page_size: int = 200,
+                 etags: bool = True):
+        self.drive_id = drive_id
+        self.max_page = page_size
+        self.items: Dict[str, Dict] = {"root": {"id": "root", "name": "root", "parent": None, "folder": {}}}
+        self.children: Dict[str, Dict[str, str]] = {"root": {}}   # parent id -> {lower name: id}
+        self.sessions: Dict[str, Dict] = {}
+        self._tree = threading.Lock()
+        super().__init__(faults, etags)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1.0"
+
+    # ---- drive model ----
+    def _path_of(self, item_id: str) -> str:
+        names = []
+        node = self.items[item_id]
+        while node["parent"]:
+            node = self.items[node["parent"]]
+            names.append(node["name"])
+        names = [n for n in reversed(names) if n != "root"]
+        return "/drive/root:" + ("/" + "/".join(names) if names else "")
+
+    def _public(self, item_id: str) -> Dict:
+        it = self.items[item_id]
+        out = {"id": it["id"], "name": it["name"], "parentReference": {"id": it["parent"], "path": self._path_of(item_id)}}
+        if "folder" in it:
+            out["folder"] = {"childCount": len(self.children.get(item_id, {}))}
+        else:
+            out["file"] = {}
+            out["size"] = it["size"]
+            out["eTag"] = it.get("etag", "")
+        return out
+
+    def _resolve(self, rel: str) -> Optional[str]:
+        cur = "root"
+        for seg in [s for s in rel.split("/") if s]:
+            cur = self.children.get(cur, {}).get(seg.lower())
+            if cur is None:
+                return None
+        return cur
+
+    def _unique(self, parent: str, name: str) -> str:
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            stem, ext = name, ""
+        n = 1
+        while name.lower() in self.children[parent]:
+            name = f"{stem} {n}" + (f".{ext}" if ext else "")
+            n += 1
+        return name
+
+    def _add(self, parent: str, name: str, conflict: str, if_match: Optional[str] = None, **fields):
+        """Create a child; returns (status, item id) honouring conflictBehavior and If-Match."""
+        with self._tree:
+            existing = self.children[parent].get(name.lower())
+            if if_match and if_match != "*" and (not existing or self.items[existing].get("etag") != if_match):
+                return 412, existing
+            if existing:
+                if conflict == "fail":
+                    return 409, existing
+                if conflict == "rename":
+                    name = self._unique(parent, name)
+                elif conflict == "replace":
+                    self.items[existing].update(fields)
+                    return 200, existing
+            iid = uuid.uuid4().hex
+            self.items[iid] = {"id": iid, "name": name, "parent": parent, **fields}
+            self.children[parent][name.lower()] = iid
+            if "folder" in fields:
+                self.children[iid] = {}
+            return 201, iid
+
+    # ---- routing ----
+    def handle(self, method, path, query, headers, body):
+        if path.startswith("/upload/"):
+            return self._upload_chunk(method, path.split("/")[2], headers, body)
+        m = re.match(r"^/v1\.0/drives/[^/]+/(.*)$", path)
+        if not m:
+            return "unknown", (404, {"error": {"code": "itemNotFound"}})
+        rest = m.group(1)
+        # normalise every addressing form to (item id, suffix)
+        if rest.startswith("root:/"):
+            inner = rest[len("root:/"):]
+            rel, _, suffix = inner.partition(":")
+            return self._on_path(method, rel, suffix, query, body, headers)
+        if rest == "root" or rest.startswith("root/"):
+            return self._on_item(method, "root", rest[len("root"):], query, body)
+        m = re.match(r"^items/([^/:]+)(.*)$", rest)
+        if m:
+            iid, suffix = m.groups()
+            if suffix.startswith(":/"):
+                name, _, suffix = suffix[2:].partition(":")
+                return self._on_child_name(method, iid, name, suffix, query, body)
+            return self._on_item(method, iid, suffix, query, body)
+        return "unknown", (404, {"error": {"code": "itemNotFound"}})
+
+    def _on_path(self, method, rel, suffix, query, body, headers=None):
+        parent_rel, _, name = rel.rstrip("/").rpartition("/")
+        if suffix in ("/content", "/createUploadSession"):
+            parent = self._resolve(parent_rel)
+            if parent is None:
+                return "root:/path", (404, {"error": {"code": "itemNotFound"}})
+            return self._on_child_name(method, parent, name, suffix, query, body, headers)
+        iid = self._resolve(rel)
+        if iid is None:
+            return "root:/path", (404, {"error": {"code": "itemNotFound"}})
+        return self._on_item(method, iid, suffix, query, body, route="root:/path")
+
+    def _on_child_name(self, method, parent, name, suffix, query, body, headers=None):
+        if parent not in self.children:
+            return "items/child", (404, {"error": {"code": "itemNotFound"}})
+        conflict = (query.get("@microsoft.graph.conflictBehavior") or ["replace"])[0]
+        if method == "PUT" and suffix == "/content":
+            # small bodies are kept so they can be read back (lease documents)
+            content = body if len(body) <= 64 * 1024 else None
+            status, iid = self._add(parent, name, conflict, (headers or {}).get("If-Match"), file=True,
+                                    size=len(body), content=content, etag='"%s"' % uuid.uuid4().hex)
+            if status == 409:
+                return "content", (409, {"error": {"code": "nameAlreadyExists"}})
+            if status == 412:
+                return "content", (412, {"error": {"code": "notAllowed", "message": "ETag does not match"}})
+            return "content", (status, self._public(iid))
+        if method == "GET" and suffix == "/content":
+            iid = self.children[parent].get(name.lower())
+            if iid is None or self.items[iid].get("content") is None:
+                return "content", (404, {"error": {"code": "itemNotFound"}})
+            return "content", (200, None, self.items[iid]["content"], {"ETag": self.items[iid]["etag"]})
+        if method == "POST" and suffix == "/createUploadSession":
+            req = json.loads(body or b"{}")
+            conflict = (req.get("item") or {}).get("@microsoft.graph.conflictBehavior", "replace")
+            sid = uuid.uuid4().hex
+            self.sessions[sid] = {"parent": parent, "name": name, "conflict": conflict, "received": 0}
+            return "createUploadSession", (200, {"uploadUrl": f"http://127.0.0.1:{self.port}/upload/{sid}"})
+        if method == "GET" and not suffix:
+            iid = self.children[parent].get(name.lower())
+            return "items/child", ((200, self._public(iid)) if iid else (404, {"error": {"code": "itemNotFound"}}))
+        return "items/child", (400, {"error": {"code": "invalidRequest"}})
+
+    def _on_item(self, method, iid, suffix, query, body, route="items"):
+        if iid not in self.items:
+            return route, (404, {"error": {"code": "itemNotFound"}})
+        if suffix == "/children" and method == "GET":
+            return "children", (200, self._page(iid, query))
+        if suffix == "/children" and method == "POST":
+            req = json.loads(body or b"{}")
+            status, cid = self._add(iid, req["name"], req.get("@microsoft.graph.conflictBehavior", "rename"), folder={})
+            if status == 409:
+                return "children", (409, {"error": {"code": "nameAlreadyExists"}})
+            return "children", (201, self._public(cid))
+        if method == "GET" and not suffix:
+            return route, (200, self._public(iid))
+        if method == "PATCH" and not suffix:
+            req = json.loads(body or b"{}")
+            with self._tree:
+                it = self.items[iid]
+                new_parent = (req.get("parentReference") or {}).get("id", it["parent"])
+                new_name = req.get("name") or it["name"]
+                if new_parent not in self.children:
+                    return "PATCH items", (400, {"error": {"code": "invalidRequest"}})
+                clash = self.children[new_parent].get(new_name.lower())
+                if clash and clash != iid:
+                    return "PATCH items", (409, {"error": {"code": "nameAlreadyExists"}})
+                del self.children[it["parent"]][it["name"].lower()]
+                it["parent"], it["name"] = new_parent, new_name
+                self.children[new_parent][new_name.lower()] = iid
+            return "items", (200, self._public(iid))
+        if method == "DELETE" and not suffix:
+            with self._tree:
+                it = self.items.pop(iid)
+                del self.children[it["parent"]][it["name"].lower()]
+                self.children.pop(iid, None)
+            return "items", (204, None)
+        return route, (400, {"error": {"code": "invalidRequest"}})
+
+    def _page(self, iid: str, query) -> Dict:
+        top = min(int((query.get("$top") or [self.max_page])[0]), self.max_page)
+        skip = int((query.get("$skip") or [0])[0])
+        ids = sorted(self.children[iid].values())
+        out = {"value": [self._public(c) for c in ids[skip:skip + top]]}
+        if skip + top < len(ids):
+            out["@odata.nextLink"] = (f"{self.base_url}/drives/{self.drive_id}/items/{iid}/children"
+                                      f"?$top={top}&$skip={skip + top}")
+        return out
+
+    def _upload_chunk(self, method, sid, headers, body):
+        sess = self.sessions.get(sid)
+        if sess is None:
+            return "upload", (404, {"error": {"code": "itemNotFound"}})
+        if method == "DELETE":
+            self.sessions.pop(sid, None)
+            return "upload", (204, None)
+        m = re.match(r"bytes (\d+)-(\d+)/(\d+)", headers.get("Content-Range") or "")
+        if not m or int(m.group(1)) != sess["received"]:
+            return "upload", (416, {"error": {"code": "invalidRange"}})
+        start, end, total = map(int, m.groups())
+        sess["received"] = end + 1
+        if sess["received"] < total:
+            return "upload", (202, {"nextExpectedRanges": [f"{sess['received']}-"]})
+        self.sessions.pop(sid, None)
+        status, iid = self._add(sess["parent"], sess["name"], sess["conflict"], file=True, size=total)
+        if status == 409:
+            return "upload", (409, {"error": {"code": "nameAlreadyExists"}})
+        return "upload", (201, self._public(iid))
+
+    # ---- inspection ----
+    def files_under(self, rel: str) -> List[str]:
+        iid = self._resolve(rel)
+        return sorted(self.items[c]["name"] for c in self.children.get(iid, {}).values()) if iid else []
+
+
+# -------------------- Jotform --------------------
+class _CuttingHandler(_Handler):
+    def _send(self, status: int, payload=None, raw: Optional[bytes] = None, headers: Optional[Dict] = None):
+        if not (headers or {}).pop("X-Fake-Cut", None):
+            return super()._send(status, payload, raw, headers)
+        # announce the whole body, send half of it, hang up
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw[:len(raw) // 2])
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeJotform(_Server):
+    handler_cls = _CuttingHandler
+
+    def __init__(self, faults: Optional[Faults] = None, forms: Optional[Dict[str, int]] = None,
+                 files_per_submission: int = 2, file_bytes: int = 256 * 1024, pdf_bytes: int = 64 * 1024,
+                 etags: bool = True, ranges: bool = True, cut_rate: float = 0.0):
+        """forms maps form id -> number of submissions to serve. cut_rate: fraction of file bodies cut off."""
+        self.forms = forms or {}
+        self.files_per_submission = files_per_submission
+        self.file_bytes = file_bytes
+        self.ranges = ranges
+        self.cut_rate = cut_rate
+        self.pdf_bytes = pdf_bytes
+        self._blob = random.Random(7).randbytes(max(file_bytes, pdf_bytes)) if hasattr(random.Random, "randbytes") \
+            else bytes(random.Random(7).getrandbits(8) for _ in range(max(file_bytes, pdf_bytes)))
+        super().__init__(faults, etags)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _submission(self, form_id: str, n: int) -> Dict:
+        sid = f"{form_id[-6:]}{n:09d}"   # fixed width so string order == numeric order
+        files = [{"name": f"photo_{i}.jpg", "url": f"{self.base_url}/files/{sid}/photo_{i}.jpg"}
+                 for i in range(1, self.files_per_submission + 1)]
+        return {"id": sid, "form_id": form_id, "created_at": f"2026-01-01 00:00:{n % 60:02d}",
+                "answers": {"3": {"type": "control_fullname", "text": "Name",
+                                  "answer": {"first": "Cust", "last": f"{n:05d}"}},
+                            "7": {"type": "control_fileupload", "text": "Photos", "answer": files}}}
+
+    def _file(self, headers, data: bytes):
+        etag = '"file-%d"' % len(data)
+        out = {"ETag": etag, "Accept-Ranges": "bytes"} if self.ranges else {}
+        m = re.match(r"bytes=(\d+)-(\d*)$", headers.get("Range") or "")
+        if m and self.ranges and headers.get("If-Range", etag) == etag:
+            start = int(m.group(1))
+            end = min(len(data), int(m.group(2)) + 1) if m.group(2) else len(data)
+            if start >= len(data):
+                return 416, None, b"", {"Content-Range": f"bytes */{len(data)}"}
+            out["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+            status, data = 206, data[start:end]
+        else:
+            status = 200
+        if random.random() < self.cut_rate:
+            out["X-Fake-Cut"] = "1"
+        return status, None, data, out
+
+    def handle(self, method, path, query, headers, body):
+        m = re.match(r"^/form/([^/]+)/submissions$", path)
+        if m and method == "GET":
+            form_id = m.group(1)
+            total = self.forms.get(form_id, 0)
+            limit = int((query.get("limit") or [20])[0])
+            offset = int((query.get("offset") or [0])[0])
+            content = [self._submission(form_id, n) for n in range(offset, min(total, offset + limit))]
+            return "submissions", (200, {"responseCode": 200, "content": content,
+                                         "resultSet": {"offset": offset, "limit": limit, "count": len(content)}})
+        if re.match(r"^/submission/[^/]+/pdf$", path):
+            return "pdf", (200, None, self._blob[:self.pdf_bytes])
+        if path.startswith("/files/"):
+            return "files", self._file(headers, self._blob[:self.file_bytes])
+        return "unknown", (404, {"responseCode": 404, "message": "Not found"})
@@ -0,0 +1,100 @@
+"""
+Startup benchmark for the tray app.
+
+    python benchmarks/startup.py [--runs 5] [--out results.jsonl]
+
+Reports:
+  * -X importtime breakdown for `import sloan.app` (and `import sloan.cli`, the
+    path a forwarded "Edit with Sloan" launch takes), top modules by cumulative time
+  * time-to-tray / time-to-services-ready for a real `python -m sloan` launch,
+    using SLOAN_STARTUP_PROBE and a throwaway home directory
+Each run appends one JSON line to --out so results can be tracked over time.
+"""
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+
+def _env(home: str):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC + os.pathsep + env.get("PYTHONPATH", "")
+    env["HOME"] = env["USERPROFILE"] = home  # own config, lock and log; never talks to a running instance
+    if sys.platform.startswith("linux") and not env.get("DISPLAY"):
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def _seed_config(home: str):
+    # no network during the benchmark: Jotform off, metrics endpoint off
+    code = ("from sloan.config import update_config\n"
+            "def f(c):\n"
+            "    c['jotform']['enabled'] = False\n"
+            "    c['metrics']['http_port'] = 0\n"
+            "update_config(f)\n")
+    subprocess.run([sys.executable, "-c", code], env=_env(home), check=True)
+
+
+def import_breakdown(module: str, home: str, top: int):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          env=_env(home), capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cum_us, name = [p.strip() for p in line.replace("import time:", "|").split("|")]
+        rows.append((int(cum_us), int(self_us), name.strip()))
+    total = next((c for c, _, n in rows if n == module), 0)
+    rows.sort(reverse=True)
+    return total / 1e6, [{"module": n, "cumulative_s": c / 1e6, "self_s": s / 1e6} for c, s, n in rows[:top]]
+
+
+def time_to_tray(home: str, timeout: float = 60):
+    probe = os.path.join(home, "probe.json")
+    if os.path.exists(probe):
+        os.remove(probe)
+    env = _env(home)
+    env["SLOAN_STARTUP_PROBE"] = probe
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "sloan"], env=env, timeout=timeout,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.perf_counter() - t0
+    with open(probe, encoding="utf-8") as f:
+        out = json.load(f)
+    out["process_wall_s"] = wall
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "startup.jsonl"))
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sloan-bench-") as home:
+        _seed_config(home)
+        app_total, app_top = import_breakdown("sloan.app", home, args.top)
+        cli_total, _ = import_breakdown("sloan.cli", home, args.top)
+        runs = [time_to_tray(home) for _ in range(args.runs)]
+
+    print(f"import sloan.app: {app_total * 1000:.1f} ms    import sloan.cli: {cli_total * 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for r in app_top:
+        print(f"{r['cumulative_s'] * 1000:14.1f} {r['self_s'] * 1000:9.1f}  {r['module']}")
+    med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+    print(f"time to tray   (median of {len(runs)}): {med['time_to_tray_s'] * 1000:.1f} ms")
+    print(f"time to ready  (median of {len(runs)}): {med['time_to_ready_s'] * 1000:.1f} ms")
+    print(f"process wall   (median of {len(runs)}): {med['process_wall_s'] * 1000:.1f} ms")
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "ts": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+            "import_app_s": app_total, "import_cli_s": cli_total, "median": med, "runs": runs,
+            "top_imports": app_top,
+        }) + "\n")
+
+
+if __name__ == "__main__":
+    main()
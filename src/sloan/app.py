@@ -1,50 +1,62 @@
-import os, sys, time, threading, traceback
+import itertools, json, os, sys, time
+from collections import deque
 
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject
+from PyQt5.QtCore import QTimer, pyqtSignal, QObject
 from PyQt5.QtWidgets import QApplication, QDialog, QMessageBox
+from PyQt5.QtGui import QIcon
 
-from .config import load_config
+from .config import current_config, get_store, load_config
 from .tray import Tray
-from .gui.rename_dialog import RenameDialog
-from .gui.settings_dialog import SettingsDialog
-from .services.graph_client import GraphClient
-from .services.organizer import Organizer
-from .services.jotform_poller import JotformPoller
-from watchdog.observers import Observer
-from .utils.log import log
-from .watcher import CreatedModifiedHandler
-import argparse
-import ctypes, os
-from PyQt5.QtGui import QIcon
+from .ipc import InstanceServer
+from .services.history import item_fields, shared_history
+from .utils.log import get_logger
+from .utils.metrics import QUEUE_DEPTH, STAGE_SECONDS, format_summary, observe_stage
+from .utils.profiling import CProfileSession, SamplingProfiler, profile_from_env
 from .utils.resource_path import resource_path
+from .worker import (Abandon, FileReady, Profile, ProfileSaved, Ready, Reload, Speculate, Status, Upload,
+                     UploadDone, WorkerDown, WorkerSupervisor)
+
+# Only the tray and the event loop are on the startup path; dialogs are imported
+# where they are first used. Graph/MSAL, the Jotform poller, watchdog and the
+# transform pool live in the worker process (see worker.py).
 
-print("[SLOAN] app.py loaded"); log("app.py loaded")
+_log = get_logger("app")
 
 
 class Controller(QObject):
     file_detected = pyqtSignal(str)
     open_config = pyqtSignal()
+    open_history = pyqtSignal()
+    open_requested = pyqtSignal(object)  # list of paths forwarded by another launch
+    config_changed = pyqtSignal(object, object)  # (ConfigSnapshot, changed paths)
+    worker_event = pyqtSignal(object)  # messages from the worker process (worker.py)
+    profile_done = pyqtSignal(str)  # path of the written profile
 
 class SloanApp:
-    def __init__(self):
-        self.cfg = load_config()
+    def __init__(self, open_paths=None, instance_lock=None, started=None):
+        self.t_start = started if started is not None else time.perf_counter()
+        self.cfg = current_config()
+        self.open_paths = list(open_paths or [])
+        self.instance_lock = instance_lock
+        self.rename_queue = deque()  # paths waiting for the Rename dialog, shown one at a time
+        self._dialog_active = False
         self.started_at = time.time()
         self.seen_paths = set()  # files we’ve already handled
-        self.baseline = set()
-        watch = self.cfg.get("watch_folder")
-        if os.path.isdir(watch):
-            # Snapshot existing files at startup so we ignore them
-            self.baseline = {os.path.abspath(os.path.join(watch, n))
-                             for n in os.listdir(watch)
-                             if os.path.isfile(os.path.join(watch, n))}
+        self._detected_at = {}   # abspath -> time.time() the watcher reported it ready
+        self._jobs = {}          # job id -> (original path, Upload, accept time) until the worker answers
+        self._job_ids = itertools.count(1)
+        self._worker_status = None
+        self._first_ready = True
 
         self.controller = Controller()
         self.app = QApplication(sys.argv)
         # (Windows) set an explicit AppUserModelID so taskbar/pin uses our icon
-        try:
-            ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("SloanSuite.Sloan")  # any stable string
-        except Exception:
-            pass
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("SloanSuite.Sloan")  # any stable string
+            except Exception:
+                pass
 
         # Set application icon (used for taskbar if there’s a top-level window)
         icon_path = resource_path("assets/icon.ico")
@@ -52,56 +64,146 @@ class SloanApp:
         self.app_icon_path = icon_path  # stash for dialogs/tray
 
         self.app.setQuitOnLastWindowClosed(False)
-        self.tray = Tray(self.app, self.controller)
-        self.graph = GraphClient(self.cfg)
-        self.organizer = Organizer(self.cfg, self.graph)
-        self.stop_evt = threading.Event()
-
-        # Jotform thread
-        self.jf_stop = threading.Event()
-        self.jf_thread = JotformPoller(self.cfg, self.graph, self.jf_stop, log_fn=lambda m: print(m))
-        self.jf_thread.start()
-
-        # Watcher
-        self.observer = Observer()
-        q = float(self.cfg.get("watch", {}).get("quiet_seconds", 1.5))
-        handler = CreatedModifiedHandler(self.on_file_ready, quiet_seconds=q)
-        watch = self.cfg.get("watch_folder")
-        log(f"Starting Qt loop. Watching: {watch}")
-        os.makedirs(watch, exist_ok=True)
-        self.observer.schedule(handler, watch, recursive=False)
-        self.observer.start()
+        self.tray = Tray(self.app, self.controller, status_fn=self.pipeline_status,
+                         profile_fn=self.start_profile)
+        self.time_to_tray = time.perf_counter() - self.t_start
+        _log.info("Tray ready", time_to_tray_ms=round(self.time_to_tray * 1000, 1))
 
         # Signals
-        self.controller.file_detected.connect(self.show_rename_dialog)
+        self.controller.file_detected.connect(lambda p: self.enqueue_rename([p]))
+        self.controller.open_requested.connect(self.enqueue_rename)
         self.controller.open_config.connect(self.show_settings)
+        self.controller.open_history.connect(self.show_history)
+        self.controller.worker_event.connect(self._on_worker_event)
+        self.controller.profile_done.connect(lambda path: self.tray.notify("Profile saved", path))
+        # Config changes can be noticed on any thread; hop to the Qt thread before applying
+        self.controller.config_changed.connect(self._apply_config)
+        get_store().subscribe(self.controller.config_changed.emit)
+
+        # Later "Edit with Sloan" launches hand their paths to us instead of starting a new app
+        self.instance_server = None
+        if self.instance_lock is not None:
+            try:
+                self.instance_server = InstanceServer(self.controller.open_requested.emit)
+                self.instance_server.start()
+            except Exception as ex:
+                _log.warning(f"Single-instance listener not started: {ex}")
 
         self.sweep_timer = QTimer(); self.sweep_timer.timeout.connect(self.sweep_watch_folder)
         self.sweep_timer.start(60000)
+        # Pick up hand edits to config.json (one stat() per tick)
+        self.config_timer = QTimer(); self.config_timer.timeout.connect(current_config)
+        self.config_timer.start(5000)
+
+        self._profiling = False
+        self.history_dlg = None
+        # the worker is spawned from the supervisor thread; the tray is already up
+        self.worker = WorkerSupervisor(self.controller.worker_event.emit, started_at=self.started_at)
+        self.worker.start()
+
+        env_profile = profile_from_env()
+        if env_profile:
+            self.start_profile(*env_profile)
+
+    def _on_worker_event(self, ev):
+        if isinstance(ev, FileReady):
+            self.on_file_ready(ev.path, ev.t_detected)
+        elif isinstance(ev, UploadDone):
+            self._on_upload_done(ev)
+        elif isinstance(ev, Status):
+            self._worker_status = ev
+        elif isinstance(ev, Ready):
+            self._on_worker_ready(ev)
+        elif isinstance(ev, ProfileSaved):
+            self.tray.notify("Profile saved (worker)", ev.path)
+        elif isinstance(ev, WorkerDown):
+            self._worker_status = None
+            _log.warning("Worker process exited", exitcode=ev.exitcode, restart_in=ev.restart_in)
+
+    def _on_worker_ready(self, ev: Ready):
+        _log.info("Worker ready", pid=ev.pid, services_ms=round(ev.services_s * 1000, 1),
+                  restarts=self.worker.restarts)
+        if not self._first_ready:
+            self.tray.notify("Sloan", "The background worker was restarted.")
+            return
+        self._first_ready = False
+        probe = os.environ.get("SLOAN_STARTUP_PROBE")
+        if probe:
+            # startup benchmark: record timings and exit (see benchmarks/startup.py)
+            with open(probe, "w", encoding="utf-8") as f:
+                json.dump({"time_to_tray_s": self.time_to_tray,
+                           "services_s": ev.services_s,
+                           "time_to_ready_s": time.perf_counter() - self.t_start}, f)
+            self.app.quit()
 
     def show_settings(self):
+        from .gui.settings_dialog import SettingsDialog
         dlg = SettingsDialog(load_config())
         # set settings window icon
         icon = QIcon(self.app_icon_path) if getattr(self, "app_icon_path", "") else QApplication.instance().windowIcon()
         if not icon.isNull():
             dlg.setWindowIcon(icon)
 
-        if dlg.exec_() == QDialog.Accepted:
-            self.cfg = load_config()
-            try:
-                self.observer.stop();
-                self.observer.join(2)
-            except Exception:
-                pass
-            self.observer = Observer()
-            self.observer.schedule(CreatedModifiedHandler(self.on_file_ready), self.cfg.get("watch_folder"),
-                                   recursive=False)
-            self.observer.start()
+        # Saving publishes the new config to _apply_config; nothing to restart here
+        dlg.exec_()
+
+    def show_history(self):
+        history = shared_history(self.cfg)
+        if history is None:
+            QMessageBox.information(None, "History", "History is turned off (history.enabled in config.json).")
+            return
+        if self.history_dlg is None:
+            from .gui.history_dialog import HistoryDialog
+            self.history_dlg = HistoryDialog(history)
+            self.history_dlg.setWindowIcon(QIcon(self.app_icon_path))
+        # modeless, so a lookup doesn't block the rename queue
+        self.history_dlg.refresh()
+        self.history_dlg.show(); self.history_dlg.raise_(); self.history_dlg.activateWindow()
+
+    def enqueue_rename(self, paths):
+        """Queue files for the Rename dialog. Dialogs are modal, so they are shown one after another."""
+        for p in paths:
+            p = os.path.abspath(p)
+            if not os.path.exists(p):
+                _log.warning(f"--open path NOT FOUND: {p}")
+                continue
+            if p not in self.rename_queue:
+                self.rename_queue.append(p)
+        QUEUE_DEPTH.set(len(self.rename_queue), queue="rename")
+        self._prefetch_previews()
+        if not self._dialog_active:
+            self._drain_rename_queue()
+
+    def _prefetch_previews(self):
+        """Decode thumbnails for the next few queued files while the operator works on this one."""
+        from .gui.preview import shared_loader
+        loader = shared_loader(self.cfg)
+        if loader is not None:
+            n = int(self.cfg.get("preview", {}).get("prefetch", 3))
+            loader.prefetch(list(self.rename_queue)[:n])
+
+    def _drain_rename_queue(self):
+        self._dialog_active = True
+        try:
+            while self.rename_queue:
+                path = self.rename_queue.popleft()
+                QUEUE_DEPTH.set(len(self.rename_queue), queue="rename")
+                self.seen_paths.add(path)
+                self._prefetch_previews()
+                self.show_rename_dialog(path)
+        finally:
+            self._dialog_active = False
 
     def show_rename_dialog(self, file_path: str):
-        print(f"[SLOAN] show_rename_dialog({file_path})")
+        _log.info(f"show_rename_dialog({file_path})")
+        t_open = time.monotonic()
+        t_detected = self._detected_at.pop(os.path.abspath(file_path), time.time())
+        job = next(self._job_ids)
+        speculating = False
         try:
-            dlg = RenameDialog(file_path, load_config())
+            from .gui.rename_dialog import RenameDialog
+            dlg = RenameDialog(file_path, current_config())
+            speculating = self._speculate(job, file_path, dlg.parse_customer_from_original())
 
             # set rename window icon
             icon = QIcon(self.app_icon_path) if getattr(self, "app_icon_path",
@@ -111,37 +213,96 @@ class SloanApp:
 
             dlg.show()  # ensure visible
             if dlg.exec_() == QDialog.Accepted:
+                t_accept = time.monotonic()
+                observe_stage("dialog", t_accept - t_open)
                 renamed = dlg.file_path
                 self.seen_paths.add(os.path.abspath(renamed))
                 customer = dlg.parse_customer_from_original()
-                from .naming import Namer
                 kw_text = dlg.keyword_cb.currentText()
-                kw_acr = Namer(load_config()).keyword_acronym(kw_text)
-                dl = self.cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")
-                up = self.graph.upload_small(f"{dl}/{os.path.basename(renamed)}", renamed)
-                self.organizer.move_uploaded_to_customer(up, customer, kw_acr)
+                kw_acr = dlg.namer.keyword_acronym(kw_text)
+                # the worker uploads and moves it; the next dialog can open right away
+                msg = Upload(job, renamed, customer, kw_acr, t_detected=t_detected, t_accept=time.time())
+                self._jobs[job] = (file_path, msg, t_accept)
+                self.worker.send(msg)
+                speculating = False  # the worker commits (or drops) it with the upload
         except Exception as ex:
+            _log.exception(f"Rename failed for {file_path}: {ex}")
             QMessageBox.critical(None, "Error", str(ex))
+        finally:
+            if speculating:  # cancelled, or the dialog itself failed
+                self.worker.send(Abandon(job))
 
-    def _on_settings_saved(self):
-        self.cfg = load_config()
-        try:
-            self.observer.stop();
-            self.observer.join(2)
-        except Exception:
-            pass
-        self.observer = Observer()
-        self.observer.schedule(CreatedModifiedHandler(self.on_file_ready), self.cfg.get("watch_folder"),
-                               recursive=False)
-        self.observer.start()
-
-    def on_file_ready(self, path: str):
-        print(f"[SLOAN] on_file_ready received: {path}")
+    def _speculate(self, job: int, file_path: str, customer: str) -> bool:
+        """Have the worker look up folders and upload while the operator is still choosing."""
+        if not self.worker.ready or not (self.cfg.get("speculation", {}) or {}).get("enabled", True):
+            return False
+        return self.worker.send(Speculate(job, file_path, customer))
+
+    def _on_upload_done(self, ev: UploadDone):
+        entry = self._jobs.pop(ev.job, None)
+        if entry is None:
+            return
+        file_path, msg, t_accept = entry
+        if ev.error:
+            self._record(file_path, "error", t_accept, local_path=msg.path, detail=ev.error)
+            QMessageBox.critical(None, "Upload failed", f"{os.path.basename(msg.path)}\n\n{ev.error}")
+            return
+        self._record(file_path, "ok", t_accept, customer=msg.customer, keyword=msg.keyword_acr,
+                     local_path=msg.path, **item_fields(ev.item))
+
+    def _record(self, file_path: str, outcome: str, t_accept: float, **fields):
+        history = shared_history(self.cfg)
+        if history is not None:
+            history.record("upload", outcome, source="tray", orig_name=os.path.basename(file_path),
+                           duration_ms=(time.monotonic() - t_accept) * 1000, **fields)
+
+    def _apply_config(self, cfg, changed):
+        self.cfg = cfg
+        _log.info(f"Config v{cfg.version} changed", changed=sorted(changed))
+        self.worker.send(Reload())  # its components apply the same diff in place
+        from .gui.preview import shared_loader
+        loader = shared_loader(cfg)
+        if loader is not None:
+            loader.reconfigure(cfg, changed)
+
+    def on_file_ready(self, path: str, t_detected: float):
+        _log.info(f"on_file_ready received: {path}")
         if self._should_process(path):
             self.seen_paths.add(os.path.abspath(path))
-            self.controller.file_detected.emit(path)
-            print("[SLOAN] Emitting file_detected")
-
+            self._detected_at[os.path.abspath(path)] = t_detected
+            self.enqueue_rename([path])
+
+
+    def pipeline_status(self):
+        """Tray summary: last-hour throughput and p50/p95 for the upload path and Jotform."""
+        st = self._worker_status
+        summary = list(st.summary) if st is not None else ["Worker starting…"]
+        stages = list(st.stages) if st is not None else []
+        # the dialog and thumbnail stages are timed here, in the Qt process
+        for labels in sorted(STAGE_SECONDS.label_sets(), key=lambda l: l.get("stage", "")):
+            if set(labels) == {"stage"}:
+                stages.append(format_summary(labels["stage"], labels["stage"]))
+        return summary, sorted(stages)
+
+    def start_profile(self, mode: str, seconds: float):
+        """Tray (Shift) / SLOAN_PROFILE: sample every thread of both processes, or cProfile the Qt thread."""
+        if self._profiling:
+            _log.info("Profile already running; ignoring request")
+            return
+        self._profiling = True
+
+        def done(path):
+            self._profiling = False
+            self.controller.profile_done.emit(path)
+
+        if mode == "cprofile":
+            # cProfile only sees the thread that enables it, so this covers Qt work only
+            session = CProfileSession()
+            session.start()
+            QTimer.singleShot(int(seconds * 1000), lambda: done(session.stop()))
+        else:
+            SamplingProfiler(seconds, on_done=done).start()
+            self.worker.send(Profile(seconds))  # answers with its own ProfileSaved
 
     def sweep_watch_folder(self):
         try:
@@ -169,39 +330,29 @@ class SloanApp:
         except Exception:
             pass
 
-    def run(self):
-        parser = argparse.ArgumentParser(add_help=False)
-        parser.add_argument("--open", dest="open_path", help="Open Rename dialog for this file path")
-        args, _ = parser.parse_known_args()
-
+    def run(self) -> int:
         watch = self.cfg.get("watch_folder")
-        print(f"[SLOAN] Starting Qt loop. Watching: {watch}")
+        _log.info(f"Starting Qt loop. Watching: {watch}")
 
-        if args.open_path:
-            path = os.path.abspath(args.open_path)
-            print(f"[SLOAN] --open requested: {path}")
-            if os.path.exists(path):
-                QTimer.singleShot(0, lambda: self.show_rename_dialog(path))
-            else:
-                print(f"[SLOAN] --open path NOT FOUND: {path}")
+        if self.open_paths:
+            _log.info(f"--open requested: {self.open_paths}")
+            QTimer.singleShot(0, lambda: self.enqueue_rename(self.open_paths))
 
-        sys.exit(self.app.exec_())
+        return self.app.exec_()
 
     def shutdown(self):
-        self.stop_evt.set()
+        if self.instance_server is not None:
+            self.instance_server.stop()
+        if self.instance_lock is not None:
+            self.instance_lock.release()
         try:
-            self.observer.stop(); self.observer.join(2)
-            self.jf_stop.set()
-            self.jf_thread.join(timeout=5)
+            self.worker.stop(drain_seconds=float(self.cfg.get("worker", {}).get("drain_seconds", 30)))
         except Exception:
             pass
 
     def _should_process(self, path: str) -> bool:
         path = os.path.abspath(path)
-        # Ignore files that existed when the app started (baseline)
-        if not self.cfg.get("watch", {}).get("process_existing_on_start", False):
-            if path in self.baseline:
-                return False
+        # (files that existed when the app started are filtered by the worker)
         # Don't re-process the same path in this session
         if path in self.seen_paths:
             return False
@@ -209,11 +360,8 @@ class SloanApp:
 
 
 def main():
-    app = SloanApp()
-    try:
-        app.run()
-    finally:
-        app.shutdown()
+    from .cli import main as cli_main
+    sys.exit(cli_main())
 
 
 if __name__ == "__main__":
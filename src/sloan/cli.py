@@ -0,0 +1,227 @@
+import time
+_T0 = time.perf_counter()  # startup reference for time-to-tray
+
+import argparse, sys
+from typing import List, Optional
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="sloan-suite", description="Sloan Windows & Construction suite")
+    p.add_argument("--open", dest="open_paths", action="append", default=[], metavar="PATH",
+                   help="Open the Rename dialog for this file (repeatable)")
+    sub = p.add_subparsers(dest="command")
+
+    org = sub.add_parser("organize", help="Re-organize files already in SharePoint into customer folders")
+    org.add_argument("--source", action="append", default=[], metavar="DRIVE_PATH",
+                     help="Folder to scan (repeatable; default: organizer.downloads_folder_path)")
+    org.add_argument("--recursive", action="store_true", help="Also scan sub-folders (e.g. old customer trees)")
+    org.add_argument("--apply", action="store_true", help="Execute the plan (default is a dry run)")
+    org.add_argument("--workers", type=int, default=16)
+    org.add_argument("--rate", type=float, default=20.0, help="Max move requests per second (0 = unlimited)")
+    org.add_argument("--resume", action="store_true",
+                     help="Skip items an interrupted earlier run over the same sources already moved")
+    org.add_argument("--checkpoint", default=None,
+                     help="Checkpoint file to resume from and record into (implies --resume; kept afterwards)")
+    org.add_argument("--plan-out", default=None, help="Write the full plan as JSON")
+    org.add_argument("-v", "--verbose", action="store_true", help="List every planned move")
+
+    srv = sub.add_parser("serve", help="Run the watch folder and Jotform ingestion without the tray (no GUI)")
+    srv.add_argument("--workers", type=int, default=4, help="Concurrent uploads for auto-routed files")
+    srv.add_argument("--drain-seconds", type=float, default=60.0,
+                     help="How long to let in-flight uploads finish on SIGINT/SIGTERM")
+
+    imp = sub.add_parser("import", help="Upload a local folder of files into customer folders")
+    imp.add_argument("directory", help="Local folder to import (layout: <Customer>/<Keyword>/...)")
+    imp.add_argument("--mapping", default=None, metavar="JSON",
+                     help='Mapping file: {"defaults": {...}, "rules": [{"match": "glob", "customer": ...}]}')
+    imp.add_argument("--customer", default="", help="Customer for every file (overrides path/mapping)")
+    imp.add_argument("--keyword", default="", help="Keyword name or acronym for every file")
+    imp.add_argument("--side", default="", choices=["", "Interior", "Exterior"])
+    imp.add_argument("--location", default="", help="Location for pictures")
+    imp.add_argument("--brand", default="", help="Brand for quotes")
+    imp.add_argument("--workers", type=int, default=8)
+    imp.add_argument("--manifest", default=None,
+                     help="Resumable manifest (default: <directory>/.sloan-import.jsonl)")
+    imp.add_argument("--dry-run", action="store_true", help="Show what would be uploaded and exit")
+    imp.add_argument("-v", "--verbose", action="store_true", help="List every file and its new name")
+
+    his = sub.add_parser("history", help="Look up what happened to a file (renames, uploads, moves)")
+    his.add_argument("query", nargs="*", help="Words from the file name, customer or keyword")
+    his.add_argument("--customer", default="", help="Customer name prefix")
+    his.add_argument("--item", default="", metavar="ITEM_ID", help="SharePoint drive item id")
+    his.add_argument("--kind", default="", choices=["", "rename", "upload", "move", "import", "jotform"])
+    his.add_argument("--since", default=None, metavar="YYYY-MM-DD")
+    his.add_argument("--until", default=None, metavar="YYYY-MM-DD", help="Exclusive")
+    his.add_argument("--limit", type=int, default=50)
+    his.add_argument("--json", action="store_true", help="One JSON object per line")
+    return p
+
+
+def run_gui(open_paths: List[str]) -> int:
+    # Keep this path import-light: a second launch only needs ipc to hand off.
+    from .ipc import InstanceLock, forward
+    lock = InstanceLock()
+    if not lock.acquire():
+        if open_paths and not forward(open_paths):
+            print("Sloan Suite is running but did not accept the file.", file=sys.stderr)
+            return 1
+        return 0
+
+    from .app import SloanApp
+    app = SloanApp(open_paths=open_paths, instance_lock=lock, started=_T0)
+    try:
+        return app.run()
+    finally:
+        app.shutdown()
+
+
+def run_organize(args) -> int:
+    from .config import current_config
+    from .services.backfill import Backfill, Checkpoint, checkpoint_path, write_plan
+    from .services.graph_client import GraphClient
+    from .services.organizer import Organizer
+
+    cfg = current_config()
+    graph = GraphClient(cfg)
+    bf = Backfill(cfg, graph, Organizer(cfg, graph), workers=args.workers, rate=args.rate)
+    sources = args.source or [cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")]
+
+    t0 = time.monotonic()
+    plan = bf.plan(sources, recursive=args.recursive)
+    groups = plan.by_customer()
+    print(f"Scanned {plan.scanned} files in {time.monotonic() - t0:.1f}s: {len(plan.moves)} to move "
+          f"for {len(groups)} customers, {plan.in_place} already in place, {len(plan.unclassified)} unclassified")
+    for customer, ops in groups.items():
+        print(f"  {customer}: {len(ops)}")
+        if args.verbose:
+            for op in ops:
+                print(f"    {op.src_path}/{op.name}  ->  {op.dest_path}")
+    if args.plan_out:
+        write_plan(plan, args.plan_out)
+        print(f"Plan written to {args.plan_out}")
+    if not args.apply:
+        print("Dry run: nothing moved. Re-run with --apply to execute.")
+        return 0
+
+    def progress(p):
+        rate = p["done"] / p["elapsed"] if p["elapsed"] else 0
+        print(f"  {p['done']}/{p['total']}  moved={p['moved']} failed={p['failed']} "
+              f"conflict={p['conflict']}  {rate:.1f}/s", flush=True)
+
+    root = cfg.get("organizer", {}).get("customer_root_path", "/Customers")
+    checkpoint = Checkpoint(args.checkpoint or checkpoint_path(sources, root, args.recursive))
+    if not (args.resume or args.checkpoint):
+        checkpoint.clear()  # a fresh run; it still records, so --resume can pick it up
+    stats = bf.execute(plan, checkpoint, progress=progress)
+    print(f"Moved {stats['moved']} ({stats['skipped_resume']} already done earlier), "
+          f"{stats['conflict']} name conflicts, {stats['failed']} failed in {stats['elapsed_s']:.1f}s "
+          f"({stats['per_sec']:.1f}/s)")
+    if stats["failed"]:
+        print("Re-run with --resume to skip what this run already moved.")
+    elif not args.checkpoint:
+        checkpoint.clear()  # finished: nothing to resume
+    return 0 if not stats["failed"] else 2
+
+
+def run_import(args) -> int:
+    import json, os
+    from .config import current_config
+    from .services.bulk_import import MANIFEST_NAME, BulkImporter, Classifier, Manifest, scan
+    from .services.graph_client import GraphClient
+    from .services.organizer import Organizer
+
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 1
+    mapping = None
+    if args.mapping:
+        with open(args.mapping, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+
+    cfg = current_config()
+    graph = GraphClient(cfg)
+    imp = BulkImporter(cfg, graph, Organizer(cfg, graph), workers=args.workers)
+    classifier = Classifier(cfg, args.directory, mapping, overrides={
+        "customer": args.customer, "keyword": args.keyword, "side": args.side,
+        "location": args.location, "brand": args.brand})
+
+    t0 = time.monotonic()
+    scanned = [classifier.classify(it) for it in scan(args.directory)]
+    items = imp.plan(scanned)
+    unclassified = [it.src for it in scanned if not it.customer or not it.keyword]
+    total = sum(it.size for it in items)
+    customers = sorted({it.customer for it in items})
+    print(f"Scanned {len(scanned)} files in {time.monotonic() - t0:.1f}s: {len(items)} to import "
+          f"({total / 1e6:.1f} MB) for {len(customers)} customers, {len(unclassified)} unclassified")
+    if args.verbose:
+        for it in items:
+            print(f"  {os.path.relpath(it.src, args.directory)}  ->  {it.customer}: {it.name}")
+        for src in unclassified:
+            print(f"  ? {os.path.relpath(src, args.directory)}")
+    if args.dry_run:
+        print("Dry run: nothing uploaded.")
+        return 0
+
+    def progress(p):
+        rate = p["uploaded"] / p["elapsed"] if p["elapsed"] else 0
+        print(f"  {p['done']}/{p['total']}  uploaded={p['uploaded']} skipped={p['skipped']} "
+              f"failed={p['failed']}  {rate:.1f} files/s", flush=True)
+
+    manifest = Manifest(args.manifest or os.path.join(args.directory, MANIFEST_NAME))
+    stats = imp.run(items, manifest, progress=progress)
+    print(f"Uploaded {stats['uploaded']} ({stats['skipped']} already imported), {stats['failed']} failed "
+          f"in {stats['elapsed_s']:.1f}s ({stats['files_per_s']:.1f} files/s, {stats['mb_per_s']:.1f} MB/s). "
+          f"Manifest: {manifest.path}")
+    return 0 if not stats["failed"] else 2
+
+
+def run_history(args) -> int:
+    import json
+    from datetime import datetime
+    from .config import current_config
+    from .services.history import shared_history
+
+    history = shared_history(current_config())
+    if history is None:
+        print("History is turned off (history.enabled in config.json).", file=sys.stderr)
+        return 1
+    try:
+        since = datetime.strptime(args.since, "%Y-%m-%d").timestamp() if args.since else None
+        until = datetime.strptime(args.until, "%Y-%m-%d").timestamp() if args.until else None
+    except ValueError as ex:
+        print(f"Bad date: {ex}", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    rows = history.search(" ".join(args.query), customer=args.customer, item_id=args.item, kind=args.kind,
+                          since=since, until=until, limit=args.limit)
+    ms = (time.perf_counter() - t0) * 1000
+    for r in rows:
+        if args.json:
+            print(json.dumps(r, ensure_ascii=False))
+            continue
+        when = datetime.fromtimestamp(r["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+        where = r["dest_path"] or r["local_path"] or ""
+        print(f"{when}  {r['kind']:<7} {r['outcome']:<8} {r['customer'] or '-'}: "
+              f"{r['orig_name'] or ''} -> {r['new_name'] or ''}  {where}")
+        if r["item_id"] or r["detail"]:
+            print(f"{'':21}{r['item_id'] or ''}  {r['detail'] or ''}".rstrip())
+    if not args.json:
+        print(f"{len(rows)} result(s) in {ms:.1f} ms")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import multiprocessing
+    multiprocessing.freeze_support()  # frozen Windows build: let transform pool workers start
+    args, _ = _build_parser().parse_known_args(argv)
+    if args.command == "organize":
+        return run_organize(args)
+    if args.command == "import":
+        return run_import(args)
+    if args.command == "history":
+        return run_history(args)
+    if args.command == "serve":
+        from .headless import serve
+        return serve(workers=args.workers, drain_seconds=args.drain_seconds)
+    return run_gui(args.open_paths)
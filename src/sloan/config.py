@@ -1,5 +1,9 @@
-import json, os, pathlib
-from typing import Any, Dict
+import hashlib, json, os, pathlib, threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .utils.fileio import atomic_write_text
 
 APP_DIR = os.path.join(pathlib.Path.home(), ".sloan_suite")
 CONFIG_PATH = os.path.join(APP_DIR, "config.json")
@@ -9,6 +13,7 @@ CONFIG_SCHEMA_VERSION = 2
 DEFAULT_CONFIG: Dict[str, Any] = {
     "watch_folder": os.path.join(pathlib.Path.home(), "Downloads"),
     "date_format": DATE_FMT_DEFAULT,
+    "date_source": "today",            # today | capture (EXIF DateTimeOriginal / PDF CreationDate, else today)
     "schema_version": CONFIG_SCHEMA_VERSION,
     "filename_template": "{customer} {keyword} {detail} {extra} {date}",
     "keywords": [
@@ -47,6 +52,7 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "root_library_name": "Documents",
         "downloads_folder_path": "/Downloads",
         "customer_root_path": "/Customers",
+        "provision_workers": 6,   # sibling folders created concurrently per tree level
         "create_default_tree": [
             "/Initial/Pictures", "/Initial/Quotes",
             "/Final/Pictures", "/Final/Quotes",
@@ -81,12 +87,74 @@ DEFAULT_CONFIG: Dict[str, Any] = {
          },
     },
 
+    "coordination": {
+        "enabled": False,              # PCs sharing the same forms take turns through leases
+        "backend": "sharepoint",       # sharepoint | file
+        "sharepoint_folder": "/Sloan Suite/Leases",
+        "file_folder": "",             # shared directory for backend "file"; "" = ~/.sloan_suite/leases
+        "ttl_seconds": 90,             # a silent holder's lease is taken over after this
+        "max_forms": 0,                # leases one PC holds at a time (1 spreads two forms over two PCs); 0 = no cap
+        "shards": 1,                   # split each form's submissions by id over this many leases
+    },
+    "downloads": {
+        "segments": 4,                 # ranges of one large Jotform attachment fetched at once
+        "parallel_min_mb": 32,         # smaller files come down in a single stream
+        "retries": 5,                  # consecutive failures without progress before the round gives up
+        "keep_days": 7,                # unfinished parts in ~/.sloan_suite/downloads
+    },
+
     "watch": {
         "process_existing_on_start": False,
         "sweep_enabled": False,
         "sweep_age_seconds": 120,
         "quiet_seconds": 1.5   # how long size must stay unchanged before we process
     },
+    "metrics": {
+        "http_port": 0,                # Prometheus text on 127.0.0.1 (e.g. 9464); 0 = off
+        "file_interval_seconds": 60,   # snapshot cadence for ~/.sloan_suite/metrics.jsonl
+    },
+    "serve": {
+        "after_upload": "keep",        # keep | delete | archive (move to <watch folder>/Uploaded)
+    },
+    "transfer": {
+        "max_mbps": 0,                 # upload budget shared by all lanes; 0 = unlimited
+        "weights": {"interactive": 8, "ingest": 2, "backfill": 1},
+        # per-lane caps by time of day, e.g.
+        # {"start": "07:00", "end": "19:00", "max_mbps": {"ingest": 10, "backfill": 2}}
+        "windows": [],
+    },
+    "http_cache": {
+        "enabled": True,               # revalidate metadata GETs with ETag / Last-Modified
+        "memory_entries": 256,
+        "disk_mb": 50,                 # ~/.sloan_suite/http-cache
+    },
+    "transform": {
+        "enabled": False,              # needs Pillow (pip install sloan-suite[images])
+        "workers": 0,                  # encoder processes; 0 = CPU count - 1
+        # per keyword acronym; keywords without a rule upload as-is. JPEG only.
+        "rules": {
+            "InitialP": {"max_px": 2560, "quality": 82},
+            "FinalP":   {"max_px": 2560, "quality": 82},
+        },
+    },
+    "preview": {
+        "enabled": True,               # thumbnail in the Rename dialog (PDFs need PyMuPDF)
+        "size_px": 320,
+        "memory_entries": 64,
+        "disk_mb": 100,                # ~/.sloan_suite/previews
+        "prefetch": 3,                 # queued files decoded ahead of their dialog
+    },
+    "worker": {
+        "drain_seconds": 30,           # on exit, let the worker process finish in-flight uploads
+    },
+    "speculation": {
+        "enabled": True,               # provision + upload while the Rename dialog is open
+        "upload": True,                # upload under a temporary name, then one move on accept
+        "max_upload_mb": 100,
+    },
+    "history": {
+        "enabled": True,               # renames/uploads/moves in ~/.sloan_suite/history.db
+    },
 
 
 }
@@ -96,48 +164,236 @@ def ensure_app_dirs() -> None:
     os.makedirs(APP_DIR, exist_ok=True)
 
 
-def _deep_merge_missing(dst, src):
-    # fill only missing keys in dst from src; never overwrite explicit user values
-    if isinstance(dst, dict) and isinstance(src, dict):
-        for k, v in src.items():
-            if k not in dst:
-                dst[k] = v
-            else:
-                dst[k] = _deep_merge_missing(dst[k], v)
-        return dst
-    return dst
+def _merge_defaults(dst: Dict[str, Any], src: Dict[str, Any]) -> bool:
+    # fill only missing keys in dst from src; never overwrite explicit user values.
+    # Returns True if anything was added.
+    changed = False
+    for k, v in src.items():
+        if k not in dst:
+            dst[k] = json.loads(json.dumps(v))
+            changed = True
+        elif isinstance(dst[k], dict) and isinstance(v, dict):
+            changed = _merge_defaults(dst[k], v) or changed
+    return changed
 
 
-def load_config() -> Dict[str, Any]:
-    ensure_app_dirs()
-    if not os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            json.dump(DEFAULT_CONFIG, f, indent=2)
-        return json.loads(json.dumps(DEFAULT_CONFIG))
+def _freeze(v):
+    if isinstance(v, dict):
+        return MappingProxyType({k: _freeze(x) for k, x in v.items()})
+    if isinstance(v, list):
+        return tuple(_freeze(x) for x in v)
+    return v
+
+
+def thaw(v):
+    """Deep, mutable (dict/list) copy of a snapshot or any part of one."""
+    if isinstance(v, Mapping):
+        return {k: thaw(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [thaw(x) for x in v]
+    return v
+
+
+def config_diff(old: Mapping, new: Mapping, prefix: str = "") -> Set[str]:
+    """Dotted paths that differ between two configs, e.g. {"watch_folder", "jotform.poll_seconds"}.
+    Lists are compared as whole values."""
+    out: Set[str] = set()
+    for k in set(old) | set(new):
+        path = f"{prefix}{k}"
+        a, b = old.get(k), new.get(k)
+        if isinstance(a, Mapping) and isinstance(b, Mapping):
+            out |= config_diff(a, b, path + ".")
+        elif thaw(a) != thaw(b):
+            out.add(path)
+    return out
+
+
+def touches(changed: Set[str], *prefixes: str) -> bool:
+    """True if any changed path equals or lies under one of `prefixes`."""
+    return any(c == p or c.startswith(p + ".") for c in changed for p in prefixes)
+
+
+class ConfigSnapshot(Mapping):
+    """
+    Read-only view of config.json at one point in time. Nested dicts are
+    mapping proxies and lists are tuples, so a snapshot can be shared between
+    threads freely. `version` goes up every time the content changes; use it
+    to key caches derived from config.
+    """
+    __slots__ = ("_data", "version")
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        self._data = _freeze(data)
+        self.version = version
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
 
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        cfg = json.load(f)
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"<ConfigSnapshot v{self.version}>"
+
+    def thaw(self) -> Dict[str, Any]:
+        return thaw(self._data)
+
+
+class ConfigStore:
+    """
+    Process-wide cache of config.json.
+    snapshot() costs one os.stat() when nothing changed; the file is re-read only
+    when its mtime/size moves, and re-parsed only when its content hash differs.
+    Writes go through a temp file + rename under a lock.
+    Subscribers get (snapshot, changed_paths) whenever a new version appears,
+    on the thread that noticed the change.
+    """
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._snap: Optional[ConfigSnapshot] = None
+        self._stamp: Optional[Tuple[int, int]] = None  # (mtime_ns, size) of the file behind _snap
+        self._digest: Optional[str] = None
+        self._version = 0
+        self._listeners: List[Callable[[ConfigSnapshot, Set[str]], None]] = []
+
+    def subscribe(self, listener: Callable[[ConfigSnapshot, Set[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener) -> None:
+        try: self._listeners.remove(listener)
+        except ValueError: pass
+
+    def _publish(self, before: Optional[ConfigSnapshot], snap: ConfigSnapshot) -> None:
+        # called outside the store lock so listeners may read/write config themselves
+        if before is None or snap is before:
+            return
+        changed = config_diff(before, snap)
+        if not changed:
+            return
+        for fn in list(self._listeners):
+            try:
+                fn(snap, changed)
+            except Exception:
+                pass
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot(self) -> ConfigSnapshot:
+        snap = self._snap
+        if snap is not None and self._stat() == self._stamp:
+            return snap
+        with self._lock:
+            before = self._snap
+            if before is not None and self._stat() == self._stamp:
+                return before
+            snap = self._reload()
+        self._publish(before, snap)
+        return snap
+
+    def _reload(self) -> ConfigSnapshot:
+        if not os.path.exists(self.path):
+            return self._write(json.loads(json.dumps(DEFAULT_CONFIG)))
+
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        stamp = self._stat()
+        digest = hashlib.sha1(raw).hexdigest()
+        if self._snap is not None and digest == self._digest:
+            self._stamp = stamp  # touched, not changed
+            return self._snap
+        try:
+            cfg = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            if self._snap is None:
+                raise
+            # keep serving the last good config until the file is fixed
+            self._stamp = stamp
+            return self._snap
+
+        # migrate: fill in any newly added defaults; bump schema_version
+        migrated = _merge_defaults(cfg, DEFAULT_CONFIG)
+        if cfg.get("schema_version") != CONFIG_SCHEMA_VERSION:
+            cfg["schema_version"] = CONFIG_SCHEMA_VERSION
+            migrated = True
+        if migrated:
+            return self._write(cfg)  # persist merged/migrated config
+        return self._install(cfg, digest, stamp)
+
+    def _write(self, cfg: Dict[str, Any]) -> ConfigSnapshot:
+        ensure_app_dirs()
+        text = json.dumps(cfg, indent=2)
+        atomic_write_text(self.path, text)
+        return self._install(cfg, hashlib.sha1(text.encode("utf-8")).hexdigest(), self._stat())
+
+    def _install(self, cfg: Dict[str, Any], digest: str, stamp) -> ConfigSnapshot:
+        if self._snap is None or digest != self._digest:
+            self._version += 1
+            self._snap = ConfigSnapshot(cfg, self._version)
+            self._digest = digest
+        self._stamp = stamp
+        return self._snap
+
+    def save(self, cfg: Mapping) -> ConfigSnapshot:
+        with self._lock:
+            before = self._snap
+            snap = self._write(thaw(cfg))
+        self._publish(before, snap)
+        return snap
+
+    def update(self, mutate: Callable[[Dict[str, Any]], None]) -> ConfigSnapshot:
+        """Read-modify-write under the store lock: mutate(cfg) edits a fresh mutable copy."""
+        with self._lock:
+            before = self._snap
+            # not snapshot(): it would publish a hand edit of config.json while the lock is held
+            current = before if before is not None and self._stat() == self._stamp else self._reload()
+            cfg = current.thaw()
+            mutate(cfg)
+            snap = self._write(cfg)
+        self._publish(before, current)  # the hand edit, if one was picked up on the way in
+        self._publish(current, snap)
+        return snap
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ConfigStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConfigStore()
+    return _store
+
+
+def current_config() -> ConfigSnapshot:
+    """Cached, read-only config. Prefer this over load_config() unless you need to edit."""
+    return get_store().snapshot()
+
+
+def load_config() -> Dict[str, Any]:
+    """Mutable deep copy of the current config (e.g. for the settings editor)."""
+    return current_config().thaw()
 
-    # migrate: fill in any newly added defaults; bump schema_version
-    before = json.dumps(cfg, sort_keys=True)
-    cfg = _deep_merge_missing(cfg, DEFAULT_CONFIG)
-    cfg["schema_version"] = CONFIG_SCHEMA_VERSION
-    after = json.dumps(cfg, sort_keys=True)
-    if before != after:
-        save_config(cfg)  # persist merged/migrated config
-    return cfg
 
+def save_config(cfg: Mapping) -> None:
+    get_store().save(cfg)
 
 
+def update_config(mutate: Callable[[Dict[str, Any]], None]) -> ConfigSnapshot:
+    return get_store().update(mutate)
 
-def save_config(cfg: Dict[str, Any]) -> None:
-    ensure_app_dirs()
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2)
 
 def reset_config() -> Dict[str, Any]:
     """Forcefully overwrite config.json with DEFAULT_CONFIG."""
-    ensure_app_dirs()
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(DEFAULT_CONFIG, f, indent=2)
-    return json.loads(json.dumps(DEFAULT_CONFIG))
+    return get_store().save(DEFAULT_CONFIG).thaw()
@@ -0,0 +1,72 @@
+import time
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QDialog, QLineEdit, QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout,
+                             QHBoxLayout, QHeaderView, QApplication)
+
+from ..services.history import History
+
+COLUMNS = (("When", "ts"), ("What", "kind"), ("Customer", "customer"), ("Original name", "orig_name"),
+           ("New name", "new_name"), ("Where", "dest_path"), ("Outcome", "outcome"))
+
+
+class HistoryDialog(QDialog):
+    """Search-as-you-type over the operation history (newest first)."""
+    def __init__(self, history: History, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Sloan History")
+        self.setMinimumSize(900, 480)
+        self.history = history
+
+        self.query_edit = QLineEdit(); self.query_edit.setPlaceholderText("File name, customer or keyword…")
+        self.customer_edit = QLineEdit(); self.customer_edit.setPlaceholderText("Customer starts with…")
+        self.status_lbl = QLabel("")
+        top = QHBoxLayout()
+        top.addWidget(self.query_edit, 3); top.addWidget(self.customer_edit, 2)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([c[0] for c in COLUMNS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.cellDoubleClicked.connect(self.copy_row)
+
+        main = QVBoxLayout(self)
+        main.addLayout(top); main.addWidget(self.table); main.addWidget(self.status_lbl)
+
+        # debounce typing so each keystroke doesn't run its own query
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.setInterval(150)
+        self.timer.timeout.connect(self.refresh)
+        self.query_edit.textChanged.connect(lambda _: self.timer.start())
+        self.customer_edit.textChanged.connect(lambda _: self.timer.start())
+        self.refresh()
+
+    def refresh(self):
+        t0 = time.perf_counter()
+        try:
+            rows = self.history.search(self.query_edit.text(), customer=self.customer_edit.text().strip(), limit=200)
+        except Exception as ex:
+            self.status_lbl.setText(f"Search failed: {ex}")
+            return
+        ms = (time.perf_counter() - t0) * 1000
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            for j, (_, key) in enumerate(COLUMNS):
+                val = row.get(key)
+                if key == "ts" and val:
+                    val = datetime.fromtimestamp(val).strftime("%Y-%m-%d %H:%M")
+                item = QTableWidgetItem("" if val is None else str(val))
+                if key == "new_name" and row.get("item_id"):
+                    item.setToolTip(f"Drive item {row['item_id']}")
+                elif key == "outcome" and row.get("detail"):
+                    item.setToolTip(row["detail"])
+                self.table.setItem(i, j, item)
+        self.table.resizeColumnsToContents()
+        self.status_lbl.setText(f"{len(rows)} shown ({ms:.0f} ms). Double-click a row to copy it.")
+
+    def copy_row(self, row: int, _col: int):
+        cells = [self.table.item(row, j).text() for j in range(self.table.columnCount())]
+        QApplication.clipboard().setText("\t".join(cells))
+        self.status_lbl.setText("Copied to clipboard.")
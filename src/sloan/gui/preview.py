@@ -0,0 +1,249 @@
+"""
+Thumbnails for the Rename dialog, decoded off the Qt thread.
+
+PreviewLoader.request(path) answers from the memory LRU at once or queues a
+decode on a small QThreadPool; `ready(path, QImage)` fires on the Qt thread
+when it is done. Decoded thumbnails are also kept on disk under
+~/.sloan_suite/previews (LRU by mtime, bounded by preview.disk_mb), keyed by
+path + size + mtime so an edited or replaced file never shows a stale image.
+Saving preview.size_px, memory_entries or disk_mb applies to the running
+loader; there is no restart.
+
+Images go through QImageReader with a scaled size, so a 12 MP JPEG is
+decoded at reduced resolution rather than in full. PDFs show their first
+page when PyMuPDF (`fitz`) is installed; anything else gets no thumbnail.
+"""
+import hashlib, os, threading, time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+from PyQt5.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QImageReader, QPainter
+
+from ..config import APP_DIR, touches
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY, observe_stage
+
+CACHE_DIR = os.path.join(APP_DIR, "previews")
+PDF_EXTS = {".pdf"}
+
+PREVIEW_LOOKUPS = REGISTRY.counter("sloan_preview_total", "Preview requests by where they were answered from")
+
+_log = get_logger("preview")
+
+
+def file_key(path: str, px: int) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{px}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def _flatten(img: QImage) -> QImage:
+    """Opaque RGB copy (transparent areas white) so the thumbnail can be stored as JPEG."""
+    if not img.hasAlphaChannel():
+        return img
+    out = QImage(img.size(), QImage.Format_RGB32)
+    out.fill(QColor(Qt.white))
+    p = QPainter(out)
+    p.drawImage(0, 0, img)
+    p.end()
+    return out
+
+
+def decode_image(path: str, px: int) -> Optional[QImage]:
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)  # honour EXIF orientation
+    size = reader.size()
+    if size.isValid() and max(size.width(), size.height()) > px:
+        reader.setScaledSize(size.scaled(QSize(px, px), Qt.KeepAspectRatio))
+    img = reader.read()
+    return None if img.isNull() else img
+
+
+def decode_pdf(path: str, px: int) -> Optional[QImage]:
+    try:
+        import fitz  # PyMuPDF, optional
+    except ImportError:
+        return None
+    with fitz.open(path) as doc:
+        if not doc.page_count:
+            return None
+        page = doc.load_page(0)
+        zoom = px / max(page.rect.width, page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888).copy()
+
+
+class PreviewCache:
+    """Memory LRU of QImages in front of a directory of JPEG thumbnails."""
+    def __init__(self, directory: str = CACHE_DIR, memory_entries: int = 64, disk_bytes: int = 100 * 1024 * 1024):
+        self.directory = directory
+        self.memory_entries = max(1, memory_entries)
+        self.disk_bytes = disk_bytes
+        self._mem: "OrderedDict[str, QImage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def resize(self, memory_entries: int, disk_bytes: int):
+        with self._lock:
+            self.memory_entries = max(1, memory_entries)
+            while len(self._mem) > self.memory_entries:
+                self._mem.popitem(last=False)
+        shrunk = disk_bytes < self.disk_bytes
+        self.disk_bytes = disk_bytes
+        if shrunk:
+            self.prune()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+
+    def memory_get(self, key: str) -> Optional[QImage]:
+        with self._lock:
+            img = self._mem.get(key)
+            if img is not None:
+                self._mem.move_to_end(key)
+            return img
+
+    def _remember(self, key: str, img: QImage):
+        with self._lock:
+            self._mem[key] = img
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_entries:
+                self._mem.popitem(last=False)
+
+    def disk_get(self, key: str) -> Optional[QImage]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        img = QImage(path)
+        if img.isNull():
+            return None
+        try:
+            os.utime(path)  # LRU by mtime
+        except OSError:
+            pass
+        self._remember(key, img)
+        return img
+
+    def put(self, key: str, img: QImage):
+        self._remember(key, img)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        if _flatten(img).save(tmp, "JPG", 85):
+            os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % 50 == 0:
+            self.prune()
+
+    def prune(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for n in names:
+                p = os.path.join(root, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        used = sum(s for _, s, _ in files)
+        for _, size, p in sorted(files):
+            if used <= self.disk_bytes * 0.8:
+                break
+            try:
+                os.remove(p)
+                used -= size
+            except OSError:
+                pass
+
+
+class _Job(QRunnable):
+    def __init__(self, loader: "PreviewLoader", path: str, key: str, px: int):
+        super().__init__()
+        self.loader, self.path, self.key, self.px = loader, path, key, px  # px as in the key
+
+    def run(self):
+        loader = self.loader
+        img = None
+        try:
+            img = loader.cache.disk_get(self.key)
+            if img is not None:
+                PREVIEW_LOOKUPS.inc(source="disk")
+            else:
+                ext = os.path.splitext(self.path)[1].lower()
+                decode = decode_pdf if ext in PDF_EXTS else decode_image
+                t0 = time.monotonic()
+                img = decode(self.path, self.px)
+                observe_stage("preview_decode", time.monotonic() - t0)
+                if img is not None:
+                    PREVIEW_LOOKUPS.inc(source="decode")
+                    loader.cache.put(self.key, img)
+        except Exception as ex:
+            _log.warning(f"Preview failed for {self.path}: {ex}")
+        finally:
+            loader._done(self.key)
+        loader.ready.emit(self.path, img if img is not None else QImage())
+
+
+class PreviewLoader(QObject):
+    """Lives on the Qt thread; `ready` is delivered there (a null QImage means no preview)."""
+    ready = pyqtSignal(str, QImage)
+
+    def __init__(self, cfg, parent=None):
+        super().__init__(parent)
+        self.cache = PreviewCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)  # one for the file on screen, one prefetching
+        self._inflight: Set[str] = set()
+        self._lock = threading.Lock()
+        self.configure(cfg)
+
+    def configure(self, cfg):
+        p = cfg.get("preview", {}) or {}
+        self.px = int(p.get("size_px", 320))  # thumbnails of the old size age out of the LRUs
+        self.cache.resize(int(p.get("memory_entries", 64)), int(float(p.get("disk_mb", 100)) * 1024 * 1024))
+
+    def reconfigure(self, cfg, changed):
+        if touches(changed, "preview"):
+            self.configure(cfg)
+
+    def _done(self, key: str):
+        with self._lock:
+            self._inflight.discard(key)
+
+    def request(self, path: str, prefetch: bool = False) -> Optional[QImage]:
+        """The thumbnail if it is in memory; otherwise None and `ready` follows."""
+        px = self.px
+        key = file_key(path, px)
+        if key is None:
+            return None
+        img = self.cache.memory_get(key)
+        if img is not None:
+            PREVIEW_LOOKUPS.inc(source="memory")
+            return img
+        with self._lock:
+            if key in self._inflight:
+                return None
+            self._inflight.add(key)
+        self.pool.start(_Job(self, path, key, px), 0 if prefetch else 10)
+        return None
+
+    def prefetch(self, paths: Iterable[str]):
+        for p in paths:
+            self.request(p, prefetch=True)
+
+
+_shared: Optional[PreviewLoader] = None
+
+
+def shared_loader(cfg) -> Optional[PreviewLoader]:
+    """Process-wide loader, created on the Qt thread on first use (None when preview.enabled is false)."""
+    global _shared
+    if not (cfg.get("preview", {}) or {}).get("enabled", True):
+        return None
+    if _shared is None:
+        _shared = PreviewLoader(cfg)
+    return _shared
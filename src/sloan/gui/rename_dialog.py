@@ -2,10 +2,12 @@ import os, time
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtWidgets import (QDialog, QLabel, QComboBox, QPushButton, QLineEdit, QCheckBox,
                              QVBoxLayout, QHBoxLayout, QGroupBox, QGridLayout, QToolButton, QMessageBox, QApplication)
-from PyQt5.QtGui import QIcon, QCursor
+from PyQt5.QtGui import QIcon, QCursor, QImage, QPixmap
 
-from ..config import load_config
+from ..config import current_config, load_config
 from ..naming import Namer
+from ..services.history import shared_history
+from .preview import shared_loader
 from .settings_dialog import SettingsDialog
 
 class RenameDialog(QDialog):
@@ -25,6 +27,19 @@ class RenameDialog(QDialog):
         top.addWidget(self.title_lbl); top.addStretch(1); top.addWidget(self.btn_gear)
         main.addLayout(top)
 
+        # Thumbnail, filled in by the preview loader when the decode finishes
+        self.loader = shared_loader(cfg)
+        if self.loader is not None:
+            self.thumb_lbl = QLabel("Loading preview…")
+            self.thumb_lbl.setAlignment(Qt.AlignCenter)
+            self.thumb_lbl.setFixedHeight(int(self.loader.px * 0.75) + 8)
+            self.thumb_lbl.setToolTip(file_path)
+            main.addWidget(self.thumb_lbl)
+            self.loader.ready.connect(self._on_preview)
+            img = self.loader.request(file_path)
+            if img is not None:
+                self._on_preview(file_path, img)
+
         # Step 1
         step1 = QGroupBox("Step 1 — Keyword"); s1 = QGridLayout(step1)
         self.keyword_cb = QComboBox(); self.keyword_cb.addItems([k["name"] for k in self.cfg.get("keywords", [])])
@@ -109,7 +124,7 @@ class RenameDialog(QDialog):
 
         if dlg.exec_():
             self.settings_saved.emit()
-            self.cfg = load_config();
+            self.cfg = current_config();
             self.namer = Namer(self.cfg)
             self.keyword_cb.blockSignals(True)
             cur_kw = self.keyword_cb.currentText()
@@ -203,10 +218,14 @@ class RenameDialog(QDialog):
             # Use acronym for locations (per original spec)
             detail_full = self.namer.location_acronym(side, loc) if loc else ""
 
-        name, _ = self.namer.render(customer, kw, detail_full, is_brand, None, ext, extra=extra)
+        name, _ = self.namer.render(customer, kw, detail_full, is_brand, self.namer.date_for(self.file_path), ext,
+                                    extra=extra)
         self.preview_lbl.setText(f"Preview: {name}")
 
     def do_rename(self):
+        t0 = time.monotonic()
+        orig_path = self.file_path
+        customer = kw = ""
         try:
             kw = self.keyword_cb.currentText()
             is_quote = self._is_quote(kw);
@@ -224,7 +243,8 @@ class RenameDialog(QDialog):
                 loc = self.loc_cb.currentText() or ""
                 detail_full = self.namer.location_acronym(side, loc)
 
-            new_name, _ = self.namer.render(customer, kw, detail_full, is_brand, None, ext, extra=extra)
+            new_name, _ = self.namer.render(customer, kw, detail_full, is_brand, self.namer.date_for(self.file_path),
+                                            ext, extra=extra)
             folder = os.path.dirname(self.file_path);
             new_path = os.path.join(folder, new_name)
 
@@ -250,7 +270,10 @@ class RenameDialog(QDialog):
 
             # small delay to let filesystem settle before we drop the lock
             time.sleep(0.2)
-
+            self._record_rename(orig_path, customer, kw, "ok", t0)
+        except Exception as ex:
+            self._record_rename(orig_path, customer, kw, "error", t0, detail=str(ex))
+            raise
         finally:
             # --- BEGIN: always remove lock
             try:
@@ -260,4 +283,33 @@ class RenameDialog(QDialog):
                 pass
             # --- END: remove lock
 
-        self.accept()
\ No newline at end of file
+        self.accept()
+
+    def _record_rename(self, orig_path: str, customer: str, kw: str, outcome: str, t0: float, detail=None):
+        history = shared_history(self.cfg)
+        if history is None:
+            return
+        history.record("rename", outcome, source="tray", orig_name=os.path.basename(orig_path),
+                       new_name=os.path.basename(self.file_path), customer=customer,
+                       keyword=self.namer.keyword_acronym(kw) if kw else "", local_path=self.file_path,
+                       duration_ms=(time.monotonic() - t0) * 1000, detail=detail)
+
+    def _on_preview(self, path: str, img: QImage):
+        if os.path.abspath(path) != os.path.abspath(self.file_path):
+            return  # a prefetch for another file
+        if img.isNull():
+            ext = os.path.splitext(path)[1].upper().lstrip(".") or "File"
+            self.thumb_lbl.setText(f"{ext} — no preview")
+            return
+        pm = QPixmap.fromImage(img)
+        if pm.height() > self.thumb_lbl.height():
+            pm = pm.scaledToHeight(self.thumb_lbl.height(), Qt.SmoothTransformation)
+        self.thumb_lbl.setPixmap(pm)
+
+    def done(self, r):
+        if self.loader is not None:
+            try:
+                self.loader.ready.disconnect(self._on_preview)
+            except TypeError:
+                pass
+        super().done(r)
@@ -1,8 +1,8 @@
 import json
 
-from PyQt5.QtWidgets import (QDialog, QWidget, QGridLayout, QLineEdit, QPushButton, QLabel,
+from PyQt5.QtWidgets import (QDialog, QWidget, QGridLayout, QLineEdit, QPushButton, QLabel, QComboBox,
                              QPlainTextEdit, QTabWidget, QHBoxLayout, QVBoxLayout, QFileDialog, QMessageBox)
-from ..config import load_config, save_config, DEFAULT_CONFIG, DATE_FMT_DEFAULT
+from ..config import current_config, load_config, save_config, DEFAULT_CONFIG, DATE_FMT_DEFAULT
 
 class SettingsDialog(QDialog):
     def __init__(self, cfg, parent=None):
@@ -22,6 +22,10 @@ class SettingsDialog(QDialog):
         grid.addWidget(QLabel("Watch Folder"), 0, 0); grid.addWidget(self.watch_edit, 0, 1); grid.addWidget(btn_browse, 0, 2)
         grid.addWidget(QLabel("Filename Template"), 1, 0); grid.addWidget(self.template_edit, 1, 1, 1, 2)
         grid.addWidget(QLabel("Date Format (strftime)"), 2, 0); grid.addWidget(self.datefmt_edit, 2, 1, 1, 2)
+        self.datesrc_cb = QComboBox()
+        self.datesrc_cb.addItem("Today", "today"); self.datesrc_cb.addItem("Photo/PDF capture date", "capture")
+        self.datesrc_cb.setCurrentIndex(max(0, self.datesrc_cb.findData(self.cfg.get("date_source", "today"))))
+        grid.addWidget(QLabel("Date Source"), 3, 0); grid.addWidget(self.datesrc_cb, 3, 1, 1, 2)
 
         # Rename Config
         rename_tab = QWidget(); rgrid = QGridLayout(rename_tab)
@@ -89,6 +93,7 @@ class SettingsDialog(QDialog):
             self.cfg["watch_folder"] = self.watch_edit.text().strip()
             self.cfg["filename_template"] = self.template_edit.text().strip()
             self.cfg["date_format"] = self.datefmt_edit.text().strip() or DATE_FMT_DEFAULT
+            self.cfg["date_source"] = self.datesrc_cb.currentData()
             self.cfg["keywords"] = self._lines_to_list(self.keywords_edit.toPlainText())
             self.cfg["brands"] = self._lines_to_list(self.brands_edit.toPlainText())
             self.cfg.setdefault("locations", {})["Interior"] = self._lines_to_list(self.interior_edit.toPlainText())
@@ -120,7 +125,7 @@ class SettingsDialog(QDialog):
             save_config(self.cfg)
 
             # 4) Read back and verify it stuck
-            after = load_config()
+            after = current_config()
             if after.get("filename_template") != self.cfg.get("filename_template"):
                 QMessageBox.critical(self, "Save Failed",
                                      "The file name template did not persist to disk. "
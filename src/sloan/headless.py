@@ -0,0 +1,194 @@
+"""
+`sloan-suite serve`: the watch folder, the Jotform poller and auto-routing
+without Qt, for an unattended machine (Windows service account or Linux box).
+
+Files that land in the watch folder with a name Namer.parse() understands
+("{customer} {keyword} ... {date}") are uploaded straight into the customer's
+folder; anything else is logged and left alone. SIGINT/SIGTERM stop intake
+and drain in-flight uploads; a second signal exits at once. SIGHUP re-reads
+config.json.
+"""
+import os, signal, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set
+
+from .config import current_config, get_store
+from .naming import Namer
+from .services.history import item_fields, shared_history
+from .utils.log import flush, get_logger
+from .utils.metrics import ITEMS, QUEUE_DEPTH, MetricsExporter, observe_stage
+from .utils.profiling import SamplingProfiler, profile_from_env
+
+_log = get_logger("serve")
+
+
+class HeadlessService:
+    def __init__(self, workers: int = 4, drain_seconds: float = 60.0):
+        self.cfg = current_config()
+        self.workers = max(1, workers)
+        self.drain_seconds = drain_seconds
+        self.stop_evt = threading.Event()
+        self.jf_stop = threading.Event()
+        self.seen: Set[str] = set()
+        self.baseline: Set[str] = set()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._signals = 0
+        self.graph = self.organizer = self.jf_thread = self.watcher = self.transformer = None
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    # -------------------- lifecycle --------------------
+    def start(self):
+        from .services.graph_client import GraphClient
+        from .services.jotform_poller import JotformPoller
+        from .services.organizer import Organizer
+        from .services.transform import shared_transformer
+        from .watcher import FolderWatcher
+
+        env_profile = profile_from_env()
+        if env_profile:
+            # no Qt thread to cProfile here; the sampler covers every thread either way
+            SamplingProfiler(env_profile[1]).start()
+
+        watch = self.cfg.get("watch_folder")
+        if watch and os.path.isdir(watch) and not self.cfg.get("watch", {}).get("process_existing_on_start", False):
+            self.baseline = {os.path.abspath(e.path) for e in os.scandir(watch) if e.is_file()}
+
+        self.graph = GraphClient(self.cfg)
+        self.organizer = Organizer(self.cfg, self.graph)
+        self.transformer = shared_transformer(self.cfg)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sloan-route")
+        MetricsExporter(self.cfg, self.stop_evt).start()
+        self.jf_thread = JotformPoller(self.cfg, self.graph, self.jf_stop)
+        self.jf_thread.start()
+        self.watcher = FolderWatcher(self.cfg, self.on_file_ready)
+        self.watcher.start()
+        get_store().subscribe(self._apply_config)
+        _log.info(f"Serving. Watching: {watch}", workers=self.workers, pid=os.getpid())
+
+    def _apply_config(self, cfg, changed):
+        self.cfg = cfg
+        _log.info(f"Config v{cfg.version} changed", changed=sorted(changed))
+        for comp in (self.watcher, self.graph, self.organizer, self.jf_thread, self.transformer):
+            if comp is None:
+                continue
+            try:
+                comp.reconfigure(cfg, changed)
+            except Exception as ex:
+                _log.exception(f"Reconfigure failed for {type(comp).__name__}: {ex}")
+
+    def request_stop(self, signum=None, frame=None):
+        self._signals += 1
+        if self._signals > 1:
+            _log.warning("Second signal: exiting without draining")
+            flush()
+            os._exit(1)
+        _log.info(f"Signal {signum}: draining", pending=self._pending)
+        self.stop_evt.set()
+
+    def run(self) -> int:
+        self.start()
+        while not self.stop_evt.wait(5):
+            current_config()  # pick up hand edits to config.json (one stat() per tick)
+        self.shutdown()
+        return 0
+
+    def shutdown(self):
+        # stop intake first, then let in-flight uploads finish within the drain budget
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.jf_stop.set()
+        if self.jf_thread is not None and self.jf_thread.is_alive():
+            self.jf_thread.wake()
+        deadline = time.monotonic() + self.drain_seconds
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self._pending:
+            _log.warning(f"Drain timed out with {self._pending} uploads in flight")
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        if self.transformer is not None:
+            self.transformer.shutdown()
+        if self.jf_thread is not None:
+            self.jf_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        _log.info("Stopped")
+        flush()
+
+    # -------------------- routing --------------------
+    def on_file_ready(self, path: str):
+        path = os.path.abspath(path)
+        if self.stop_evt.is_set() or path in self.baseline or path in self.seen:
+            return
+        self.seen.add(path)
+        with self._pending_lock:
+            self._pending += 1
+            QUEUE_DEPTH.set(self._pending, queue="serve")
+        self.pool.submit(self._route, path, time.monotonic())
+
+    def _route(self, path: str, t_detected: float):
+        outcome = "ok"
+        t0 = time.monotonic()
+        parsed = up = error = None
+        try:
+            parsed = Namer(self.cfg).parse(os.path.basename(path))
+            if parsed is None:
+                outcome = "unparsed"
+                _log.info(f"Left in place (name does not parse): {path}")
+                return
+            dest_id = self.organizer.destination_id(parsed.customer, parsed.keyword_acr)
+            src = self.transformer.process(path, parsed.keyword_acr)
+            try:
+                up = self.graph.upload_to_folder(dest_id, os.path.basename(path), src, conflict="rename")
+            finally:
+                self.transformer.cleanup(path, src)
+            observe_stage("pipeline", time.monotonic() - t_detected)
+            _log.info(f"Routed {os.path.basename(path)} -> {parsed.customer}",
+                      keyword=parsed.keyword_acr, item_id=up.get("id"))
+            self._after_upload(path)
+        except Exception as ex:
+            outcome, error = "error", str(ex)
+            _log.exception(f"Auto-route failed for {path}: {ex}")
+            self.seen.discard(path)  # a later modify event may retry it
+        finally:
+            ITEMS.inc(stage="serve", outcome=outcome)
+            history = shared_history(self.cfg)
+            if history is not None and outcome != "unparsed":
+                history.record("upload", outcome, source="serve", orig_name=os.path.basename(path),
+                               customer=parsed.customer if parsed else None,
+                               keyword=parsed.keyword_acr if parsed else None, local_path=path,
+                               duration_ms=(time.monotonic() - t0) * 1000, detail=error, **item_fields(up))
+            with self._pending_lock:
+                self._pending -= 1
+                QUEUE_DEPTH.set(self._pending, queue="serve")
+
+    def _after_upload(self, path: str):
+        action = self.cfg.get("serve", {}).get("after_upload", "keep")
+        try:
+            if action == "delete":
+                os.remove(path)
+            elif action == "archive":
+                # the watcher is not recursive, so the archive sub-folder is out of its way
+                dest_dir = os.path.join(os.path.dirname(path), "Uploaded")
+                os.makedirs(dest_dir, exist_ok=True)
+                os.replace(path, os.path.join(dest_dir, os.path.basename(path)))
+        except OSError as ex:
+            _log.warning(f"after_upload={action} failed for {path}: {ex}")
+
+
+def serve(workers: int = 4, drain_seconds: float = 60.0) -> int:
+    from .ipc import InstanceLock
+    lock = InstanceLock()
+    if not lock.acquire():
+        print("Another Sloan instance (tray or serve) is running for this user.", file=sys.stderr)
+        return 1
+    svc = HeadlessService(workers=workers, drain_seconds=drain_seconds)
+    signal.signal(signal.SIGINT, svc.request_stop)
+    signal.signal(signal.SIGTERM, svc.request_stop)
+    if hasattr(signal, "SIGBREAK"):   # Ctrl+Break / service stop on Windows
+        signal.signal(signal.SIGBREAK, svc.request_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda *_: current_config())
+    try:
+        return svc.run()
+    finally:
+        lock.release()
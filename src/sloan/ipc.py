@@ -0,0 +1,150 @@
+"""
+Single-instance handling. The first Sloan process takes an exclusive lock on
+~/.sloan_suite/instance.lock and listens on a named pipe (Windows) or a unix
+socket; later launches forward their --open paths there and exit.
+Stdlib only, so the forwarding path never loads Qt.
+"""
+import hashlib, os, secrets, sys, threading, time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Callable, List, Optional
+
+from .config import APP_DIR
+
+LOCK_PATH = os.path.join(APP_DIR, "instance.lock")
+KEY_PATH = os.path.join(APP_DIR, "instance.key")
+KEY_WAIT = 2.0  # seconds a short key file may take to be filled in by another launch
+
+
+def _address() -> str:
+    if sys.platform == "win32":
+        user = hashlib.sha1(APP_DIR.encode("utf-8")).hexdigest()[:12]
+        return rf"\\.\pipe\SloanSuite-{user}"
+    return os.path.join(APP_DIR, "instance.sock")
+
+
+def _authkey() -> bytes:
+    # per-user secret so other accounts on the machine can't drive our dialogs
+    os.makedirs(APP_DIR, exist_ok=True)
+    deadline = time.monotonic() + KEY_WAIT
+    while True:
+        try:
+            with open(KEY_PATH, "rb") as f:
+                key = f.read()
+            if len(key) >= 32:
+                return key
+        except FileNotFoundError:
+            # several launches on first run: O_EXCL lets exactly one write the key, the rest read it
+            try:
+                fd = os.open(KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                continue
+            key = secrets.token_bytes(32)
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+            return key
+        if time.monotonic() >= deadline:
+            # still short: left half-written by a crash, not by a launch that is writing it now
+            try: os.remove(KEY_PATH)
+            except OSError: pass
+            deadline = time.monotonic() + KEY_WAIT
+            continue
+        time.sleep(0.02)
+
+
+class InstanceLock:
+    """Exclusive, non-blocking lock held by the primary instance for its lifetime."""
+    def __init__(self, path: str = LOCK_PATH):
+        self.path = path
+        self._fh = None
+
+    def acquire(self) -> bool:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh = open(self.path, "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            self._fh.close()
+        except OSError:
+            pass
+        self._fh = None
+
+
+def forward(paths: List[str], timeout: float = 5.0) -> bool:
+    """Send paths to the running instance. Retries briefly in case it is still starting up."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # re-read each time: the primary may have just written the key on its first run
+            with Client(_address(), authkey=_authkey()) as conn:
+                conn.send({"open": [os.path.abspath(p) for p in paths]})
+                return conn.poll(timeout) and conn.recv() == "ok"
+        except (OSError, EOFError, AuthenticationError):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+
+class InstanceServer(threading.Thread):
+    """Accepts forwarded launches and hands their paths to on_open (from this thread)."""
+    def __init__(self, on_open: Callable[[List[str]], None]):
+        super().__init__(name="sloan-instance", daemon=True)
+        self.on_open = on_open
+        self._stopping = False
+        address = _address()
+        if sys.platform != "win32" and os.path.exists(address):
+            os.remove(address)  # stale socket from a crashed run; we hold the lock
+        self._listener = Listener(address, authkey=_authkey())
+
+    def run(self):
+        while not self._stopping:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._stopping:
+                    return
+                continue  # bad authkey / client hung up mid-handshake
+            try:
+                msg = conn.recv()
+                paths = msg.get("open") if isinstance(msg, dict) else None
+                if paths:
+                    self.on_open(list(paths))
+                conn.send("ok")
+            except Exception:
+                pass
+            finally:
+                conn.close()
+
+    def stop(self):
+        self._stopping = True
+
+        def poke():
+            try:
+                Client(self._listener.address, authkey=_authkey()).close()
+            except Exception:
+                pass
+        # accept() doesn't notice close(); poke it with a throwaway connection. If a failed
+        # handshake already ended the loop nobody answers the poke, so don't wait on it for long.
+        t = threading.Thread(target=poke, name="sloan-instance-stop", daemon=True)
+        t.start()
+        t.join(1)
+        self._listener.close()
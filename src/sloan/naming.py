@@ -1,8 +1,11 @@
-import re
+import os, re
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
+from .utils.capture_date import capture_date
+from .utils.profiling import hot_path
+
 DATE_FMT_DEFAULT = "%Y-%m-%d"
 
 @dataclass
@@ -14,6 +17,14 @@ class NameParts:
     ext: str
     extra: str
 
+@dataclass
+class ParsedName:
+    customer: str
+    keyword_acr: str
+    rest: str   # detail/extra/index tokens between keyword and date
+    date_str: str
+    ext: str
+
 class _SafeDict(dict):
     def __missing__(self, key):  # ignore unknown fields in template
         return ""
@@ -38,6 +49,14 @@ class Namer:
     def location_acronym(self, side: str, loc_full: str) -> str:
         return self._lookup_acronym(self.cfg.get("locations", {}).get(side, []), loc_full)
 
+    def date_for(self, path: str) -> Optional[str]:
+        """The {date} for this file when date_source is "capture" and its header has one; None means today."""
+        if self.cfg.get("date_source", "today") != "capture":
+            return None
+        dt = capture_date(path)
+        return dt.strftime(self.cfg.get("date_format", DATE_FMT_DEFAULT)) if dt else None
+
+    @hot_path("naming.render")
     def render(
         self,
         customer: str,
@@ -81,3 +100,28 @@ class Namer:
         base = re.sub(r"\s+", " ", base).strip()
 
         return f"{base}{ext}", NameParts(fields["customer"], keyword_acr, detail_acr, date_str, ext, fields["extra"])
+
+    def parse(self, filename: str) -> Optional[ParsedName]:
+        """
+        Reverse of render() for names that follow "{customer} {keyword} ... {date}":
+        the first token that is a known keyword acronym splits customer from the
+        rest, and a trailing token in date_format is taken as the date.
+        Returns None when no keyword acronym follows a non-empty customer.
+        """
+        stem, ext = os.path.splitext(os.path.basename(filename))
+        tokens = stem.split()
+        acronyms = {k.get("acronym") for k in self.cfg.get("keywords", []) if k.get("acronym")}
+        for i, tok in enumerate(tokens[1:], start=1):
+            if tok in acronyms:
+                break
+        else:
+            return None
+        tail = tokens[i + 1:]
+        date_str = ""
+        if tail:
+            try:
+                datetime.strptime(tail[-1], self.cfg.get("date_format", DATE_FMT_DEFAULT))
+                date_str = tail.pop()
+            except ValueError:
+                pass
+        return ParsedName(" ".join(tokens[:i]), tokens[i], " ".join(tail), date_str, ext)
@@ -0,0 +1,221 @@
+import hashlib, json, os, threading, time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from ..config import APP_DIR
+from ..naming import Namer
+from ..utils.driveitem import drive_path
+from ..utils.log import get_logger
+from ..utils.metrics import ITEMS, span
+from .graph_client import GraphError
+from .history import shared_history
+
+CHECKPOINT_DIR = os.path.join(APP_DIR, "organize-checkpoints")
+
+_log = get_logger("backfill")
+
+
+@dataclass
+class MoveOp:
+    item_id: str
+    name: str
+    src_path: str
+    customer: str
+    keyword_acr: str
+    dest_path: str
+
+
+@dataclass
+class Plan:
+    moves: List[MoveOp] = field(default_factory=list)
+    in_place: int = 0                                       # already in the right folder
+    unclassified: List[str] = field(default_factory=list)   # names that did not parse
+    scanned: int = 0
+
+    def by_customer(self) -> Dict[str, List[MoveOp]]:
+        out: Dict[str, List[MoveOp]] = defaultdict(list)
+        for op in self.moves:
+            out[op.customer].append(op)
+        return dict(sorted(out.items()))
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads; rate <= 0 means unlimited."""
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = burst or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def checkpoint_path(sources: Iterable[str], root: str, recursive: bool) -> str:
+    """Default checkpoint of one plan: only a run over the same sources and customer root resumes from it."""
+    ident = json.dumps([sorted(s.strip("/").lower() for s in sources), root.strip("/").lower(), bool(recursive)])
+    return os.path.join(CHECKPOINT_DIR, hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16] + ".jsonl")
+
+
+class Checkpoint:
+    """Append-only JSONL of finished item ids so an interrupted run can resume."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def done_ids(self) -> Set[str]:
+        done = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if rec.get("status") == "moved":
+                        done.add(rec["id"])
+        except OSError:
+            pass
+        return done
+
+    def record(self, item_id: str, status: str, **fields):
+        line = json.dumps({"id": item_id, "status": status, "ts": time.time(), **fields})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Backfill:
+    """
+    Plan-then-execute re-organisation of files already in SharePoint.
+    plan() lists the source folders and classifies every file by name;
+    execute() provisions the customer trees and runs the moves concurrently.
+    """
+    def __init__(self, cfg, graph, organizer, workers: int = 16, rate: float = 20.0):
+        self.cfg = cfg
+        self.graph = graph
+        self.organizer = organizer
+        self.namer = Namer(cfg)
+        self.history = shared_history(cfg)
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+
+    def _walk(self, root: str, recursive: bool) -> Iterable[Dict]:
+        """Yield file items under root; folders are listed in parallel when recursive."""
+        if not recursive:
+            for it in self.graph.list_children(root):
+                if "file" in it:
+                    yield it
+            return
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sloan-list") as pool:
+            pending = {pool.submit(lambda: list(self.graph.list_children(root)))}
+            while pending:
+                fut = next(as_completed(pending))
+                pending.remove(fut)
+                for it in fut.result():
+                    if "folder" in it:
+                        pending.add(pool.submit(lambda i=it["id"]: list(self.graph.list_children(item_id=i))))
+                    elif "file" in it:
+                        yield it
+
+    def plan(self, sources: List[str], recursive: bool = False) -> Plan:
+        root = self.cfg.get("organizer", {}).get("customer_root_path", "/Customers").rstrip("/")
+        plan = Plan()
+        seen: Set[str] = set()
+        for src in sources:
+            with span("backfill_list"):
+                for it in self._walk(src, recursive):
+                    if it["id"] in seen:
+                        continue
+                    seen.add(it["id"])
+                    plan.scanned += 1
+                    parsed = self.namer.parse(it["name"])
+                    if not parsed:
+                        plan.unclassified.append(f"{drive_path(it)}/{it['name']}")
+                        continue
+                    dest = f"{root}/{parsed.customer}{self.organizer.route_keyword(parsed.keyword_acr)}".rstrip("/")
+                    src_path = drive_path(it)
+                    if src_path.lower() == dest.lower():
+                        plan.in_place += 1
+                        continue
+                    plan.moves.append(MoveOp(it["id"], it["name"], src_path,
+                                             parsed.customer, parsed.keyword_acr, dest))
+        return plan
+
+    def execute(self, plan: Plan, checkpoint: Checkpoint,
+                progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        done = checkpoint.done_ids()
+        todo = [op for op in plan.moves if op.item_id not in done]
+        stats = {"moved": 0, "skipped_resume": len(plan.moves) - len(todo), "failed": 0, "conflict": 0}
+        t0 = time.monotonic()
+
+        # 1) provision every customer tree once, in parallel (memoized by Organizer)
+        customers = sorted({op.customer for op in todo})
+        with span("backfill_provision"), ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for cust, fut in [(c, pool.submit(self.organizer.ensure_customer_tree, c)) for c in customers]:
+                try:
+                    fut.result()
+                except Exception as ex:
+                    _log.error(f"Provisioning failed for {cust}: {ex}")
+
+        # 2) moves, throttled
+        lock = threading.Lock()
+
+        def move(op: MoveOp):
+            self.limiter.acquire()
+            t_move = time.monotonic()
+            try:
+                dest_id = self.organizer.destination_id(op.customer, op.keyword_acr)
+                self.graph.move_item(op.item_id, dest_id)
+                status = "moved"
+            except Exception as ex:
+                status = "conflict" if isinstance(ex, GraphError) and ex.status_code == 409 else "failed"
+                _log.warning(f"Move {status}: {op.src_path}/{op.name}: {ex}")
+            checkpoint.record(op.item_id, status, name=op.name, dest=op.dest_path)
+            if self.history is not None:
+                self.history.record("move", "ok" if status == "moved" else status, source="organize",
+                                    orig_name=op.name, new_name=op.name, customer=op.customer,
+                                    keyword=op.keyword_acr, item_id=op.item_id, dest_path=op.dest_path,
+                                    duration_ms=(time.monotonic() - t_move) * 1000,
+                                    detail=f"from {op.src_path}")
+            ITEMS.inc(stage="backfill_move", outcome=status)
+            with lock:
+                stats[status] += 1
+                n = stats["moved"] + stats["failed"] + stats["conflict"]
+            if progress and (n % 100 == 0 or n == len(todo)):
+                progress({"done": n, "total": len(todo), "elapsed": time.monotonic() - t0, **stats})
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sloan-move") as pool:
+            for fut in [pool.submit(move, op) for op in todo]:
+                fut.result()
+
+        stats["elapsed_s"] = time.monotonic() - t0
+        stats["per_sec"] = (stats["moved"] / stats["elapsed_s"]) if stats["elapsed_s"] else 0.0
+        return stats
+
+
+def write_plan(plan: Plan, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"scanned": plan.scanned, "in_place": plan.in_place, "unclassified": plan.unclassified,
+                   "moves": [asdict(op) for op in plan.moves]}, f, indent=1)
@@ -0,0 +1,259 @@
+import fnmatch, hashlib, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..naming import DATE_FMT_DEFAULT, Namer
+from ..utils.capture_date import capture_dates
+from ..utils.log import get_logger
+from ..utils.metrics import ITEMS, span
+from ..utils.sanitize import sanitize_name
+from .history import item_fields, shared_history
+
+MANIFEST_NAME = ".sloan-import.jsonl"
+SKIP_NAMES = {MANIFEST_NAME, "desktop.ini", "thumbs.db", ".ds_store"}
+
+_log = get_logger("import")
+
+
+@dataclass
+class ImportItem:
+    src: str
+    size: int
+    mtime: float
+    customer: str = ""
+    keyword: str = ""     # full keyword name, e.g. "Initial Picture"
+    side: str = ""        # Interior / Exterior (pictures)
+    location: str = ""    # full location name (pictures)
+    brand: str = ""       # full brand name (quotes)
+    extra: str = ""
+    name: str = ""        # rendered SharePoint name
+    sha256: str = ""
+
+
+def scan(root: str) -> Iterator[ImportItem]:
+    """Walk root with os.scandir (one stat per entry), skipping hidden and temp files."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.name.startswith((".", "~$")) or e.name.lower() in SKIP_NAMES:
+                    continue
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.is_file(follow_symlinks=False):
+                    st = e.stat()
+                    yield ImportItem(e.path, st.st_size, st.st_mtime)
+
+
+class Classifier:
+    """
+    Fills customer/keyword/location/brand for each file from, in order of
+    precedence: explicit overrides, the first matching mapping-file rule,
+    and the path layout <root>/<Customer>/<Keyword>/[<Side>/][<Location>/]file.
+
+    Mapping file (JSON): {"defaults": {...}, "rules": [{"match": "*/Smith*/**", "customer": ...}]}
+    with the same field names as ImportItem; "match" is a glob on the path relative to root.
+    """
+    FIELDS = ("customer", "keyword", "side", "location", "brand", "extra")
+
+    def __init__(self, cfg, root: str, mapping: Optional[Dict] = None, overrides: Optional[Dict] = None):
+        self.cfg = cfg
+        self.root = os.path.abspath(root)
+        self.mapping = mapping or {}
+        self.overrides = {k: v for k, v in (overrides or {}).items() if v}
+        kws = cfg.get("keywords", [])
+        self._keywords = {k["name"].lower(): k["name"] for k in kws}
+        self._keywords.update({k["acronym"].lower(): k["name"] for k in kws if k.get("acronym")})
+        self._locations = {}
+        for side, locs in (cfg.get("locations", {}) or {}).items():
+            for l in locs:
+                self._locations[l["name"].lower()] = (side, l["name"])
+                if l.get("acronym"):
+                    self._locations[l["acronym"].lower()] = (side, l["name"])
+        self._brands = {b["name"].lower(): b["name"] for b in cfg.get("brands", [])}
+        self._brands.update({b["acronym"].lower(): b["name"] for b in cfg.get("brands", []) if b.get("acronym")})
+
+    def _from_layout(self, rel_dirs: List[str]) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        for i, d in enumerate(rel_dirs):
+            key = d.lower()
+            if "keyword" not in out and key in self._keywords:
+                out["keyword"] = self._keywords[key]
+                if i > 0 and "customer" not in out:
+                    out["customer"] = sanitize_name(rel_dirs[i - 1])
+            elif key in ("interior", "exterior"):
+                out["side"] = d.capitalize()
+            elif key in self._locations:
+                out["side"], out["location"] = self._locations[key]
+            elif key in self._brands:
+                out["brand"] = self._brands[key]
+        if "customer" not in out and rel_dirs and rel_dirs[0].lower() not in self._keywords:
+            out["customer"] = sanitize_name(rel_dirs[0])
+        return out
+
+    def classify(self, item: ImportItem) -> ImportItem:
+        rel = os.path.relpath(item.src, self.root).replace("\\", "/")
+        fields = self._from_layout(rel.split("/")[:-1])
+        for rule in self.mapping.get("rules", []):
+            if fnmatch.fnmatch(rel, rule.get("match", "")):
+                fields.update({k: rule[k] for k in self.FIELDS if rule.get(k)})
+                break
+        for k, v in (self.mapping.get("defaults") or {}).items():
+            fields.setdefault(k, v)
+        fields.update(self.overrides)
+        kw = fields.get("keyword", "")
+        fields["keyword"] = self._keywords.get(kw.lower(), kw)
+        for k in self.FIELDS:
+            setattr(item, k, fields.get(k, "") or "")
+        return item
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """
+    JSONL record of every file handled. Re-runs skip a file whose content was
+    already uploaded to the same destination ("customer/keyword/name"); the
+    same photo filed for two customers is uploaded for each.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.uploaded: Dict[Tuple[str, str], Dict] = {}  # (sha256, dest) -> record
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    if rec.get("status") == "uploaded":
+                        self.uploaded[self.key(rec)] = rec
+        except OSError:
+            pass
+
+    @staticmethod
+    def key(rec: Dict) -> Tuple[str, str]:
+        # records written before "dest" was kept only have the name it was uploaded as
+        return rec["sha256"], rec.get("dest") or f"{rec.get('customer')}/{rec.get('keyword')}/{rec.get('name')}"
+
+    def record(self, **rec):
+        rec["ts"] = time.time()
+        with self._lock:
+            if rec.get("status") == "uploaded":
+                self.uploaded[self.key(rec)] = rec
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+
+
+class BulkImporter:
+    """Headless ingestion of a local folder: classify, name, hash, upload and route."""
+    def __init__(self, cfg, graph, organizer, workers: int = 8):
+        self.cfg = cfg
+        self.graph = graph
+        self.organizer = organizer
+        self.namer = Namer(cfg)
+        self.workers = max(1, workers)
+        self.history = shared_history(cfg)
+
+    def render_name(self, item: ImportItem, taken: Dict[str, int]) -> str:
+        kw = item.keyword
+        ext = os.path.splitext(item.src)[1].lower()
+        is_quote = kw in ("Initial Quote", "Final Quote")
+        is_pic = kw in ("Initial Picture", "Final Picture")
+        detail, is_brand = "", False
+        if is_quote and item.brand:
+            detail, is_brand = item.brand, True
+        elif is_pic and item.location:
+            detail = self.namer.location_acronym(item.side or "Interior", item.location)
+        date_str = self.namer.date_for(item.src) or \
+            datetime.fromtimestamp(item.mtime).strftime(self.cfg.get("date_format", DATE_FMT_DEFAULT))
+        base, _ = self.namer.render(item.customer, kw, detail, is_brand, date_str, "", extra=item.extra)
+        base = sanitize_name(base)
+        # photos from one shoot render to the same name; number the repeats
+        key = f"{item.customer}|{kw}|{base}".lower()
+        n = taken.get(key, 0) + 1
+        taken[key] = n
+        return (f"{base} {n}" if n > 1 else base) + ext
+
+    def plan(self, items: List[ImportItem]) -> List[ImportItem]:
+        taken: Dict[str, int] = {}
+        ready = []
+        if self.cfg.get("date_source", "today") == "capture":
+            capture_dates(it.src for it in items)  # read the headers in parallel; render_name hits the cache
+        for it in sorted(items, key=lambda i: (i.customer, i.keyword, i.mtime, i.src)):
+            if not it.customer or not it.keyword:
+                continue
+            it.name = self.render_name(it, taken)
+            ready.append(it)
+        return ready
+
+    def run(self, items: List[ImportItem], manifest: Manifest,
+            progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        stats = {"uploaded": 0, "skipped": 0, "failed": 0, "bytes": 0}
+        lock = threading.Lock()
+        t0 = time.monotonic()
+
+        def one(it: ImportItem):
+            t_item = time.monotonic()
+            up, kw_acr, error = None, "", None
+            try:
+                with span("import_hash"):
+                    it.sha256 = _sha256(it.src)
+                kw_acr = self.namer.keyword_acronym(it.keyword)
+                dest = f"{it.customer}/{kw_acr}/{it.name}"
+                if (it.sha256, dest) in manifest.uploaded:
+                    status = "skipped"
+                else:
+                    dest_id = self.organizer.destination_id(it.customer, kw_acr)
+                    with span("import_upload"):
+                        up = self.graph.upload_to_folder(dest_id, it.name, it.src, conflict="rename",
+                                                         priority="backfill")
+                    manifest.record(sha256=it.sha256, src=it.src, dest=dest, name=up.get("name", it.name),
+                                    customer=it.customer, keyword=kw_acr, item_id=up.get("id"),
+                                    bytes=it.size, status="uploaded")
+                    status = "uploaded"
+            except Exception as ex:
+                _log.warning(f"Import failed for {it.src}: {ex}")
+                error = str(ex)
+                manifest.record(sha256=it.sha256, src=it.src, name=it.name, status="failed", error=str(ex))
+                status = "failed"
+            ITEMS.inc(stage="import", outcome=status)
+            if self.history is not None and status != "skipped":
+                self.history.record("import", "ok" if status == "uploaded" else "error", source="import",
+                                    **{"orig_name": os.path.basename(it.src), "new_name": it.name,
+                                       "customer": it.customer, "keyword": kw_acr, "local_path": it.src,
+                                       "duration_ms": (time.monotonic() - t_item) * 1000, "detail": error,
+                                       **item_fields(up)})
+            with lock:
+                stats[status] += 1
+                if status == "uploaded":
+                    stats["bytes"] += it.size
+                done = stats["uploaded"] + stats["skipped"] + stats["failed"]
+            if progress and (done % 50 == 0 or done == len(items)):
+                progress({"done": done, "total": len(items), "elapsed": time.monotonic() - t0, **stats})
+
+        # provision each customer's tree once up front rather than racing per file
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sloan-import") as pool:
+            for fut in [pool.submit(self.organizer.ensure_customer_tree, c)
+                        for c in sorted({i.customer for i in items})]:
+                try:
+                    fut.result()
+                except Exception as ex:
+                    _log.error(f"Provisioning failed: {ex}")
+            for fut in [pool.submit(one, it) for it in items]:
+                fut.result()
+
+        stats["elapsed_s"] = time.monotonic() - t0
+        el = stats["elapsed_s"] or 1e-9
+        stats["files_per_s"] = stats["uploaded"] / el
+        stats["mb_per_s"] = stats["bytes"] / el / 1e6
+        return stats
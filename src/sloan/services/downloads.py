@@ -0,0 +1,273 @@
+"""
+Resumable downloads for the Jotform poller.
+
+Each URL is downloaded into DOWNLOAD_DIR/<sha1 of the URL>.part. A JSON
+sidecar next to it records the validator (a strong ETag, else
+Last-Modified), the total size and how far each byte range has got. When a
+connection drops, only the missing bytes are requested again with `Range`
+and `If-Range`. A 200 answer instead of 206 means the file changed on the
+server, so the part starts again from zero. The sidecar survives restarts,
+so a submission that failed halfway through a video picks up where it
+stopped on the next poll.
+
+A file of at least parallel_min_mb is split into `segments` ranges that are
+fetched at once, provided the server answered the first request with 206.
+The assembled file must be exactly the advertised size before it is renamed
+to the caller's path. Servers that ignore Range still work, but they restart
+from zero after every failure. So do files served without a validator:
+nothing would tell a resumed range that the file changed in between.
+"""
+import functools, glob, hashlib, json, os, re, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from ..config import APP_DIR
+from ..utils.fileio import atomic_write_json
+from ..utils.log import get_logger
+from ..utils.metrics import BYTES, REGISTRY
+
+DOWNLOAD_DIR = os.path.join(APP_DIR, "downloads")
+CHUNK = 256 * 1024
+SAVE_EVERY = 4 * 1024 * 1024    # bytes between sidecar writes per range
+TIMEOUT = (10, 60)              # connect, read
+
+DOWNLOADS = REGISTRY.counter("sloan_download_total", "Attachment downloads and retries by outcome")
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+_log = get_logger("downloads")
+
+
+class IncompleteDownload(IOError):
+    """The server sent fewer (or other) bytes than it announced."""
+
+
+class _Changed(Exception):
+    """The remote file no longer matches the part on disk."""
+
+
+def _validator(resp: requests.Response) -> str:
+    etag = resp.headers.get("ETag") or ""
+    if etag and not etag.startswith("W/"):  # If-Range only takes strong ETags
+        return etag
+    return resp.headers.get("Last-Modified") or ""
+
+
+class Downloader:
+    def __init__(self, cfg, stop_evt: Optional[threading.Event] = None, directory: str = DOWNLOAD_DIR):
+        self.directory = directory
+        self.stop_evt = stop_evt or threading.Event()
+        self._lock = threading.Lock()
+        self.configure(cfg)
+        self.prune()
+
+    def configure(self, cfg):
+        d = cfg.get("downloads", {}) or {}
+        self.segments = max(1, int(d.get("segments", 4)))
+        self.parallel_min = float(d.get("parallel_min_mb", 32)) * 1024 * 1024
+        self.retries = max(0, int(d.get("retries", 5)))
+        self.keep_days = float(d.get("keep_days", 7))
+
+    def prune(self):
+        """Drop unfinished parts nobody has come back for in keep_days."""
+        cutoff = time.time() - self.keep_days * 86400
+        for path in glob.glob(os.path.join(self.directory, "*.part*")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # -------------------- state --------------------
+    def _part(self, url: str) -> str:
+        # hashed: the name must not depend on the filename, and stays stable across restarts
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+
+    def _load(self, part: str, url: str) -> Optional[Dict]:
+        try:
+            with open(part + ".json", "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("url") == url and state.get("validator") and os.path.exists(part):
+                return state
+        except (OSError, ValueError):
+            pass
+        self._discard(part)
+        return None
+
+    def _save(self, part: str, state: Dict):
+        with self._lock:
+            snapshot = json.loads(json.dumps(state))
+        atomic_write_json(part + ".json", snapshot, indent=None)
+
+    @staticmethod
+    def _discard(part: str):
+        for p in (part, part + ".json"):
+            try: os.remove(p)
+            except OSError: pass
+
+    # -------------------- transfer --------------------
+    def fetch(self, sess: requests.Session, url: str, dest: str) -> int:
+        """Download `url` to `dest`, resuming any earlier partial download. Returns the size."""
+        os.makedirs(self.directory, exist_ok=True)
+        part = self._part(url)
+        state = self._load(part, url)
+        if state is not None:
+            DOWNLOADS.inc(outcome="resumed")
+            _log.info("Resuming download", url=url.split("?")[0], have=self._received(state), size=state["size"])
+        failures = 0
+        while True:
+            before = self._received(state) if state else 0
+            try:
+                first = None
+                if state is None:
+                    state, first = self._begin(sess, url, part)
+                self._fill(sess, url, part, state, first)
+                break
+            except _Changed as ex:
+                DOWNLOADS.inc(outcome="restarted")
+                _log.warning("Download restarted from zero", url=url.split("?")[0], reason=str(ex))
+                self._discard(part)
+                state = None
+                failures += 1
+                if failures > self.retries:
+                    DOWNLOADS.inc(outcome="failed")
+                    raise IncompleteDownload(f"gave up after {failures} restarts: {ex}")
+            except (requests.RequestException, IncompleteDownload) as ex:
+                status = getattr(getattr(ex, "response", None), "status_code", 0) or 0
+                if 400 <= status < 500 and status not in (408, 429):
+                    raise  # gone or forbidden: retrying will not help
+                if state is not None and not state["validator"]:
+                    self._discard(part)  # cannot resume safely
+                    state = None
+                if state is not None:
+                    self._save(part, state)
+                    kept = state["ranged"] and self._received(state) > before
+                    failures = 0 if kept else failures + 1
+                else:
+                    failures += 1
+                if failures > self.retries or self.stop_evt.is_set():
+                    DOWNLOADS.inc(outcome="failed")
+                    raise
+                DOWNLOADS.inc(outcome="retry")
+                _log.warning("Download interrupted, retrying", url=url.split("?")[0], error=str(ex),
+                             have=self._received(state) if state else 0)
+                if failures:  # straight back in when the last attempt got somewhere
+                    self.stop_evt.wait(min(30, 2 ** (failures - 1)))
+        size = os.path.getsize(part)
+        if state["size"] is not None and (size != state["size"] or self._received(state) != state["size"]):
+            self._discard(part)
+            raise IncompleteDownload(f"assembled {size} bytes, expected {state['size']}")
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        os.replace(part, dest)
+        self._discard(part)
+        DOWNLOADS.inc(outcome="ok")
+        return size
+
+    @staticmethod
+    def _received(state: Dict) -> int:
+        return sum(pos - start for start, _, pos in state["ranges"])
+
+    def _begin(self, sess, url: str, part: str):
+        """First request: learn size, validator and range support. Returns the state and the open response."""
+        resp = sess.get(url, stream=True, timeout=TIMEOUT,
+                        headers={"Range": "bytes=0-", "Accept-Encoding": "identity"})
+        try:
+            resp.raise_for_status()
+            size, ranged = None, resp.status_code == 206
+            if ranged:
+                m = _CONTENT_RANGE.match(resp.headers.get("Content-Range") or "")
+                if not m or m.group(1) != "0":
+                    raise IncompleteDownload(f"unexpected Content-Range {resp.headers.get('Content-Range')!r}")
+                size = int(m.group(3)) if m.group(3) != "*" else None
+            elif resp.headers.get("Content-Length"):
+                size = int(resp.headers["Content-Length"])
+            validator = _validator(resp)
+            n = self.segments if ranged and validator and size and size >= self.parallel_min else 1
+            step = -(-size // n) if size else 0
+            # [start, end (exclusive, None = unknown), next byte to write]
+            ranges: List[List] = [[i * step, min(size, (i + 1) * step), i * step] for i in range(n)] \
+                if size else [[0, None, 0]]
+            state = {"url": url, "validator": validator, "size": size, "ranged": ranged, "ranges": ranges}
+            with open(part, "wb") as f:
+                if size:
+                    f.truncate(size)  # parallel ranges write into place
+            self._save(part, state)
+        except BaseException:
+            resp.close()
+            raise
+        # the rest of this response is the first range
+        return state, resp
+
+    def _fill(self, sess, url: str, part: str, state: Dict, first: Optional[requests.Response] = None):
+        """Fetch every unfinished range, at once. `first` is _begin's open response, which carries range 0."""
+        try:
+            rng = state["ranges"][0]
+            if not state["ranged"] and first is None and (rng[1] is None or rng[2] < rng[1]):
+                rng[2] = 0  # no ranges: what arrived before is of no use
+            jobs = []
+            for r in state["ranges"]:
+                if r[1] is not None and r[2] >= r[1]:
+                    continue
+                if first is not None and r is state["ranges"][0]:
+                    jobs.append(functools.partial(self._copy, first, part, state, r))
+                else:
+                    jobs.append(functools.partial(self._fetch_range, sess, url, part, state, r))
+            if len(jobs) <= 1:
+                for job in jobs:
+                    job()
+                return
+            with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="sloan-download") as pool:
+                for fut in [pool.submit(job) for job in jobs]:
+                    fut.result()
+        finally:
+            if first is not None:
+                first.close()
+
+    def _fetch_range(self, sess, url: str, part: str, state: Dict, rng: List):
+        _, end, pos = rng
+        headers = {"Accept-Encoding": "identity"}
+        if state["ranged"]:
+            headers["Range"] = f"bytes={pos}-{'' if end is None else end - 1}"
+            headers["If-Range"] = state["validator"]  # resumable states always have one
+        with sess.get(url, stream=True, timeout=TIMEOUT, headers=headers) as resp:
+            if resp.status_code == 416:
+                raise _Changed("range not satisfiable")
+            resp.raise_for_status()
+            if state["ranged"]:
+                if resp.status_code != 206:
+                    raise _Changed(f"range request answered {resp.status_code}")
+                m = _CONTENT_RANGE.match(resp.headers.get("Content-Range") or "")
+                if not m or int(m.group(1)) != pos:
+                    raise _Changed(f"unexpected Content-Range {resp.headers.get('Content-Range')!r}")
+            self._copy(resp, part, state, rng)
+
+    def _copy(self, resp: requests.Response, part: str, state: Dict, rng: List):
+        """Write the body into the part file at rng's position, recording progress as it goes."""
+        end = rng[1]
+        unsaved = 0
+        with open(part, "r+b") as f:
+            f.seek(rng[2])
+            for chunk in resp.iter_content(CHUNK):
+                if end is not None:
+                    chunk = chunk[:end - rng[2]]  # the first response runs past the first range
+                if chunk:
+                    f.write(chunk)
+                    with self._lock:
+                        rng[2] += len(chunk)
+                    BYTES.inc(len(chunk), service="jotform", direction="down")
+                    unsaved += len(chunk)
+                if end is not None and rng[2] >= end:
+                    break
+                if unsaved >= SAVE_EVERY:
+                    f.flush()
+                    self._save(part, state)
+                    unsaved = 0
+                if self.stop_evt.is_set():
+                    raise IncompleteDownload("stopped")
+        if end is not None and rng[2] < end:
+            raise IncompleteDownload(f"connection closed at byte {rng[2]} of range ending {end}")
+        if end is None:
+            with self._lock:  # unsized body: whatever arrived before a clean close is the file
+                rng[1] = state["size"] = rng[2]
@@ -1,10 +1,18 @@
-import os, time, random
-from typing import Dict, Optional
+import io, os, time, random, threading
+from typing import Callable, Dict, Iterator, Optional, Tuple
 import requests, msal
+from urllib3.util import Retry
 
+from ..utils.httpcache import GRAPH_CACHE_RULES, CachingAdapter, shared_cache
+from ..utils.metrics import BYTES, HTTP_RESPONSES, HTTP_RETRIES, span
+from ..utils.profiling import hot_path
+from ..utils.singleflight import SingleFlight
+from .transfer import ShapedReader, shared_scheduler
 
 
 GRAPH = "https://graph.microsoft.com/v1.0"
+SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024      # larger files go through an upload session
+SESSION_CHUNK = 10 * 320 * 1024          # Graph wants multiples of 320 KiB
 
 def _default_timeout(kwargs, connect=12, read=45):
     # allow caller to override, else supply sane defaults
@@ -12,18 +20,38 @@ def _default_timeout(kwargs, connect=12, read=45):
         kwargs["timeout"] = (connect, read)
     return kwargs
 
+class GraphError(RuntimeError):
+    """Graph answered with a status the call could not use; status_code says which."""
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class _CountingRetry(Retry):
+    # urllib3 builds a new Retry per attempt via type(self), so this sees every retry
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        status = getattr(response, "status", None)
+        HTTP_RETRIES.inc(service="graph", reason=str(status) if status else "connection")
+        return super().increment(method, url, response, error, *args, **kwargs)
+
 class GraphClient:
-    def __init__(self, cfg: Dict):
+    """
+    Safe to share between threads: the session is never mutated after setup
+    (the bearer token goes on each request), the folder cache is locked, and
+    identical in-flight folder ensures, path lookups and token refreshes are
+    coalesced into one call whose result every waiting caller gets.
+    """
+    def __init__(self, cfg: Dict, token_provider: Optional[Callable[[], str]] = None):
         self.cfg = cfg
+        self._token_provider = token_provider  # replaces MSAL, e.g. for the benchmark fakes
         self._token: Optional[str] = None
         self._sess = requests.Session()
         self._folder_cache = set()  # cache drive-relative folder paths we’ve ensured
+        self._cache_lock = threading.Lock()
+        self._flight = SingleFlight("graph")
+        self.transfer = shared_scheduler(cfg)  # upload bandwidth lanes, shared process-wide
 
         # Robust retries for transient & throttling errors
-        from requests.adapters import HTTPAdapter
-        from urllib3.util import Retry
-
-        retry = Retry(
+        retry = _CountingRetry(
             total=6,
             connect=6,
             read=6,
@@ -31,13 +59,33 @@ class GraphClient:
             status_forcelist=(429, 500, 502, 503, 504),
             allowed_methods=frozenset(["GET","PUT","POST","PATCH"])
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = CachingAdapter(shared_cache(cfg), GRAPH_CACHE_RULES, "graph", max_retries=retry,
+                                 pool_maxsize=32)  # import/backfill workers share this session
         self._sess.mount("https://", adapter)
         self._sess.mount("http://", adapter)
 
+    def reconfigure(self, cfg: Dict, changed):
+        """Apply new settings in place; the session (and its pooled connections) is kept."""
+        self.cfg = cfg
+        if any(k in changed for k in ("graph.tenant_id", "graph.client_id", "graph.client_secret")):
+            self._token = None
+        if any(k.startswith("transfer") for k in changed):
+            self.transfer.configure(cfg)
+        if "graph.drive_id" in changed or "graph.base_url" in changed:
+            with self._cache_lock:
+                self._folder_cache.clear()  # cached paths belong to the old drive
+
     # -------------------- auth --------------------
-    def _get_token(self, force=False) -> str:
-        if self._token and not force:
+    def _get_token(self, force=False, stale: Optional[str] = None) -> str:
+        """Current token; force=True refreshes unless another thread already replaced `stale`."""
+        token = self._token
+        if token and (not force or (stale is not None and token != stale)):
+            return token
+        return self._flight.do("token", self._fetch_token)
+
+    def _fetch_token(self) -> str:
+        if self._token_provider:
+            self._token = self._token_provider()
             return self._token
         g = self.cfg.get("graph", {})
         tenant = g.get("tenant_id"); cid = g.get("client_id"); secret = g.get("client_secret")
@@ -51,31 +99,39 @@ class GraphClient:
         if "access_token" not in result:
             raise RuntimeError(f"MSAL token error: {result}")
         self._token = result["access_token"]
-        self._sess.headers.update({"Authorization": f"Bearer {self._token}"})
         return self._token
 
     def _authed(self):
-        if not self._token:
-            self._get_token()
         return self._sess
 
+    @staticmethod
+    def _with_auth(kwargs, token: str):
+        return dict(kwargs, headers={**(kwargs.get("headers") or {}), "Authorization": f"Bearer {token}"})
+
+    @hot_path("graph.request")
     def _retry_on_401(self, req_fn, *args, **kwargs):
         _default_timeout(kwargs)  # ensure timeouts on every call
-        r = req_fn(*args, **kwargs)
+        method = req_fn.__name__.upper()
+        token = self._get_token()
+        r = req_fn(*args, **self._with_auth(kwargs, token))
+        HTTP_RESPONSES.inc(service="graph", method=method, status=r.status_code)
         if r.status_code in (401, 403):
-            # refresh once
-            self._get_token(force=True)
+            # refresh once (shared with any other thread that hit the same expiry)
+            HTTP_RETRIES.inc(service="graph", reason="auth")
+            token = self._get_token(force=True, stale=token)
             # small jitter before retry
             time.sleep(0.3 + random.random() * 0.7)
-            r = req_fn(*args, **kwargs)
+            r = req_fn(*args, **self._with_auth(kwargs, token))
+            HTTP_RESPONSES.inc(service="graph", method=method, status=r.status_code)
         return r
 
     # -------------------- utils --------------------
     def _drive_base(self) -> str:
-        drive_id = self.cfg.get("graph", {}).get("drive_id")
+        g = self.cfg.get("graph", {})
+        drive_id = g.get("drive_id")
         if not drive_id:
             raise RuntimeError("graph.drive_id missing in config")
-        return f"{GRAPH}/drives/{drive_id}"
+        return f"{(g.get('base_url') or GRAPH).rstrip('/')}/drives/{drive_id}"
 
     @staticmethod
     def _norm_rel(path: str) -> str:
@@ -95,51 +151,152 @@ class GraphClient:
         if rel in self._folder_cache:
             return
 
-        parts = rel.split("/")
         built = ""
-        for seg in parts:
+        for seg in rel.split("/"):
             built = f"{built}/{seg}" if built else seg
             if built in self._folder_cache:
                 continue
+            # two files for the same new customer ensure the same path: one request
+            self._flight.do(("ensure", built.lower()), self._ensure_one, built, seg)
 
-            # GET the node; if 404, create it
-            url_get = f"{self._drive_base()}/root:/{built}"
-            r = self._retry_on_401(self._authed().get, url_get)
-            if r.status_code == 200:
-                self._folder_cache.add(built)
-                continue
-            if r.status_code == 404:
-                parent = os.path.dirname(built)
-                if parent and parent != ".":
-                    parent_url = f"{self._drive_base()}/root:/{parent}:/children"
-                else:
-                    parent_url = f"{self._drive_base()}/root:/children"
-                body = {"name": seg, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
-                rc = self._retry_on_401(self._authed().post, parent_url, json=body)
-                if rc.status_code not in (200, 201):
-                    raise RuntimeError(f"ensure_folder create failed {rc.status_code} {rc.text} for {built}")
-                self._folder_cache.add(built)
+    def _ensure_one(self, built: str, seg: str):
+        # GET the node; if 404, create it
+        url_get = f"{self._drive_base()}/root:/{built}"
+        r = self._retry_on_401(self._authed().get, url_get)
+        if r.status_code == 404:
+            parent = os.path.dirname(built)
+            if parent and parent != ".":
+                parent_url = f"{self._drive_base()}/root:/{parent}:/children"
             else:
-                # network/timeouts show up here via requests exceptions, but if Graph returns 5xx, bubble up
-                raise RuntimeError(
-                    f"ensure_folder get failed {r.status_code} {r.text} for {built}"
-                )
+                parent_url = f"{self._drive_base()}/root/children"
+            body = {"name": seg, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+            r = self._retry_on_401(self._authed().post, parent_url, json=body)
+            # 409: created meanwhile by another process, which is what we wanted
+            if r.status_code not in (200, 201, 409):
+                raise GraphError(f"ensure_folder create failed {r.status_code} {r.text} for {built}",
+                                 r.status_code)
+        elif r.status_code != 200:
+            # network/timeouts show up here via requests exceptions, but if Graph returns 5xx, bubble up
+            raise GraphError(f"ensure_folder get failed {r.status_code} {r.text} for {built}", r.status_code)
+        with self._cache_lock:
+            self._folder_cache.add(built)
+
+    def create_folder(self, parent_id: str, name: str) -> Dict:
+        """
+        Create folder `name` under the item `parent_id` and return its driveItem.
+        If it already exists (409 with conflictBehavior=fail) the existing item is returned.
+        """
+        return self._flight.do(("create", parent_id, name.lower()), self._create_folder, parent_id, name)
+
+    def _create_folder(self, parent_id: str, name: str) -> Dict:
+        url = f"{self._drive_base()}/items/{parent_id}/children"
+        body = {"name": name, "folder": {}, "@microsoft.graph.conflictBehavior": "fail"}
+        r = self._retry_on_401(self._authed().post, url, json=body)
+        if r.status_code in (200, 201):
+            return r.json()
+        if r.status_code == 409:
+            rg = self._retry_on_401(self._authed().get, f"{self._drive_base()}/items/{parent_id}:/{name}")
+            if rg.status_code == 200:
+                return rg.json()
+            r = rg
+        raise GraphError(f"create_folder failed {r.status_code} {r.text} for {name} under {parent_id}",
+                         r.status_code)
 
     # -------------------- files --------------------
-    def upload_small(self, target_path: str, local_file: str):
+    def upload_small(self, target_path: str, local_file: str, priority: str = "ingest"):
         """
-        Upload a small file (<= 4 MiB) to the drive at target_path.
+        Upload a file to the drive at target_path (files over 4 MiB use an upload session).
+        priority is the transfer lane: "interactive", "ingest" or "backfill".
         """
         rel = self._norm_rel(target_path)  # e.g. 'Downloads/myfile.jpg'
         parent = os.path.dirname(rel)
         if parent and parent != ".":
             self.ensure_folder(parent)
+        return self._upload(f"{self._drive_base()}/root:/{rel}:", local_file, rel, priority=priority)
+
+    def upload_to_folder(self, parent_id: str, name: str, local_file: str, conflict: str = "replace",
+                         priority: str = "ingest"):
+        """Upload local_file as `name` directly into the folder item `parent_id`."""
+        return self._upload(f"{self._drive_base()}/items/{parent_id}:/{name}:", local_file, name, conflict, priority)
+
+    def _upload(self, item_ref: str, local_file: str, label: str, conflict: str = "replace",
+                priority: str = "ingest"):
+        size = os.path.getsize(local_file)
+        with span("graph_upload"):
+            if size <= SIMPLE_UPLOAD_MAX:
+                with open(local_file, "rb") as fh:
+                    r = self._retry_on_401(self._authed().put, f"{item_ref}/content",
+                                           data=ShapedReader(fh, self.transfer, priority),
+                                           params={"@microsoft.graph.conflictBehavior": conflict})
+            else:
+                r = self._upload_session(item_ref, local_file, size, conflict, priority)
+        if r.status_code not in (200, 201):
+            raise GraphError(f"upload_small failed: {r.status_code} {r.text}\nTarget: {label}", r.status_code)
+        BYTES.inc(size, service="graph", direction="up")
+        return r.json()
 
-        url = f"{self._drive_base()}/root:/{rel}:/content"
+    def _upload_session(self, item_ref: str, local_file: str, size: int, conflict: str, priority: str):
+        body = {"item": {"@microsoft.graph.conflictBehavior": conflict}}
+        rs = self._retry_on_401(self._authed().post, f"{item_ref}/createUploadSession", json=body)
+        if rs.status_code not in (200, 201):
+            return rs
+        upload_url = rs.json()["uploadUrl"]
+        r = rs
         with open(local_file, "rb") as fh:
-            r = self._retry_on_401(self._authed().put, url, data=fh)
+            offset = 0
+            while offset < size:
+                chunk = fh.read(SESSION_CHUNK)
+                end = offset + len(chunk) - 1
+                # the upload URL is pre-authorised: sent directly, without our bearer token
+                body = ShapedReader(io.BytesIO(chunk), self.transfer, priority)
+                r = self._sess.put(upload_url, data=body, timeout=(12, 120), headers={
+                    "Content-Length": str(len(chunk)),
+                    "Content-Range": f"bytes {offset}-{end}/{size}"})
+                HTTP_RESPONSES.inc(service="graph", method="PUT", status=r.status_code)
+                if r.status_code not in (200, 201, 202):
+                    self._sess.delete(upload_url, timeout=(12, 45))
+                    return r
+                offset = end + 1
+        return r
+
+    def read_small(self, path: str) -> Optional[Tuple[bytes, str]]:
+        """(content, eTag) of a small file at drive path, or None if there is no such file."""
+        rel = self._norm_rel(path)
+        # metadata first: if the file changes in between, the older eTag only makes a later If-Match fail
+        r = self._retry_on_401(self._authed().get, f"{self._drive_base()}/root:/{rel}")
+        if r.status_code == 404:
+            return None
+        if r.status_code != 200:
+            raise GraphError(f"read_small failed: {r.status_code} {r.text}", r.status_code)
+        etag = r.json().get("eTag", "")
+        r = self._retry_on_401(self._authed().get, f"{self._drive_base()}/root:/{rel}:/content")
+        if r.status_code == 404:
+            return None
+        if r.status_code != 200:
+            raise GraphError(f"read_small failed: {r.status_code} {r.text}", r.status_code)
+        BYTES.inc(len(r.content), service="graph", direction="down")
+        return r.content, etag
+
+    def write_small(self, path: str, data: bytes, if_match: Optional[str] = None) -> Optional[Dict]:
+        """
+        Create or replace a small file at drive path from memory. if_match="" only creates
+        it; an eTag only replaces that version. None when that condition did not hold.
+        """
+        rel = self._norm_rel(path)
+        parent = os.path.dirname(rel)
+        if parent and parent != ".":
+            self.ensure_folder(parent)
+        headers = {"Content-Type": "application/octet-stream"}
+        if if_match:
+            headers["If-Match"] = if_match
+        r = self._retry_on_401(self._authed().put, f"{self._drive_base()}/root:/{rel}:/content", data=data,
+                               headers=headers,
+                               params={"@microsoft.graph.conflictBehavior": "fail" if if_match == "" else "replace"})
+        if r.status_code in (409, 412):
+            return None
         if r.status_code not in (200, 201):
-            raise RuntimeError(f"upload_small failed: {r.status_code} {r.text}\nTarget: {rel}")
+            raise GraphError(f"write_small failed: {r.status_code} {r.text}\nTarget: {rel}", r.status_code)
+        BYTES.inc(len(data), service="graph", direction="up")
         return r.json()
 
     def move_item(self, item_id: str, new_parent_id: str, new_name: Optional[str] = None):
@@ -149,11 +306,37 @@ class GraphClient:
             data["name"] = new_name
         r = self._retry_on_401(self._authed().patch, url, json=data)
         if r.status_code not in (200, 201):
-            raise RuntimeError(f"move_item failed: {r.status_code} {r.text}")
+            raise GraphError(f"move_item failed: {r.status_code} {r.text}", r.status_code)
         return r.json()
 
+    def delete_item(self, item_id: str):
+        r = self._retry_on_401(self._authed().delete, f"{self._drive_base()}/items/{item_id}")
+        if r.status_code not in (204, 404):  # already gone is fine
+            raise GraphError(f"delete_item failed: {r.status_code} {r.text}", r.status_code)
+
+    def list_children(self, path: Optional[str] = None, item_id: Optional[str] = None,
+                      page_size: int = 999) -> Iterator[Dict]:
+        """Yield every child of a folder (by drive path or item id), following @odata.nextLink."""
+        if item_id:
+            url = f"{self._drive_base()}/items/{item_id}/children"
+        else:
+            rel = self._norm_rel(path)
+            url = f"{self._drive_base()}/root:/{rel}:/children" if rel else f"{self._drive_base()}/root/children"
+        params = {"$top": page_size, "$select": "id,name,size,file,folder,parentReference"}
+        while url:
+            r = self._retry_on_401(self._authed().get, url, params=params)
+            if r.status_code != 200:
+                raise GraphError(f"list_children failed: {r.status_code} {r.text}", r.status_code)
+            payload = r.json()
+            yield from payload.get("value", [])
+            url = payload.get("@odata.nextLink")
+            params = None  # nextLink already carries the query
+
     def get_by_path(self, path: str):
         rel = self._norm_rel(path)
+        return self._flight.do(("path", rel.lower()), self._get_by_path, rel)
+
+    def _get_by_path(self, rel: str):
         url = f"{self._drive_base()}/root:/{rel}"
         r = self._retry_on_401(self._authed().get, url)
         return r.json() if r.status_code == 200 else None
@@ -0,0 +1,229 @@
+"""
+Operation history: one row per rename, upload, move, import and Jotform
+ingest, in ~/.sloan_suite/history.db (SQLite, WAL).
+
+record() only puts a tuple on a queue; a writer thread inserts in batches of
+up to BATCH_MAX rows per transaction, the same way utils.log writes sloan.log.
+Lookups go through indexes on customer, names, time and drive item id, plus
+an FTS5 index over names/customer/keyword when SQLite has it, so "where did
+this file go" answers in milliseconds however long the table gets.
+"""
+import atexit, os, queue, sqlite3, threading, time
+from typing import Dict, List, Optional
+
+from ..config import APP_DIR
+from ..utils.driveitem import drive_path
+from ..utils.log import get_logger
+
+HISTORY_PATH = os.path.join(APP_DIR, "history.db")
+BATCH_MAX = 1000
+FLUSH_INTERVAL = 0.5
+
+FIELDS = ("ts", "kind", "source", "orig_name", "new_name", "customer", "keyword",
+          "item_id", "dest_path", "local_path", "duration_ms", "outcome", "detail")
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS ops (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        kind TEXT NOT NULL,                 -- rename | upload | move | import | jotform
+        source TEXT,                        -- tray | serve | import | organize | jotform
+        orig_name TEXT COLLATE NOCASE,
+        new_name TEXT COLLATE NOCASE,
+        customer TEXT COLLATE NOCASE,
+        keyword TEXT,
+        item_id TEXT,
+        dest_path TEXT,
+        local_path TEXT,
+        duration_ms REAL,
+        outcome TEXT NOT NULL,              -- ok | error | conflict | ...
+        detail TEXT)""",
+    "CREATE INDEX IF NOT EXISTS ix_ops_customer ON ops(customer, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_ops_new_name ON ops(new_name)",
+    "CREATE INDEX IF NOT EXISTS ix_ops_orig_name ON ops(orig_name)",
+    "CREATE INDEX IF NOT EXISTS ix_ops_ts ON ops(ts)",
+    "CREATE INDEX IF NOT EXISTS ix_ops_item ON ops(item_id)",
+)
+# external-content FTS: no second copy of the text, kept current by the trigger
+_FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS ops_fts USING fts5(
+        orig_name, new_name, customer, keyword, content='ops', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS ops_ai AFTER INSERT ON ops BEGIN
+        INSERT INTO ops_fts(rowid, orig_name, new_name, customer, keyword)
+        VALUES (new.id, new.orig_name, new.new_name, new.customer, new.keyword);
+    END""",
+)
+
+_log = get_logger("history")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # WAL + NORMAL: durable across app crashes, not power loss
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _like_prefix(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _fts_query(text: str) -> str:
+    # every word must match as a prefix: "smith qt" -> "smith"* "qt"*
+    words = [w.replace('"', '""') for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def item_fields(item: Optional[Dict]) -> Dict:
+    """item_id / new_name / dest_path from a Graph driveItem (upload or move response)."""
+    if not item:
+        return {}
+    out = {"item_id": item.get("id"), "new_name": item.get("name")}
+    if item.get("parentReference"):
+        out["dest_path"] = drive_path(item)
+    return out
+
+
+class History:
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.fts = False
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = _connect(self.path)
+        try:
+            with conn:
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                try:
+                    for stmt in _FTS_SCHEMA:
+                        conn.execute(stmt)
+                    self.fts = True
+                except sqlite3.OperationalError as ex:  # SQLite built without FTS5
+                    _log.info(f"History full-text index unavailable ({ex}); using name prefixes")
+        finally:
+            conn.close()
+
+    # -------------------- writing --------------------
+    def record(self, kind: str, outcome: str = "ok", **fields):
+        """Queue one row (never blocks). Keys are FIELDS; unknown keys are ignored."""
+        fields.setdefault("ts", time.time())
+        fields["kind"], fields["outcome"] = kind, outcome
+        if self._writer is None:
+            self._start_writer()
+        self._q.put(tuple(fields.get(f) for f in FIELDS))
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="sloan-history-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        conn = _connect(self.path)
+        sql = f"INSERT INTO ops ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})"
+        while True:
+            try:
+                batch = [self._q.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [r for r in batch if not isinstance(r, threading.Event)]
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(sql, rows)
+                except sqlite3.Error as ex:
+                    # history must never take the app down; drop the batch
+                    _log.warning(f"History write failed, {len(rows)} rows dropped: {ex}")
+            for ev in batch:
+                if isinstance(ev, threading.Event):
+                    ev.set()
+
+    def flush(self, timeout: float = 2.0):
+        """Block until everything recorded so far is committed."""
+        if self._writer is None:
+            return
+        ev = threading.Event()
+        self._q.put(ev)
+        ev.wait(timeout)
+
+    # -------------------- reading --------------------
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def search(self, text: str = "", customer: str = "", item_id: str = "", kind: str = "",
+               since: Optional[float] = None, until: Optional[float] = None, limit: int = 50) -> List[Dict]:
+        """
+        Newest first. `text` matches words in either name, the customer or the
+        keyword; `customer` is a case-insensitive prefix; since/until are unix times.
+        """
+        where, args, src = [], [], "ops"
+        text = text.strip()
+        if text and self.fts:
+            # driven from the FTS side so its rowid order (== ops.id) needs no sort
+            src = "ops_fts JOIN ops ON ops.id = ops_fts.rowid"
+            where.append("ops_fts MATCH ?")
+            args.append(_fts_query(text))
+        elif text:
+            where.append("(ops.new_name LIKE ? ESCAPE '\\' OR ops.orig_name LIKE ? ESCAPE '\\')")
+            args += [_like_prefix(text)] * 2
+        if customer:
+            where.append("ops.customer LIKE ? ESCAPE '\\'")
+            args.append(_like_prefix(customer))
+        if item_id:
+            where.append("ops.item_id = ?")
+            args.append(item_id)
+        if kind:
+            where.append("ops.kind = ?")
+            args.append(kind)
+        if since is not None:
+            where.append("ops.ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ops.ts < ?")
+            args.append(until)
+        sql = f"SELECT ops.* FROM {src}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # ids are assigned in insert order, so this is newest first without a sort
+        sql += f" ORDER BY {'ops_fts.rowid' if src != 'ops' else 'ops.id'} DESC LIMIT ?"
+        args.append(int(limit))
+        return [dict(r) for r in self._reader().execute(sql, args)]
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT max(id) FROM ops").fetchone()[0] or 0
+
+
+_shared: Optional[History] = None
+_shared_lock = threading.Lock()
+
+
+def shared_history(cfg) -> Optional[History]:
+    """The process-wide history (None when history.enabled is false or the db cannot be opened)."""
+    global _shared
+    if not (cfg.get("history", {}) or {}).get("enabled", True):
+        return None
+    with _shared_lock:
+        if _shared is None:
+            try:
+                _shared = History()
+            except sqlite3.Error as ex:
+                _log.warning(f"History disabled: {ex}")
+                return None
+        return _shared
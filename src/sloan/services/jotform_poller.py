@@ -1,12 +1,44 @@
-import os, time, uuid, shutil, traceback
+import os, tempfile, time, uuid, shutil, traceback
 from datetime import datetime, timezone
 from typing import Dict, List, Tuple, Optional
 import threading, requests
 
-from ..config import DATE_FMT_DEFAULT, load_config, save_config
+from ..config import DATE_FMT_DEFAULT, touches, update_config
+from ..naming import Namer
+from ..utils.httpcache import JOTFORM_CACHE_RULES, CachingAdapter, shared_cache
+from ..utils.jsonstream import JsonArrayStream
+from ..utils.log import get_logger
+from ..utils.metrics import HTTP_RESPONSES, ITEMS, observe_stage, span
 from ..utils.sanitize import sanitize_name
+from .downloads import Downloader
+from .history import item_fields, shared_history
+from .lease import LeaseManager
+from .transform import Transformer, shared_transformer
 
 JF_BASE = "https://api.jotform.com"
+PAGE_MIN, PAGE_MAX = 20, 1000   # Jotform caps limit at 1000
+PAGE_TARGET_S = 2.0             # aim for pages that come back within this
+SPOOL_MAX = 1024 * 1024         # page bodies larger than this are spooled to disk
+
+class PageSizer:
+    """
+    Picks the submissions page size. Steady state (nothing new) stays at
+    PAGE_MIN; a full page means there is a backlog, so the next page doubles
+    while the server keeps answering within PAGE_TARGET_S, and halves when it
+    gets slower than twice that.
+    """
+    def __init__(self, lo: int = PAGE_MIN, hi: int = PAGE_MAX, target_s: float = PAGE_TARGET_S):
+        self.lo, self.hi, self.target_s = lo, hi, target_s
+        self.limit = lo
+
+    def update(self, returned: int, seconds: float) -> int:
+        if seconds > 2 * self.target_s:
+            self.limit = max(self.lo, self.limit // 2)
+        elif returned < self.limit:
+            self.limit = self.lo          # caught up; next round starts small
+        elif seconds < self.target_s:
+            self.limit = min(self.hi, self.limit * 2)
+        return self.limit
 
 def _safe_date(fmt: str) -> str:
     try:
@@ -82,159 +114,301 @@ class JotformPoller(threading.Thread):
       - uploads to SharePoint Downloads (stage_to_sharepoint=True), or
       - drops into local watch folder (stage_to_sharepoint=False)
     Names files per spec: {Customer} InitialP|FinalP {index} {Date}.{ext}
+    With coordination enabled, only the PC holding a form's lease polls it (see lease.py).
     """
-    def __init__(self, cfg: Dict, graph_client, stop_evt: threading.Event, log_fn):
+    def __init__(self, cfg: Dict, graph_client, stop_evt: threading.Event, log_fn=None):
         super().__init__(daemon=True)
         self.cfg = cfg
         self.graph = graph_client
         self.stop_evt = stop_evt
-        self.log = log_fn
+        self.log = log_fn or get_logger("jotform")
+        self._wake = threading.Event()
+        self._cursors: Dict[str, str] = dict(cfg.get("jotform", {}).get("cursors") or {})
+        self._sess: Optional[requests.Session] = None
+        self._idle_reason: Optional[str] = None
+        self._sizers: Dict[str, PageSizer] = {}  # per form
+        self.transformer = shared_transformer(cfg)
+        self.downloads = Downloader(cfg, stop_evt)
+        self.leases = LeaseManager(cfg, graph_client, stop_evt)
+
+    def reconfigure(self, cfg: Dict, changed):
+        """
+        Swap in new settings without restarting the thread. The HTTP session and
+        cursors are kept; a changed form list, key or interval takes effect on the
+        next round, which starts right away unless a round is in progress.
+        """
+        self.cfg = cfg
+        self.downloads.configure(cfg)
+        self.leases.configure(cfg)
+        # Only adopt cursors for forms we have not seen: ours are newer than
+        # anything we wrote to config earlier.
+        for form_id, sid in (cfg.get("jotform", {}).get("cursors") or {}).items():
+            self._cursors.setdefault(form_id, sid)
+        if touches({c for c in changed if not c.startswith("jotform.cursors")}, "jotform"):
+            self._wake.set()
+
+    def wake(self):
+        """Cut the current sleep short (used on reconfigure and shutdown)."""
+        self._wake.set()
+
+    def _session(self, api_key: str) -> requests.Session:
+        if self._sess is None:
+            self._sess = requests.Session()
+            self._sess.headers.update({"User-Agent": "SloanSuite/1.0"})
+            adapter = CachingAdapter(shared_cache(self.cfg), JOTFORM_CACHE_RULES, "jotform")
+            self._sess.mount("https://", adapter)
+            self._sess.mount("http://", adapter)
+        self._sess.params = {"apiKey": api_key}
+        return self._sess
+
+    def _spool(self, r: requests.Response, spool):
+        """Copy the page body into `spool`, close the response and rewind."""
+        with r:
+            try:
+                for chunk in r.iter_content(64 * 1024):
+                    spool.write(chunk)
+            except requests.RequestException as ex:
+                self.log(f"[JOTFORM] Page download interrupted after {spool.tell()} bytes: {ex}")
+        spool.seek(0)
+
+    def _stream(self, page: JsonArrayStream):
+        # A page cut off mid-way ends short: the submissions that arrived are
+        # processed and the round saves the cursor reached so far.
+        try:
+            yield from page
+        except (OSError, ValueError) as ex:
+            self.log(f"[JOTFORM] Page stream interrupted after {page.count} submissions: {ex}")
+
+    def _drop_staged(self, staged: List):
+        """Remove the downloads (and transformed copies) of a submission that stopped part-way."""
+        for _, _, local_tmp, fut in staged:
+            if fut is not None and not fut.cancel():
+                Transformer.cleanup(local_tmp, self.transformer.finish(local_tmp, fut))
+            try: os.remove(local_tmp)
+            except Exception: pass
+
+    def _record(self, orig_name: str, customer: str, kind: str, sid: str, error: Optional[Exception] = None,
+                **fields):
+        history = shared_history(self.cfg)
+        if history is not None:
+            history.record("jotform", "ok" if error is None else "error", source="jotform", orig_name=orig_name,
+                           customer=customer, keyword=kind,
+                           detail=f"submission {sid}" + (f": {error}" if error is not None else ""), **fields)
+
+    def _idle(self, reason: str):
+        # log once per state change rather than every poll
+        if reason != self._idle_reason:
+            self.log(reason)
+        self._idle_reason = reason
 
     def run(self):
-        jf = self.cfg.get("jotform", {}) or {}
-        if not jf.get("enabled"):
-            self.log("[JOTFORM] Disabled"); return
-        api_key = jf.get("api_key")
-        if not api_key:
-            self.log("[JOTFORM] No API key configured"); return
-
-        poll_s = int(jf.get("poll_seconds", jf.get("poll_seconds", 180)))
+        while not self.stop_evt.is_set():
+            cfg = self.cfg
+            jf = cfg.get("jotform", {}) or {}
+            poll_s = int(jf.get("poll_seconds", 180))
+            if not jf.get("enabled"):
+                self._idle("[JOTFORM] Disabled")
+            elif not jf.get("api_key"):
+                self._idle("[JOTFORM] No API key configured")
+            elif not (jf.get("measure_sheet_form_id") or jf.get("completion_form_id")):
+                self._idle("[JOTFORM] No form IDs configured")
+            else:
+                try:
+                    self.poll_once(cfg)
+                except Exception as ex:
+                    self.log(f"[JOTFORM] Error {ex}\n{traceback.format_exc()}")
+
+            # Sleep until next poll (or until reconfigured / stopped)
+            self._wake.wait(poll_s)
+            self._wake.clear()
+        if self.leases.enabled:
+            self.leases.release_all()  # a standby PC takes over on its next round
+
+    def poll_once(self, cfg: Dict):
+        jf = cfg.get("jotform", {}) or {}
         measure_id = jf.get("measure_sheet_form_id")
         completion_id = jf.get("completion_form_id")
         stage_spo = bool(jf.get("stage_to_sharepoint", True))
+        sess = self._session(jf.get("api_key"))
+        base = (jf.get("base_url") or JF_BASE).rstrip("/")
 
-        if not (measure_id or completion_id):
-            self.log("[JOTFORM] No form IDs configured"); return
+        forms = [(form_id, kind) for form_id, kind in ((measure_id, "InitialP"), (completion_id, "FinalP")) if form_id]
+        leases = self.leases if self.leases.enabled else None
+        if leases is not None:
+            # the first PC to see a form free takes it; the cursor travels with the lease
+            seeds = {key: self._cursors.get(form_id, "") for form_id, _ in forms for key in leases.keys(form_id)}
+            held = leases.claim(list(seeds), seeds)
+            if not held:
+                self._idle("[JOTFORM] Standby: another PC holds the forms")
+                return
+        self._idle_reason = None
 
-        cursors: Dict[str, str] = (jf.get("cursors") or {}).copy()
-
-        sess = requests.Session()
-        sess.headers.update({"User-Agent": "SloanSuite/1.0"})
-        sess.params = {"apiKey": api_key}
-
-        limit = 50
+        for form_id, kind in forms:
+            if leases is not None:
+                cursors = {key: leases.cursor(key) for key in leases.keys(form_id) if key in held}
+                if not cursors:
+                    continue
+            else:
+                cursors = {form_id: self._cursors.get(form_id, "")}
+            offset = 0
+            newest: Dict[str, str] = {}  # per cursor key, newest id seen this round
+            index_counter = 0  # numbering within each submission
+            sizer = self._sizers.setdefault(form_id, PageSizer())
 
-        while not self.stop_evt.is_set():
-            try:
-                for form_id, kind in ((measure_id, "InitialP"), (completion_id, "FinalP")):
-                    if not form_id:
-                        continue
-
-                    last_id = cursors.get(form_id, "")
-                    offset = 0
-                    newest_id_this_round: Optional[str] = None
-                    index_counter = 0  # numbering within each submission
-
-                    while not self.stop_evt.is_set():
-                        url = f"{JF_BASE}/form/{form_id}/submissions"
-                        params = {
-                            "limit": limit,
-                            "offset": offset,
-                            "orderby": "created_at",  # ascending
-                        }
-                        r = sess.get(url, params=params, timeout=30)
-                        if r.status_code != 200:
-                            self.log(f"[JOTFORM] Fetch failed {r.status_code} {r.text}")
-                            break
+            while not self.stop_evt.is_set():
+                url = f"{base}/form/{form_id}/submissions"
+                limit = sizer.limit
+                params = {
+                    "limit": limit,
+                    "offset": offset,
+                    "orderby": "created_at",  # ascending
+                }
+                t_fetch = time.perf_counter()
+                with span("jf_fetch"):
+                    r = sess.get(url, params=params, timeout=30, stream=True)
+                HTTP_RESPONSES.inc(service="jotform", method="GET", status=r.status_code)
+                if r.status_code != 200:
+                    self.log(f"[JOTFORM] Fetch failed {r.status_code} {r.text}")
+                    r.close()
+                    break
 
-                        payload = r.json() or {}
-                        items = payload.get("content") or []
-                        if not items:
+                # The body is spooled (to disk past SPOOL_MAX) and the response closed:
+                # downloads and uploads take minutes, and the connection must not sit
+                # open (and get cut) meanwhile. Submissions are then parsed off the
+                # spool one at a time as they are processed, so memory stays flat
+                # however large the page is.
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX) as spool:
+                    self._spool(r, spool)
+                    fetch_s = time.perf_counter() - t_fetch
+                    page = JsonArrayStream(iter(lambda: spool.read(64 * 1024), b""), "content")
+                    for sub in self._stream(page):
+                        if self.stop_evt.is_set():
                             break
+                        sid = str(sub.get("id") or "")
+                        if not sid:
+                            continue
+                        key = leases.key_for(form_id, sid) if leases is not None else form_id
+                        if key not in cursors:
+                            continue  # another PC's shard
+                        # Skip if we have already processed this id
+                        last_id = cursors[key]
+                        if last_id and sid <= last_id:
+                            continue
+                        if leases is not None and not leases.holds(key):
+                            continue  # lease ran out mid-round; whoever takes it over carries on
 
-                        for sub in items:
-                            sid = str(sub.get("id") or "")
-                            if not sid:
-                                continue
-                            # Skip if we have already processed this id
-                            if last_id and sid <= last_id:
-                                continue
+                        # Track newest id we see in this loop
+                        if sid > newest.get(key, ""):
+                            newest[key] = sid
+                        t_sub = time.perf_counter()
 
-                            # Track newest id we see in this loop
-                            if not newest_id_this_round or sid > newest_id_this_round:
-                                newest_id_this_round = sid
+                        customer = _extract_customer(sub)
+                        date_str = _safe_date(cfg.get("date_format", DATE_FMT_DEFAULT))
 
-                            customer = _extract_customer(sub)
-                            date_str = _safe_date(self.cfg.get("date_format", DATE_FMT_DEFAULT))
-
-                            # 1) Download uploaded files
-                            files = _extract_files(sub)
+                        # 1) Download uploaded files. Photos start transforming as soon as
+                        # they land, so the next download overlaps the encode.
+                        files = _extract_files(sub)
+                        staged = []
+                        fname = ""
+                        try:
                             for idx, (fname, url_download) in enumerate(files, start=1):
                                 index_counter = idx
                                 local_tmp = os.path.join(os.path.expanduser("~/.sloan_suite"),
                                                          f"jtf_{uuid.uuid4().hex}_{os.path.basename(fname)}")
-                                with sess.get(url_download, stream=True, timeout=60) as resp:
-                                    resp.raise_for_status()
-                                    _ensure_dir(local_tmp)
-                                    with open(local_tmp, "wb") as out:
-                                        shutil.copyfileobj(resp.raw, out)
+                                # resumes a part left by an earlier round that was cut off
+                                with span("jf_download"):
+                                    self.downloads.fetch(sess, url_download, local_tmp)
 
                                 ext = os.path.splitext(local_tmp)[1]
                                 clean_customer = sanitize_name(customer)
                                 clean_kind = sanitize_name(kind)
                                 clean_idx = sanitize_name(str(idx))
-                                clean_date = sanitize_name(date_str)
+                                # a photo's own date beats the poll date when date_source is "capture"
+                                clean_date = sanitize_name(Namer(cfg).date_for(local_tmp) or date_str)
 
                                 new_name = sanitize_name(
                                     f"{clean_customer} {clean_kind} {clean_idx} {clean_date}") + ext
 
                                 if stage_spo:
-                                    dl = self.cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads").strip(
+                                    dl = cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads").strip(
                                         "/")
                                     sp_path = f"{dl}/{new_name}"  # e.g., 'Downloads/John Doe InitialP 1 2025-10-03.jpg'
-                                    self.graph.upload_small(sp_path, local_tmp)
-                                    try: os.remove(local_tmp)
-                                    except Exception: pass
+                                    staged.append((fname, sp_path, local_tmp, self.transformer.submit(local_tmp, kind)))
                                 else:
-                                    dest = os.path.join(self.cfg.get("watch_folder", os.path.expanduser("~")), new_name)
+                                    dest = os.path.join(cfg.get("watch_folder", os.path.expanduser("~")), new_name)
                                     _ensure_dir(dest)
                                     shutil.move(local_tmp, dest)
+                                    self._record(fname, customer, kind, sid, new_name=new_name, local_path=dest)
 
-                            # 2) Download the generated PDF for the submission
-                            try:
-                                pdf_url = f"{JF_BASE}/submission/{sid}/pdf"
-                                with sess.get(pdf_url, stream=True, timeout=60) as resp:
-                                    if resp.status_code == 200:
-                                        local_pdf = os.path.join(os.path.expanduser("~/.sloan_suite"),
-                                                                 f"jtf_{uuid.uuid4().hex}_{sid}.pdf")
-                                        _ensure_dir(local_pdf)
-                                        with open(local_pdf, "wb") as out:
-                                            shutil.copyfileobj(resp.raw, out)
-                                        # Name the PDF. You can change to "{Customer} Measure Sheet {Date}.pdf" if preferred.
-                                        pdf_idx = (index_counter + 1) if index_counter else 1
-                                        pdf_name = f"{customer} {kind} {pdf_idx} {date_str}.pdf"
-                                        if stage_spo:
-                                            dl = self.cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")
-                                            sp_pdf_path = f"{dl}/{pdf_name}"
-                                            self.graph.upload_small(sp_pdf_path, local_pdf)
-                                            try: os.remove(local_pdf)
-                                            except Exception: pass
-                                        else:
-                                            dest = os.path.join(self.cfg.get("watch_folder", os.path.expanduser("~")), pdf_name)
-                                            _ensure_dir(dest)
-                                            shutil.move(local_pdf, dest)
-                            except Exception as pdf_ex:
-                                self.log(f"[JOTFORM] PDF fetch skipped {sid}: {pdf_ex}")
-
-                            self.log(f"[JOTFORM] Processed submission {sid} for {customer} ({kind})")
-
-                        # Next page
-                        if len(items) < limit:
-                            break
-                        offset += limit
-
-                    # After finishing this form round, persist the newest id we saw
-                    if newest_id_this_round:
-                        # Reload config, update cursor, save
-                        cfg_live = load_config()
-                        cfg_live.setdefault("jotform", {}).setdefault("cursors", {})
-                        cfg_live["jotform"]["cursors"][form_id] = newest_id_this_round
-                        save_config(cfg_live)
-                        # Also keep our in-memory copy current
-                        cursors[form_id] = newest_id_this_round
-
-            except Exception as ex:
-                self.log(f"[JOTFORM] Error {ex}\n{traceback.format_exc()}")
-
-            # Sleep until next poll
-            self.stop_evt.wait(poll_s)
+                            while staged:
+                                fname, sp_path, local_tmp, fut = staged.pop(0)
+                                src = self.transformer.finish(local_tmp, fut)
+                                try:
+                                    with span("jf_upload"):
+                                        up = self.graph.upload_small(sp_path, src)
+                                finally:
+                                    Transformer.cleanup(local_tmp, src)
+                                    try: os.remove(local_tmp)
+                                    except Exception: pass
+                                self._record(fname, customer, kind, sid, **item_fields(up))
+                        except Exception as ex:
+                            # the submission is retried next round (its cursor is not saved)
+                            self._record(fname, customer, kind, sid, error=ex)
+                            ITEMS.inc(stage="jf_submission", outcome="error")
+                            raise
+                        finally:
+                            self._drop_staged(staged)  # a later download or upload failed
+
+                        # 2) Download the generated PDF for the submission
+                        try:
+                            pdf_url = f"{base}/submission/{sid}/pdf"
+                            local_pdf = os.path.join(os.path.expanduser("~/.sloan_suite"),
+                                                     f"jtf_{uuid.uuid4().hex}_{sid}.pdf")
+                            with span("jf_download"):
+                                self.downloads.fetch(sess, pdf_url, local_pdf)
+                            # Name the PDF. You can change to "{Customer} Measure Sheet {Date}.pdf" if preferred.
+                            pdf_idx = (index_counter + 1) if index_counter else 1
+                            pdf_name = f"{customer} {kind} {pdf_idx} {date_str}.pdf"
+                            if stage_spo:
+                                dl = cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")
+                                sp_pdf_path = f"{dl}/{pdf_name}"
+                                with span("jf_upload"):
+                                    up = self.graph.upload_small(sp_pdf_path, local_pdf)
+                                try: os.remove(local_pdf)
+                                except Exception: pass
+                                self._record(f"{sid}.pdf", customer, kind, sid, **item_fields(up))
+                            else:
+                                dest = os.path.join(cfg.get("watch_folder", os.path.expanduser("~")), pdf_name)
+                                _ensure_dir(dest)
+                                shutil.move(local_pdf, dest)
+                                self._record(f"{sid}.pdf", customer, kind, sid, new_name=pdf_name,
+                                             local_path=dest)
+                        except Exception as pdf_ex:
+                            self.log(f"[JOTFORM] PDF fetch skipped {sid}: {pdf_ex}")
+                            self._record(f"{sid}.pdf", customer, kind, sid, error=pdf_ex)
+
+                        observe_stage("jf_submission", time.perf_counter() - t_sub)
+                        ITEMS.inc(stage="jf_submission", outcome="ok")
+                        self.log(f"[JOTFORM] Processed submission {sid} for {customer} ({kind})")
+
+                returned = page.count
+                if not returned:
+                    break
+                sizer.update(returned, fetch_s)
+                # Next page
+                if returned < limit:
+                    break
+                offset += returned
+
+            # After finishing this form round, persist the newest id we saw
+            for key, sid in newest.items():
+                if leases is not None and not leases.advance(key, sid):
+                    self.log(f"[JOTFORM] Lease {key} was lost before its cursor {sid} was saved")
+            if newest and (leases is None or leases.shards == 1):
+                newest_id_this_round = max(newest.values())
+                # Update the cursor in config.json (read-modify-write under the store lock)
+                def _set_cursor(cfg_live, form_id=form_id, sid=newest_id_this_round):
+                    cfg_live.setdefault("jotform", {}).setdefault("cursors", {})[form_id] = sid
+                update_config(_set_cursor)
+                # Also keep our in-memory copy current
+                self._cursors[form_id] = newest_id_this_round
@@ -0,0 +1,298 @@
+"""
+Leases that let several PCs share Jotform ingestion.
+
+Every PC runs a JotformPoller. With coordination.enabled, a poller only
+works a form while it holds that form's lease, and the form's cursor is kept
+in the lease instead of in each PC's config.json. Each submission is then
+fetched once, however many PCs are running. A lease is one small JSON
+document:
+
+    {"holder": "PC-3/4120/9f2c1a", "cursor": "5712...", "version": "<random>", "renewed": 1760000000.0}
+
+It lives in a store that writes with compare-and-swap:
+
+  SharePointLeaseStore  one file per lease in a SharePoint folder. Writes
+                        carry If-Match with the eTag that was read, so two
+                        PCs cannot both win.
+  FileLeaseStore        one file per lease in a shared directory, read and
+                        written under an O_EXCL lock file. It also stands in
+                        for SharePoint in tests and on a single PC.
+
+Expiry does not trust other PCs' clocks. A lease is free once its version
+has not changed for ttl_seconds, timed by the contender's own monotonic
+clock. The holder renews every ttl/3 and stops working the form once
+ttl - MARGIN has passed since its last successful renewal, which is before
+anyone else can take over. On shutdown the holder releases its leases, so
+a standby PC takes over on its next round.
+
+coordination.max_forms caps how many leases one PC holds, which spreads the
+forms over the PCs. coordination.shards > 1 splits each form's submissions
+by id over that many leases, each with its own cursor.
+"""
+import json, os, socket, threading, time, uuid, zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..config import APP_DIR
+from ..utils.fileio import atomic_write_json
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY
+
+MARGIN = 10.0        # seconds the holder stops early, ahead of any takeover
+LOCK_STALE = 30.0    # FileLeaseStore lock files older than this were left by a crashed PC
+
+LEASES = REGISTRY.counter("sloan_lease_total", "Lease acquisitions, renewals, losses and releases")
+
+INSTANCE_ID = f"{socket.gethostname()}/{os.getpid()}/{uuid.uuid4().hex[:6]}"
+
+_log = get_logger("lease")
+
+
+class FileLeaseStore:
+    """Leases as JSON files in a directory every PC can reach (a share, or a local folder for one PC)."""
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.json")
+
+    def read(self, name: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """(document, token to write against); (None, None) when there is no lease yet."""
+        try:
+            with open(self._path(name), "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except FileNotFoundError:
+            return None, None
+        except (OSError, ValueError):
+            return None, ""  # unreadable: free to overwrite
+        return doc, doc.get("version", "")
+
+    def _lock(self, name: str) -> str:
+        path = self._path(name) + ".lock"
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                try:
+                    # the file server's clock stamps the mtime; LOCK_STALE is generous for that
+                    if time.time() - os.path.getmtime(path) > LOCK_STALE:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"lease lock {path} is busy")
+            time.sleep(0.05)
+
+    def write(self, name: str, doc: Dict, token: Optional[str]) -> Optional[str]:
+        """Replace the lease if it is still at `token` (None: only if absent). The new token, or None."""
+        os.makedirs(self.directory, exist_ok=True)
+        lock = self._lock(name)
+        try:
+            if self.read(name)[1] != token:
+                return None
+            atomic_write_json(self._path(name), doc, indent=None)
+            return doc["version"]
+        finally:
+            try: os.remove(lock)
+            except OSError: pass
+
+
+class SharePointLeaseStore:
+    """Leases as JSON files in a SharePoint folder, written with If-Match on the eTag."""
+    def __init__(self, graph, folder: str):
+        self.graph = graph
+        self.folder = folder.rstrip("/")
+
+    def read(self, name: str) -> Tuple[Optional[Dict], Optional[str]]:
+        got = self.graph.read_small(f"{self.folder}/{name}.json")
+        if got is None:
+            return None, None
+        data, etag = got
+        try:
+            return json.loads(data), etag
+        except ValueError:
+            return None, etag
+
+    def write(self, name: str, doc: Dict, token: Optional[str]) -> Optional[str]:
+        item = self.graph.write_small(f"{self.folder}/{name}.json", json.dumps(doc).encode("utf-8"),
+                                      if_match="" if token is None else token)
+        return item.get("eTag", "") if item is not None else None
+
+
+def make_store(cfg, graph=None):
+    c = cfg.get("coordination", {}) or {}
+    if c.get("backend", "sharepoint") == "file":
+        return FileLeaseStore(c.get("file_folder") or os.path.join(APP_DIR, "leases"))
+    if graph is None:
+        raise RuntimeError("coordination.backend sharepoint needs a GraphClient")
+    return SharePointLeaseStore(graph, c.get("sharepoint_folder") or "/Sloan Suite/Leases")
+
+
+class LeaseManager:
+    def __init__(self, cfg, graph=None, stop_evt: Optional[threading.Event] = None,
+                 instance_id: str = INSTANCE_ID):
+        self.graph = graph
+        self.instance_id = instance_id
+        self.stop_evt = stop_evt or threading.Event()
+        self.store = None
+        self.enabled = False
+        self._spec = None
+        self._lock = threading.Lock()         # _held / _seen
+        self._write_lock = threading.RLock()  # one write per lease at a time (renewer vs. poller)
+        self._held: Dict[str, Dict] = {}      # key -> {"doc", "token", "until" (monotonic)}
+        self._seen: Dict[str, Tuple[str, float]] = {}  # key -> (version, monotonic time first seen)
+        self._renewer: Optional[threading.Thread] = None
+        self.configure(cfg)
+
+    def configure(self, cfg):
+        c = cfg.get("coordination", {}) or {}
+        spec = (bool(c.get("enabled")), c.get("backend", "sharepoint"), c.get("file_folder"),
+                c.get("sharepoint_folder"), int(c.get("shards", 1) or 1))
+        if spec != self._spec and self._held:
+            self.release_all()  # leases (and cursors) of the old layout stay where they were
+        self.ttl = max(3 * MARGIN, float(c.get("ttl_seconds", 90)))
+        self.max_leases = max(0, int(c.get("max_forms", 0)))
+        self.shards = max(1, spec[4])
+        if spec != self._spec:
+            self.enabled = spec[0]
+            self.store = make_store(cfg, self.graph) if self.enabled else None
+            self._seen.clear()
+            self._spec = spec
+
+    # -------------------- keys --------------------
+    def keys(self, form_id: str) -> List[str]:
+        if self.shards == 1:
+            return [form_id]
+        return [f"{form_id}.{k}of{self.shards}" for k in range(self.shards)]
+
+    def key_for(self, form_id: str, sid: str) -> str:
+        if self.shards == 1:
+            return form_id
+        n = int(sid) if sid.isdigit() else zlib.crc32(sid.encode("utf-8"))
+        return f"{form_id}.{n % self.shards}of{self.shards}"
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return f"jotform-{key}"
+
+    # -------------------- state --------------------
+    def holds(self, key: str) -> bool:
+        with self._lock:
+            h = self._held.get(key)
+            return h is not None and time.monotonic() < h["until"]
+
+    def held(self) -> List[str]:
+        with self._lock:
+            now = time.monotonic()
+            return sorted(k for k, h in self._held.items() if now < h["until"])
+
+    def cursor(self, key: str) -> str:
+        with self._lock:
+            h = self._held.get(key)
+            return (h["doc"].get("cursor") or "") if h else ""
+
+    # -------------------- acquire / renew --------------------
+    def claim(self, keys: Iterable[str], seeds: Optional[Dict[str, str]] = None) -> List[str]:
+        """Take whichever of `keys` are free (up to max_forms in total) and return the ones held."""
+        for key in keys:
+            if self.holds(key):
+                continue
+            with self._lock:
+                self._held.pop(key, None)  # expired locally: renewals kept failing
+                count = len(self._held)
+            if self.max_leases and count >= self.max_leases:
+                break
+            try:
+                self._acquire(key, (seeds or {}).get(key, ""))
+            except Exception as ex:
+                _log.warning(f"Could not claim lease {key}: {ex}")
+        if self._held and (self._renewer is None or not self._renewer.is_alive()):
+            self._renewer = threading.Thread(target=self._renew_loop, name="sloan-lease", daemon=True)
+            self._renewer.start()
+        return [k for k in keys if self.holds(k)]
+
+    def _acquire(self, key: str, seed: str) -> bool:
+        doc, token = self.store.read(self._name(key))
+        now = time.monotonic()
+        if doc and doc.get("holder") and doc["holder"] != self.instance_id:
+            version = doc.get("version", "")
+            with self._lock:
+                seen = self._seen.get(key)
+                if seen is None or seen[0] != version:
+                    self._seen[key] = (version, now)  # alive as of now; look again after ttl
+                    return False
+            if now - seen[1] < self.ttl:
+                return False
+            _log.warning(f"Lease {key} expired, taking over", previous=doc.get("holder"))
+        cursor = doc.get("cursor", "") if doc else seed
+        if self._write(key, dict(doc or {}, cursor=cursor), token, now):
+            LEASES.inc(event="acquired")
+            _log.info(f"Holding lease {key}", cursor=cursor)
+            return True
+        return False
+
+    def _write(self, key: str, base: Dict, token: Optional[str], t_sent: float) -> bool:
+        doc = dict(base, holder=self.instance_id, host=socket.gethostname(), version=uuid.uuid4().hex,
+                   renewed=time.time())
+        name = self._name(key)
+        with self._write_lock:
+            new_token = self.store.write(name, doc, token)
+            if new_token is None:
+                # a retried request can make our own write look like a conflict
+                current, tok = self.store.read(name)
+                if current is not None and current.get("version") == doc["version"]:
+                    new_token = tok
+        with self._lock:
+            if new_token is None:
+                self._held.pop(key, None)
+                return False
+            self._held[key] = {"doc": doc, "token": new_token, "until": t_sent + self.ttl - MARGIN}
+            self._seen.pop(key, None)
+        return True
+
+    def _update(self, key: str, **changes) -> bool:
+        try:
+            # the token must be read under the write lock: a renewal in flight replaces it
+            with self._write_lock:
+                with self._lock:
+                    h = self._held.get(key)
+                if h is None:
+                    return False
+                ok = self._write(key, dict(h["doc"], **changes), h["token"], time.monotonic())
+        except Exception as ex:
+            _log.warning(f"Lease {key} write failed: {ex}")
+            return self.holds(key)  # still ours until it runs out
+        if not ok:
+            LEASES.inc(event="lost")
+            _log.warning(f"Lost lease {key} to another PC")
+        return ok
+
+    def advance(self, key: str, cursor: str) -> bool:
+        """Store the cursor reached in the shared lease. False if the lease is no longer ours."""
+        return self._update(key, cursor=cursor)
+
+    def _renew_loop(self):
+        while not self.stop_evt.wait(self.ttl / 3):
+            with self._lock:
+                keys = list(self._held)
+            if not keys:
+                return
+            for key in keys:
+                if self._update(key):
+                    LEASES.inc(event="renewed")
+
+    def release_all(self):
+        """Hand every lease back (cursor kept) so a standby PC can take over without waiting out the ttl."""
+        with self._lock:
+            held, self._held = self._held, {}
+        for key, h in held.items():
+            doc = dict(h["doc"], holder="", version=uuid.uuid4().hex, renewed=time.time())
+            try:
+                with self._write_lock:
+                    if self.store.write(self._name(key), doc, h["token"]) is not None:
+                        LEASES.inc(event="released")
+                        _log.info(f"Released lease {key}")
+            except Exception as ex:
+                _log.warning(f"Could not release lease {key}: {ex}")
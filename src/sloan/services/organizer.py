@@ -1,34 +1,187 @@
-import os
-from typing import Dict
+import hashlib, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..config import APP_DIR
+from ..utils.fileio import atomic_write_json
+from ..utils.log import get_logger
+from ..utils.metrics import span
+from .graph_client import GraphError
+
+PROVISION_PATH = os.path.join(APP_DIR, "provisioned.json")
+
+_log = get_logger("organizer")
+
+
+def _rel(path: str) -> str:
+    # "/Initial/Pictures", "Initial/Pictures/" -> "/Initial/Pictures"; customer folder itself -> ""
+    path = "/".join(p for p in (path or "").replace("\\", "/").split("/") if p)
+    return f"/{path}" if path else ""
+
+
+class ProvisionLedger:
+    """
+    On-disk record of customer trees that are fully provisioned, with their
+    folder ids: {key: {"ids": {"": cust_id, "/Initial": id, ...}, "at": ts}}.
+    """
+    def __init__(self, path: str = PROVISION_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict]] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            rec = self._load().get(key)
+        return rec["ids"] if rec else None
+
+    def put(self, key: str, ids: Dict[str, str]):
+        with self._lock:
+            self._load()[key] = {"ids": ids, "at": time.time()}
+            atomic_write_json(self.path, self._data, indent=None)
+
+    def drop(self, key: str):
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                atomic_write_json(self.path, self._data, indent=None)
+
 
 class Organizer:
-    def __init__(self, cfg: Dict, graph_client):
+    def __init__(self, cfg: Dict, graph_client, ledger: Optional[ProvisionLedger] = None):
         self.cfg = cfg
         self.graph = graph_client
+        self.ledger = ledger or ProvisionLedger()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._root_ids: Dict[Tuple[str, str], str] = {}   # (drive id, customer root) -> folder id
 
-    def ensure_customer_tree(self, customer: str):
+    def reconfigure(self, cfg: Dict, changed):
+        # ledger keys and _root_ids both include the drive and root, so changed settings simply miss
+        self.cfg = cfg
+
+    # -------------------- provisioning --------------------
+    def _tree_paths(self) -> List[str]:
+        """Every folder the customer tree needs (default tree + routing targets + their parents)."""
+        org = self.cfg.get("organizer", {})
+        wanted = set()
+        for p in list(org.get("create_default_tree", [])) + list(org.get("routing", {}).values()):
+            parts = [s for s in _rel(p).split("/") if s]
+            for i in range(1, len(parts) + 1):
+                wanted.add("/" + "/".join(parts[:i]))
+        return sorted(wanted)
+
+    def _tree_key(self, customer: str) -> str:
         org = self.cfg.get("organizer", {})
-        customer_root = org.get("customer_root_path", "/Customers")
-        cust_path = f"{customer_root}/{customer}"
-        # ensure top levels
-        self.graph.ensure_folder(os.path.dirname(customer_root), os.path.basename(customer_root).lstrip("/"))
-        self.graph.ensure_folder(customer_root, customer)
-        made = {}
-        for sub in org.get("create_default_tree", []):
-            parent = cust_path + os.path.dirname(sub)
-            self.graph.ensure_folder(parent, os.path.basename(sub))
-            node = self.graph.get_by_path(cust_path + sub)
-            if node: made[sub] = node["id"]
-        return made
+        sig = hashlib.sha1("\n".join(self._tree_paths()).encode("utf-8")).hexdigest()[:12]
+        drive = self.cfg.get("graph", {}).get("drive_id", "")
+        return f"{drive}|{_rel(org.get('customer_root_path', '/Customers'))}|{customer.lower()}|{sig}"
+
+    def _customer_lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _customer_root_id(self) -> str:
+        root = _rel(self.cfg.get("organizer", {}).get("customer_root_path", "/Customers"))
+        key = (self.cfg.get("graph", {}).get("drive_id", ""), root)
+        rid = self._root_ids.get(key)
+        if rid is None:
+            self.graph.ensure_folder(root)
+            node = self.graph.get_by_path(root)
+            if not node:
+                raise RuntimeError(f"Customer root missing: {root}")
+            rid = self._root_ids[key] = node["id"]
+        return rid
+
+    def existing_customer_tree(self, customer: str) -> Optional[Dict[str, str]]:
+        """
+        Like ensure_customer_tree() but read-only: the ids when the customer's
+        whole tree already exists (recorded, so later moves skip the lookups),
+        else None. Nothing is created.
+        """
+        key = self._tree_key(customer)
+        ids = self.ledger.get(key)
+        if ids is not None:
+            return ids
+        base = f"{_rel(self.cfg.get('organizer', {}).get('customer_root_path', '/Customers'))}/{customer}"
+        paths = [""] + self._tree_paths()
+        workers = max(1, int(self.cfg.get("organizer", {}).get("provision_workers", 6)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sloan-provision") as pool:
+            nodes = list(pool.map(lambda p: self.graph.get_by_path(base + p), paths))
+        if not all(nodes):
+            return None
+        ids = {p: n["id"] for p, n in zip(paths, nodes)}
+        self.ledger.put(key, ids)
+        return ids
 
+    def ensure_customer_tree(self, customer: str) -> Dict[str, str]:
+        """
+        Make sure the customer folder and its default tree exist; returns
+        {relative path: folder id} with "" for the customer folder itself.
+        The tree is created level by level with siblings in parallel, and a
+        fully provisioned tree is recorded so later files skip all of this.
+        """
+        key = self._tree_key(customer)
+        ids = self.ledger.get(key)
+        if ids is not None:
+            return ids
+        with self._customer_lock(key):
+            ids = self.ledger.get(key)
+            if ids is not None:
+                return ids
+            ids = {"": self.graph.create_folder(self._customer_root_id(), customer)["id"]}
+
+            levels: Dict[int, List[str]] = {}
+            for p in self._tree_paths():
+                levels.setdefault(p.count("/"), []).append(p)
+            workers = max(1, int(self.cfg.get("organizer", {}).get("provision_workers", 6)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sloan-provision") as pool:
+                for depth in sorted(levels):
+                    futs = {}
+                    for p in levels[depth]:
+                        parent, name = p.rsplit("/", 1)
+                        futs[p] = pool.submit(self.graph.create_folder, ids[parent], name)
+                    for p, fut in futs.items():
+                        ids[p] = fut.result()["id"]
+
+            self.ledger.put(key, ids)
+            _log.info(f"Provisioned tree for {customer}", folders=len(ids))
+            return ids
+
+    # -------------------- routing --------------------
     def route_keyword(self, keyword_acr: str) -> str:
         return self.cfg.get("organizer", {}).get("routing", {}).get(keyword_acr, "/Extra")
 
-    def move_uploaded_to_customer(self, uploaded_item: Dict, customer: str, keyword_acr: str):
-        self.ensure_customer_tree(customer)
-        dest_rel = self.route_keyword(keyword_acr)
+    def destination_id(self, customer: str, keyword_acr: str) -> str:
+        dest_rel = _rel(self.route_keyword(keyword_acr))
+        dest_id = self.ensure_customer_tree(customer).get(dest_rel)
+        if dest_id:
+            return dest_id
         dest_path = f"{self.cfg['organizer']['customer_root_path']}/{customer}{dest_rel}"
+        self.graph.ensure_folder(dest_path)
         dest_node = self.graph.get_by_path(dest_path)
         if not dest_node:
             raise RuntimeError(f"Destination path missing: {dest_path}")
-        return self.graph.move_item(uploaded_item["id"], dest_node["id"], new_name=uploaded_item.get("name"))
\ No newline at end of file
+        return dest_node["id"]
+
+    def move_uploaded_to_customer(self, uploaded_item: Dict, customer: str, keyword_acr: str):
+        with span("provision"):
+            dest_id = self.destination_id(customer, keyword_acr)
+        with span("move"):
+            try:
+                return self.graph.move_item(uploaded_item["id"], dest_id, new_name=uploaded_item.get("name"))
+            except GraphError as ex:
+                if ex.status_code not in (400, 404):
+                    raise
+                # recorded folder may have been deleted or moved in SharePoint: re-provision once
+                _log.warning(f"Move failed, re-provisioning {customer}: {ex}")
+                self.ledger.drop(self._tree_key(customer))
+                dest_id = self.destination_id(customer, keyword_acr)
+                return self.graph.move_item(uploaded_item["id"], dest_id, new_name=uploaded_item.get("name"))
@@ -0,0 +1,155 @@
+"""
+Speculative SharePoint work while the Rename dialog is open.
+
+The dialog usually stays open 5-15 s while the operator picks options, and
+after accept the upload, provisioning and move used to run one after
+another. Speculation starts them when the dialog opens:
+
+  * the customer's folder tree is looked up, read-only. When it already
+    exists in full, its ids (every keyword route's destination included)
+    are recorded, so commit() moves without a single folder call. Nothing
+    is created until the operator accepts, so a glance at "Scan Document
+    1.pdf" leaves no customer folder behind.
+  * the file's bytes are uploaded into the Downloads folder under a
+    temporary ".sloan-pending-*" name. The upload reads a snapshot copied
+    under ~/.sloan_suite/speculation, because the dialog renames the
+    original on accept and Windows refuses to rename a file that is open.
+
+commit() finishes with a single PATCH that moves the pending upload into
+the keyword folder under its final name. abandon() deletes the pending
+upload, in the background if it is still in flight. commit() returns None
+when the speculation cannot be used: the file changed, the transform
+stage wants to re-encode it, or the upload failed. The caller then runs
+the normal path.
+"""
+import os, shutil, threading, uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from ..config import APP_DIR
+from ..utils.log import get_logger
+from ..utils.metrics import ITEMS, span
+
+WORK_DIR = os.path.join(APP_DIR, "speculation")
+
+_log = get_logger("speculation")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sloan-speculate")
+        return _pool
+
+
+def _identity(path: str):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class Speculation:
+    def __init__(self, cfg, graph, organizer, transformer=None):
+        self.cfg = cfg
+        self.graph = graph
+        self.organizer = organizer
+        self.transformer = transformer
+        self.customer = ""
+        self._ident = None
+        self._tree: Optional[Future] = None
+        self._upload: Optional[Future] = None
+
+    @staticmethod
+    def enabled(cfg) -> bool:
+        return bool((cfg.get("speculation", {}) or {}).get("enabled", True))
+
+    def start(self, file_path: str, customer: str):
+        s = self.cfg.get("speculation", {}) or {}
+        self.customer = customer
+        try:
+            self._ident = _identity(file_path)
+        except OSError:
+            return
+        pool = _executor()
+        if customer:
+            self._tree = pool.submit(self._lookup, customer)
+        size_mb = self._ident[0] / (1024 * 1024)
+        if s.get("upload", True) and size_mb <= float(s.get("max_upload_mb", 100)) and not self._will_transform(file_path):
+            self._upload = pool.submit(self._upload_pending, file_path)
+
+    def _will_transform(self, path: str) -> bool:
+        tr = self.transformer
+        return tr is not None and any(tr.rule(path, k) is not None for k in tr.rules)
+
+    def _lookup(self, customer: str):
+        with span("speculate_provision"):
+            return self.organizer.existing_customer_tree(customer)
+
+    def _upload_pending(self, path: str) -> Dict:
+        dl = self.cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")
+        name = f".sloan-pending-{uuid.uuid4().hex[:12]}{os.path.splitext(path)[1]}"
+        snap = os.path.join(WORK_DIR, name)
+        os.makedirs(WORK_DIR, exist_ok=True)
+        shutil.copyfile(path, snap)
+        try:
+            if _identity(path) != self._ident:
+                raise RuntimeError("file changed while it was being copied")
+            with span("speculate_upload"):
+                return self.graph.upload_small(f"{dl}/{name}", snap, priority="interactive")
+        finally:
+            os.remove(snap)
+
+    def commit(self, renamed_path: str, customer: str, keyword_acr: str) -> Optional[Dict]:
+        """Move the pending upload into place; None when the caller should upload normally."""
+        if self._tree is not None:
+            try:
+                self._tree.result()  # lookup errors resurface on the normal path
+            except Exception as ex:
+                _log.warning(f"Speculative folder lookup failed for {self.customer}: {ex}")
+        if self._upload is None:
+            ITEMS.inc(stage="speculation", outcome="no_upload")
+            return None
+        try:
+            pending = self._upload.result()
+            same_file = _identity(renamed_path) == self._ident
+        except Exception as ex:
+            _log.warning(f"Speculative upload unusable: {ex}")
+            pending, same_file = None, False
+        if pending is None or not same_file or (
+                self.transformer is not None and self.transformer.rule(renamed_path, keyword_acr) is not None):
+            self.abandon()
+            ITEMS.inc(stage="speculation", outcome="miss")
+            return None
+        try:
+            dest_id = self.organizer.destination_id(customer, keyword_acr)
+            with span("move"):
+                moved = self.graph.move_item(pending["id"], dest_id, new_name=os.path.basename(renamed_path))
+        except Exception as ex:
+            _log.warning(f"Speculative move failed, uploading normally: {ex}")
+            self.abandon()
+            ITEMS.inc(stage="speculation", outcome="miss")
+            return None
+        self._upload = None
+        ITEMS.inc(stage="speculation", outcome="hit")
+        return moved
+
+    def abandon(self):
+        """Throw the speculative upload away (the folder lookup created nothing)."""
+        fut, self._upload = self._upload, None
+        if fut is None:
+            return
+
+        def _delete(f: Future):
+            try:
+                item = f.result()
+            except Exception:
+                return  # nothing was created
+            try:
+                self.graph.delete_item(item["id"])
+            except Exception as ex:
+                _log.warning(f"Could not delete pending upload {item.get('name')}: {ex}")
+        # off the caller's thread even when the upload has already finished
+        fut.add_done_callback(lambda f: _executor().submit(_delete, f))
@@ -0,0 +1,185 @@
+"""
+Outbound transfer scheduling. Every upload body is read through a
+ShapedReader tagged with a lane (interactive / ingest / backfill); each chunk
+asks the shared TransferScheduler for permission before it goes on the wire.
+
+Chunks are granted in weighted-fair-queueing order (smallest virtual finish
+time first, finish = start + bytes / weight), within an optional overall
+budget (transfer.max_mbps) and optional per-lane caps that apply only in
+time-of-day windows, e.g. keep backfill to 2 Mbps during office hours and let
+it soak up the line at night. With no budget and no active cap a chunk is
+granted without waiting.
+"""
+import itertools, threading, time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..utils.metrics import REGISTRY
+
+LANES = ("interactive", "ingest", "backfill")
+DEFAULT_WEIGHTS = {"interactive": 8, "ingest": 2, "backfill": 1}
+CHUNK = 64 * 1024
+
+TRANSFER_BYTES = REGISTRY.counter("sloan_transfer_bytes_total", "Upload bytes granted per lane")
+TRANSFER_WAIT = REGISTRY.counter("sloan_transfer_wait_seconds_total", "Time upload chunks waited for bandwidth per lane")
+
+
+def _mbps(v) -> float:
+    """Megabits/s from config -> bytes/s (0 or missing = unlimited)."""
+    try:
+        return max(0.0, float(v or 0)) * 125000.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _minutes(hhmm: str) -> int:
+    h, m = str(hhmm).split(":")
+    return int(h) * 60 + int(m)
+
+
+class _Bucket:
+    """Token bucket in bytes that may go into debt: a grant only needs a positive balance."""
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = self.capacity = max(CHUNK, rate * 0.25)
+        self.t = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.t) * self.rate)
+        self.t = now
+
+    def wait(self) -> float:
+        return 0.0 if self.tokens > 0 else -self.tokens / self.rate
+
+
+class _Ticket:
+    __slots__ = ("finish", "seq", "lane", "nbytes")
+
+    def __init__(self, finish: float, seq: int, lane: str, nbytes: int):
+        self.finish, self.seq, self.lane, self.nbytes = finish, seq, lane, nbytes
+
+
+class TransferScheduler:
+    def __init__(self, cfg=None):
+        self._cond = threading.Condition()
+        self._waiting: List[_Ticket] = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._global: Optional[_Bucket] = None
+        self._lane_buckets: Dict[str, _Bucket] = {}
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.windows: List[Dict] = []
+        self.configure(cfg or {})
+
+    def configure(self, cfg):
+        t = cfg.get("transfer", {}) or {}
+        with self._cond:
+            self.weights = {**DEFAULT_WEIGHTS, **{k: max(0.1, float(v)) for k, v in (t.get("weights") or {}).items()}}
+            rate = _mbps(t.get("max_mbps"))
+            if not rate:
+                self._global = None
+            elif self._global is None or self._global.rate != rate:
+                self._global = _Bucket(rate)
+            self.windows = [dict(w) for w in (t.get("windows") or [])]
+            self._cond.notify_all()
+
+    # -------------------- limits --------------------
+    def lane_cap(self, lane: str, now: Optional[datetime] = None) -> float:
+        """Bytes/s cap for lane right now from the first matching window (0 = none)."""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for w in self.windows:
+            try:
+                start, end = _minutes(w["start"]), _minutes(w["end"])
+            except (KeyError, ValueError):
+                continue
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)  # overnight
+            if inside and w.get("max_mbps", {}).get(lane):
+                return _mbps(w["max_mbps"][lane])
+        return 0.0
+
+    def _lane_bucket(self, lane: str) -> Optional[_Bucket]:
+        cap = self.lane_cap(lane)
+        if not cap:
+            self._lane_buckets.pop(lane, None)
+            return None
+        b = self._lane_buckets.get(lane)
+        if b is None or b.rate != cap:
+            b = self._lane_buckets[lane] = _Bucket(cap)
+        return b
+
+    # -------------------- grants --------------------
+    def acquire(self, lane: str, nbytes: int):
+        """Block until `nbytes` of `lane` may be sent."""
+        lane = lane if lane in self.weights else "ingest"
+        t0 = time.monotonic()
+        with self._cond:
+            if self._global is None and not self.windows:
+                TRANSFER_BYTES.inc(nbytes, lane=lane)
+                return
+            start = max(self._vtime, self._last_finish.get(lane, 0.0))
+            me = _Ticket(start + nbytes / self.weights[lane], next(self._seq), lane, nbytes)
+            self._last_finish[lane] = me.finish
+            self._waiting.append(me)
+            while True:
+                now = time.monotonic()
+                if self._global is not None:
+                    self._global.refill(now)
+                lane_wait: Dict[str, float] = {}
+                for t in self._waiting:
+                    if t.lane not in lane_wait:
+                        b = self._lane_bucket(t.lane)
+                        if b is not None:
+                            b.refill(now)
+                        lane_wait[t.lane] = b.wait() if b is not None else 0.0
+                # smallest finish tag among lanes not held back by their window cap
+                eligible = [t for t in self._waiting if lane_wait[t.lane] <= 0]
+                head = min(eligible, key=lambda t: (t.finish, t.seq)) if eligible else None
+                global_wait = self._global.wait() if self._global is not None else 0.0
+                if head is me and global_wait <= 0:
+                    self._waiting.remove(me)
+                    self._vtime = me.finish
+                    if self._global is not None:
+                        self._global.tokens -= nbytes
+                    b = self._lane_buckets.get(lane)
+                    if b is not None:
+                        b.tokens -= nbytes
+                    self._cond.notify_all()
+                    break
+                timeout = global_wait if head is me else min([w for w in lane_wait.values() if w > 0] or [0.05])
+                self._cond.wait(max(0.001, min(timeout, 0.5)))
+        TRANSFER_BYTES.inc(nbytes, lane=lane)
+        TRANSFER_WAIT.inc(time.monotonic() - t0, lane=lane)
+
+
+class ShapedReader:
+    """File-like wrapper whose read() waits for the scheduler, CHUNK bytes at a time."""
+    def __init__(self, fh, scheduler: Optional[TransferScheduler], lane: str):
+        self._fh = fh
+        self._scheduler = scheduler
+        self.lane = lane
+
+    def read(self, n: int = -1) -> bytes:
+        data = self._fh.read(n)
+        if self._scheduler is not None:
+            for off in range(0, len(data), CHUNK):
+                self._scheduler.acquire(self.lane, min(CHUNK, len(data) - off))
+        return data
+
+    def __getattr__(self, name):
+        # seek/tell/fileno/close for requests' length sniffing and urllib3's rewind on retry
+        return getattr(self._fh, name)
+
+
+_shared: Optional[TransferScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def shared_scheduler(cfg) -> TransferScheduler:
+    """The process-wide scheduler every GraphClient uploads through."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TransferScheduler(cfg)
+        return _shared
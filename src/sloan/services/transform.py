@@ -0,0 +1,155 @@
+"""
+Optional image transform stage before upload: downscale and re-encode phone
+photos per keyword (config "transform"), in a process pool so several photos
+are encoded at once without holding the GIL.
+
+Originals are never modified. The transformed copy is written under
+~/.sloan_suite/transform and is only used when it is actually smaller; the
+caller uploads whatever path finish()/process() returns and then calls
+cleanup(). Needs Pillow (`pip install sloan-suite[images]`); without it, or
+with transform.enabled false, every path is passed through unchanged.
+"""
+import importlib.util, os, threading, time, uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from ..config import APP_DIR, touches
+from ..utils.log import get_logger
+from ..utils.metrics import REGISTRY, observe_stage
+
+WORK_DIR = os.path.join(APP_DIR, "transform")
+IMAGE_EXTS = {".jpg", ".jpeg"}  # re-encoded as JPEG, so the extension (and the name) never changes
+
+TRANSFORM_BYTES = REGISTRY.counter("sloan_transform_bytes_total", "Image bytes before (in) and after (out) transform")
+TRANSFORM_FILES = REGISTRY.counter("sloan_transform_files_total", "Images through the transform stage by result")
+
+_log = get_logger("transform")
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _transform(src: str, dst: str, max_px: int, quality: int) -> Tuple[Optional[str], int, int]:
+    """Pool worker: (dst or None when not smaller, bytes in, bytes out)."""
+    from PIL import Image, ImageOps
+
+    size_in = os.path.getsize(src)
+    with Image.open(src) as im:
+        im.draft("RGB", (max_px, max_px))  # JPEG: let the decoder downscale by 1/2..1/8 for free
+        exif = im.getexif()
+        # apply the orientation tag to the pixels, then drop it so viewers don't rotate twice
+        out = ImageOps.exif_transpose(im)
+        exif.pop(0x0112, None)
+        if max(out.size) > max_px:
+            out.thumbnail((max_px, max_px), Image.LANCZOS)
+        if out.mode not in ("RGB", "L"):
+            out = out.convert("RGB")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        out.save(dst, "JPEG", quality=quality, optimize=True, progressive=True, exif=exif.tobytes(),
+                 icc_profile=im.info.get("icc_profile"))
+    size_out = os.path.getsize(dst)
+    if size_out >= size_in:
+        os.remove(dst)
+        return None, size_in, size_in
+    return dst, size_in, size_out
+
+
+class Transformer:
+    """
+    submit(path, key) starts a transform in the pool (None when the file or
+    key has no rule); finish(path, future) waits and returns the path to
+    upload. `key` is a keyword acronym ("InitialP") looked up in transform.rules.
+    """
+    def __init__(self, cfg):
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.configure(cfg)
+
+    def configure(self, cfg):
+        t = cfg.get("transform", {}) or {}
+        with self._lock:
+            self.enabled = bool(t.get("enabled", False))
+            self.rules: Dict[str, Dict] = dict(t.get("rules") or {})
+            workers = int(t.get("workers") or 0) or max(1, (os.cpu_count() or 2) - 1)
+            if self._pool is not None and workers != self.workers:
+                self._pool.shutdown(wait=False)  # running transforms finish; the next submit gets a new pool
+                self._pool = None
+            self.workers = workers
+        if self.enabled and not pillow_available():
+            _log.warning("transform.enabled is set but Pillow is not installed; uploading originals")
+            self.enabled = False
+
+    def reconfigure(self, cfg, changed):
+        if touches(changed, "transform"):
+            self.configure(cfg)
+
+    def rule(self, path: str, key: str) -> Optional[Dict]:
+        if not self.enabled or os.path.splitext(path)[1].lower() not in IMAGE_EXTS:
+            return None
+        return self.rules.get(key)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def submit(self, path: str, key: str) -> Optional[Future]:
+        rule = self.rule(path, key)
+        if rule is None:
+            return None
+        dst = os.path.join(WORK_DIR, f"{uuid.uuid4().hex}{os.path.splitext(path)[1]}")
+        fut = self._executor().submit(_transform, path, dst, int(rule.get("max_px", 2560)),
+                                      int(rule.get("quality", 82)))
+        fut.t0 = time.monotonic()
+        return fut
+
+    def finish(self, path: str, fut: Optional[Future]) -> str:
+        if fut is None:
+            return path
+        try:
+            out, size_in, size_out = fut.result()
+        except Exception as ex:
+            TRANSFORM_FILES.inc(result="error")
+            _log.warning(f"Transform failed, uploading original {path}: {ex}")
+            return path
+        observe_stage("transform", time.monotonic() - fut.t0)
+        TRANSFORM_BYTES.inc(size_in, direction="in")
+        TRANSFORM_BYTES.inc(size_out, direction="out")
+        TRANSFORM_FILES.inc(result="smaller" if out else "kept")
+        if out is None:
+            return path
+        _log.info(f"Transformed {os.path.basename(path)}", bytes_in=size_in, bytes_out=size_out)
+        return out
+
+    def process(self, path: str, key: str) -> str:
+        return self.finish(path, self.submit(path, key))
+
+    @staticmethod
+    def cleanup(original: str, used: str):
+        """Remove the transformed copy once it has been uploaded."""
+        if used != original:
+            try:
+                os.remove(used)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_shared: Optional[Transformer] = None
+_shared_lock = threading.Lock()
+
+
+def shared_transformer(cfg) -> Transformer:
+    """The process-wide transformer (one pool for the poller and the upload flow)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Transformer(cfg)
+        return _shared
@@ -4,11 +4,11 @@ from PyQt5.QtWidgets import QMessageBox
 def register_context_menu():
     try:
         import winreg
+        # A running instance picks the file up over IPC; the new process exits right away
         if getattr(sys, 'frozen', False):
-            exe = sys.executable; cmd = f'"{exe}" "%1"'
+            exe = sys.executable; cmd = f'"{exe}" --open "%1"'
         else:
-            script = os.path.abspath(__file__)  # will be overridden by entrypoint handling
-            cmd = f'"{sys.executable}" -m sloan.app --open "%1"'
+            cmd = f'"{sys.executable}" -m sloan --open "%1"'
         key_path = r"*\\shell\\Edit with Sloan"
         with winreg.CreateKey(winreg.HKEY_CLASSES_ROOT, key_path) as k:
             winreg.SetValueEx(k, None, 0, winreg.REG_SZ, "Edit with Sloan")
@@ -1,11 +1,15 @@
 import os
-from PyQt5.QtWidgets import QSystemTrayIcon, QMenu
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu
 from PyQt5.QtGui import QIcon
 
 class Tray:
-    def __init__(self, app, controller, parent=None, icon_path: str = ""):
+    def __init__(self, app, controller, parent=None, icon_path: str = "", status_fn=None,
+                 profile_fn=None):
         self.app = app
         self.controller = controller
+        self.status_fn = status_fn  # -> (summary lines, per-stage lines), refreshed when the menu opens
+        self.profile_fn = profile_fn  # (mode, seconds); its items only show while Shift is held
 
         icon = QIcon()
         if icon_path and os.path.exists(icon_path):
@@ -19,11 +23,53 @@ class Tray:
         self.tray = QSystemTrayIcon(icon, parent)
 
         menu = QMenu()
+        self.status_actions = []
+        self.stages_menu = None
+        if status_fn:
+            for _ in range(4):
+                act = menu.addAction("…"); act.setEnabled(False)
+                self.status_actions.append(act)
+            self.stages_menu = menu.addMenu("Stage latency")
+            menu.addSeparator()
+            menu.aboutToShow.connect(self.refresh_status)
+        self.profile_actions = []
+        if profile_fn:
+            for label, mode in (("Profile 30 s (all threads)", "sample"), ("Profile 30 s (Qt thread, cProfile)", "cprofile")):
+                act = menu.addAction(label)
+                act.triggered.connect(lambda _=False, m=mode: self.profile_fn(m, 30))
+                self.profile_actions.append(act)
+            self.profile_actions.append(menu.addSeparator())
+            menu.aboutToShow.connect(self._reveal_profile_actions)
+        act_history = menu.addAction("Search History…")
         act_config = menu.addAction("Open Config…")
         act_exit = menu.addAction("Exit")
+        act_history.triggered.connect(lambda: self.controller.open_history.emit())
         act_config.triggered.connect(lambda: self.controller.open_config.emit())
         act_exit.triggered.connect(lambda: self.app.quit())
 
+        self.menu = menu
         self.tray.setContextMenu(menu)
         self.tray.setToolTip("Sloan Renamer & Organizer")
         self.tray.show()
+
+    def refresh_status(self):
+        try:
+            summary, stages = self.status_fn()
+        except Exception:
+            return
+        for i, act in enumerate(self.status_actions):
+            act.setVisible(i < len(summary))
+            if i < len(summary):
+                act.setText(summary[i])
+        self.stages_menu.clear()
+        for text in stages or ["No data yet"]:
+            self.stages_menu.addAction(text).setEnabled(False)
+        self.tray.setToolTip("Sloan Renamer & Organizer\n" + "\n".join(summary))
+
+    def _reveal_profile_actions(self):
+        shift = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        for act in self.profile_actions:
+            act.setVisible(shift)
+
+    def notify(self, title: str, text: str):
+        self.tray.showMessage(title, text, QSystemTrayIcon.Information, 5000)
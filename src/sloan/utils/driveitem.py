@@ -0,0 +1,9 @@
+from typing import Dict
+
+
+def drive_path(item: Dict) -> str:
+    """Drive-relative folder of a Graph driveItem, e.g. "/Customers/John Doe"."""
+    # parentReference.path looks like "/drive/root:/Customers/John Doe" (or "/drives/<id>/root:")
+    p = (item.get("parentReference") or {}).get("path") or ""
+    p = p.split("root:", 1)[1] if "root:" in p else p
+    return "/" + "/".join(s for s in p.split("/") if s)
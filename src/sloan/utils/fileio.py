@@ -0,0 +1,30 @@
+import json, os, tempfile
+from typing import Any
+
+
+def atomic_write_bytes(path: str, data: bytes, fsync: bool = True) -> None:
+    """Write `data` to a sibling temp file, fsync it, then rename over `path`.
+    Readers see either the old file or the new one, never a half-written file.
+    fsync=False keeps the atomic rename but skips the flush to disk (caches)."""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+
+def atomic_write_text(path: str, text: str, encoding: str = "utf-8") -> None:
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2) -> None:
+    atomic_write_text(path, json.dumps(data, indent=indent))
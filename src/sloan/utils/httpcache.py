@@ -0,0 +1,240 @@
+"""
+Conditional-request cache for the requests sessions in GraphClient and
+JotformPoller. GET responses on whitelisted endpoints that carry an ETag or
+Last-Modified are kept in a memory LRU backed by ~/.sloan_suite/http-cache;
+repeat requests send If-None-Match / If-Modified-Since and a 304 is answered
+from the stored body, so unchanged reads cost a header round trip.
+"""
+import hashlib, io, json, os, re, threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .fileio import atomic_write_bytes
+from .log import APP_DIR, get_logger
+from .metrics import REGISTRY
+
+CACHE_DIR = os.path.join(APP_DIR, "http-cache")
+MAX_ENTRY_BYTES = 1024 * 1024   # bigger bodies (and unsized streams) are never buffered for the cache
+
+# Cacheable endpoints, matched against the URL path. Only small metadata reads:
+# file content, PDFs and uploads always go straight through.
+GRAPH_CACHE_RULES = (
+    r"/drives/[^/]+/root:/[^:]*$",              # get_by_path, ensure_folder probes
+    r"/drives/[^/]+/items/[^/:]+(:/[^:/]+)?$",  # item by id, child by name
+)
+JOTFORM_CACHE_RULES = (
+    r"/form/[^/]+$",                            # form metadata
+    r"/form/[^/]+/(submissions|questions|properties)$",
+)
+
+# headers that describe the wire encoding of the original body, not the stored one
+_DROP_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+CACHE_LOOKUPS = REGISTRY.counter("sloan_http_cache_total", "Conditional cache lookups by service and result")
+
+_log = get_logger("httpcache")
+
+
+class ResponseCache:
+    """Memory LRU of entries, written through to one file per entry on disk (also LRU by mtime)."""
+    def __init__(self, directory: str = CACHE_DIR, memory_entries: int = 256, disk_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.memory_entries = max(1, memory_entries)
+        self.disk_bytes = disk_bytes
+        self._mem: "OrderedDict[str, Tuple[Dict, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_used: Optional[int] = None
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        # hashed so query-string secrets (Jotform apiKey) never reach the disk
+        return hashlib.sha1(f"{method} {url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _remember(self, key: str, entry: Tuple[Dict, bytes]):
+        with self._lock:
+            self._mem[key] = entry
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_entries:
+                self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                return entry
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, (meta, body))
+        return meta, body
+
+    def put(self, key: str, meta: Dict, body: bytes):
+        self._remember(key, (meta, body))
+        data = json.dumps(meta).encode("utf-8") + b"\n" + body
+        try:
+            atomic_write_bytes(self._path(key), data, fsync=False)
+        except OSError as ex:
+            _log.warning(f"HTTP cache write failed: {ex}")
+            return
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += len(data)
+            over = self._disk_used is None or self._disk_used > self.disk_bytes
+        if over:
+            self._prune()
+
+    def drop(self, key: str):
+        with self._lock:
+            self._mem.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for n in names:
+                p = os.path.join(root, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        used = sum(s for _, s, _ in files)
+        for _, size, p in sorted(files):
+            if used <= self.disk_bytes * 0.8:
+                break
+            try:
+                os.remove(p)
+                used -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_used = used
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._disk_used = 0
+        for root, _, names in os.walk(self.directory):
+            for n in names:
+                try: os.remove(os.path.join(root, n))
+                except OSError: pass
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that revalidates cacheable GETs. `rules` are regexes on the URL
+    path; anything else (and every non-GET) is passed through untouched.
+    Takes the usual HTTPAdapter kwargs, e.g. max_retries.
+    """
+    def __init__(self, cache: Optional[ResponseCache], rules: Iterable[str], service: str, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+        self.service = service
+        self._rules = [re.compile(r) for r in rules]
+
+    def cacheable(self, url: str) -> bool:
+        path = urlsplit(url).path
+        return any(r.search(path) for r in self._rules)
+
+    def send(self, request, stream=False, **kwargs):
+        if self.cache is None or request.method != "GET" or not self.cacheable(request.url):
+            return super().send(request, stream=stream, **kwargs)
+
+        key = self.cache.key(request.method, request.url)
+        cached = self.cache.get(key)
+        if cached:
+            meta = cached[0]
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = super().send(request, stream=stream, **kwargs)
+        if resp.status_code == 304 and cached:
+            CACHE_LOOKUPS.inc(service=self.service, result="hit")
+            return self._from_cache(request, resp, *cached)
+        CACHE_LOOKUPS.inc(service=self.service, result="miss")
+        if resp.status_code == 200:
+            self._store(key, resp, stream)
+        elif resp.status_code in (404, 410) and cached:
+            self.cache.drop(key)
+        return resp
+
+    def _store(self, key: str, resp: Response, stream: bool):
+        etag, last_mod = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if not (etag or last_mod) or "no-store" in resp.headers.get("Cache-Control", ""):
+            return
+        length = resp.headers.get("Content-Length")
+        if (length is None and stream) or (length is not None and int(length) > MAX_ENTRY_BYTES):
+            return  # leave big or unsized streams streaming
+        body = resp.content
+        if len(body) > MAX_ENTRY_BYTES:
+            return
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in _DROP_HEADERS}
+        self.cache.put(key, {"status": resp.status_code, "reason": resp.reason, "headers": headers,
+                             "etag": etag, "last_modified": last_mod}, body)
+
+    def _from_cache(self, request, not_modified: Response, meta: Dict, body: bytes) -> Response:
+        not_modified.close()
+        r = Response()
+        r.status_code = meta.get("status", 200)
+        r.reason = meta.get("reason") or "OK"
+        r.headers = CaseInsensitiveDict(meta.get("headers") or {})
+        # a 304 may carry fresher validators/dates
+        for k, v in not_modified.headers.items():
+            if k.lower() not in _DROP_HEADERS:
+                r.headers[k] = v
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.raw = io.BytesIO(body)
+        r._content = body
+        r._content_consumed = True
+        r.url = request.url
+        r.request = request
+        r.connection = self
+        return r
+
+
+_shared: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache(cfg) -> Optional[ResponseCache]:
+    """The process-wide cache (None when http_cache.enabled is false)."""
+    global _shared
+    hc = cfg.get("http_cache", {}) or {}
+    if not hc.get("enabled", True):
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = ResponseCache(memory_entries=int(hc.get("memory_entries", 256)),
+                                    disk_bytes=int(float(hc.get("disk_mb", 50)) * 1024 * 1024))
+        return _shared
+
+
+def cache_stats(service: Optional[str] = None) -> Dict[str, float]:
+    """{"hit": n, "miss": n, "hit_ratio": r} for one service or all of them."""
+    out = {"hit": 0.0, "miss": 0.0}
+    for svc in ([service] if service else ("graph", "jotform")):
+        for res in ("hit", "miss"):
+            out[res] += CACHE_LOOKUPS.value(service=svc, result=res)
+    total = out["hit"] + out["miss"]
+    out["hit_ratio"] = out["hit"] / total if total else 0.0
+    return out
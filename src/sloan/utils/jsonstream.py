@@ -0,0 +1,107 @@
+import codecs, json
+from typing import Any, Dict, Iterable, Iterator
+
+_WS = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class _NeedMore(Exception):
+    pass
+
+
+class JsonArrayStream:
+    """
+    Incrementally parse a JSON object read as byte chunks and yield the items
+    of one top-level array member (e.g. Jotform's {"content": [...]}) as each
+    is complete, so only one item is held in memory at a time. The other
+    top-level members are collected in .meta and are complete once iteration
+    finishes.
+    """
+    def __init__(self, chunks: Iterable[bytes], key: str):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.key = key
+        self.meta: Dict[str, Any] = {}
+        self.count = 0
+
+    # -------------------- buffer --------------------
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # drop what we've consumed so the buffer stays about one item long
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self._buf += self._utf8.decode(chunk)
+                return True
+        self._buf += self._utf8.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def _expect(self, ch: str):
+        if self._peek() != ch:
+            raise ValueError(f"Expected {ch!r} at offset {self._pos}, got {self._buf[self._pos]!r}")
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                val, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buf) and not self._eof and isinstance(val, (int, float)):
+                self._fill()
+                continue
+            self._pos = end
+            return val
+
+    # -------------------- parse --------------------
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self._value()
+            self._expect(":")
+            if name == self.key and self._peek() == "[":
+                self._pos += 1
+                if self._peek() == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        item = self._value()
+                        self.count += 1
+                        yield item
+                        sep = self._peek()
+                        self._pos += 1
+                        if sep == "]":
+                            break
+                        if sep != ",":
+                            raise ValueError(f"Expected ',' or ']' in {self.key!r} array, got {sep!r}")
+            else:
+                self.meta[name] = self._value()
+            sep = self._peek()
+            self._pos += 1
+            if sep == "}":
+                return
+            if sep != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self._pos - 1}, got {sep!r}")
+
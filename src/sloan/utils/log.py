@@ -1,16 +1,185 @@
+import atexit, json, os, pathlib, queue, sys, threading, time, traceback
+from contextlib import contextmanager
 from datetime import datetime
-import os
-import pathlib
+from typing import Dict, Optional
 
 
 APP_DIR = os.path.join(pathlib.Path.home(), ".sloan_suite")
 LOG_PATH = os.path.join(APP_DIR, "sloan.log")
 
+MAX_BYTES = 10 * 1024 * 1024   # rotate sloan.log at this size...
+BACKUP_COUNT = 5               # ...keeping sloan.log.1 .. sloan.log.5
+FLUSH_INTERVAL = 0.5           # seconds the writer waits before writing a partial batch
+BATCH_MAX = 1000
 
-os.makedirs(APP_DIR, exist_ok=True)
+_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+_min_level = _LEVELS.get(os.environ.get("SLOAN_LOG_LEVEL", "info").lower(), 20)
+_echo = os.environ.get("SLOAN_LOG_ECHO") == "1" or bool(getattr(sys.stderr, "isatty", lambda: False)())
 
+# SimpleQueue.put is implemented in C and never blocks; the caller's only cost
+# is building the record tuple. All formatting and I/O happen on the writer.
+_q: "queue.SimpleQueue" = queue.SimpleQueue()
+_writer: Optional["_Writer"] = None
+_writer_lock = threading.Lock()
 
-def log(message: str) -> None:
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {message}\n")
\ No newline at end of file
+
+class _Writer(threading.Thread):
+    def __init__(self):
+        super().__init__(name="sloan-log-writer", daemon=True)
+        self._fh = None
+        self._size = 0
+
+    def _open(self):
+        os.makedirs(APP_DIR, exist_ok=True)
+        self._fh = open(LOG_PATH, "a", encoding="utf-8")
+        self._size = self._fh.tell()
+
+    def _rotate(self):
+        self._fh.close(); self._fh = None
+        for i in range(BACKUP_COUNT - 1, 0, -1):
+            src, dst = f"{LOG_PATH}.{i}", f"{LOG_PATH}.{i + 1}"
+            if os.path.exists(src):
+                os.replace(src, dst)
+        os.replace(LOG_PATH, f"{LOG_PATH}.1")
+        self._open()
+
+    @staticmethod
+    def _format(rec) -> str:
+        ts, level, component, thread, msg, fields = rec
+        out = {
+            "ts": datetime.fromtimestamp(ts).isoformat(timespec="milliseconds"),
+            "level": level, "component": component, "thread": thread, "msg": msg,
+        }
+        if fields:
+            out.update(fields)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+    def _write(self, batch):
+        lines, waiters = [], []
+        for rec in batch:
+            if isinstance(rec, threading.Event):
+                waiters.append(rec)
+                continue
+            lines.append(self._format(rec))
+            if _echo:
+                try: sys.stderr.write(f"[{rec[2]}] {rec[4]}\n")
+                except Exception: pass
+        if lines:
+            try:
+                if self._fh is None:
+                    self._open()
+                data = "\n".join(lines) + "\n"
+                self._fh.write(data); self._fh.flush()
+                self._size += len(data)
+                if self._size >= MAX_BYTES:
+                    self._rotate()
+            except Exception:
+                # logging must never take the app down; drop the batch and reopen next time
+                if self._fh is not None:
+                    try: self._fh.close()
+                    except Exception: pass
+                self._fh = None
+        for ev in waiters:
+            ev.set()
+
+    def run(self):
+        while True:
+            try:
+                batch = [_q.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(_q.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _Writer()
+            _writer.start()
+            atexit.register(flush)
+
+
+def _emit(level: str, component: str, msg: str, fields: Optional[Dict]) -> None:
+    if _LEVELS[level] < _min_level:
+        return
+    if _writer is None:
+        _ensure_writer()
+    _q.put((time.time(), level, component, threading.current_thread().name, msg, fields))
+
+
+def log_to(filename: str) -> None:
+    """Write this process's log to APP_DIR/filename instead of sloan.log. Call before the first record."""
+    global LOG_PATH
+    LOG_PATH = os.path.join(APP_DIR, filename)
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Block until everything logged so far has been written."""
+    if _writer is None:
+        return
+    ev = threading.Event()
+    _q.put(ev)
+    ev.wait(timeout)
+
+
+class Logger:
+    """
+    Component-scoped logger. Records become JSON lines in sloan.log with
+    ts/level/component/thread/msg plus any keyword fields. Calling the
+    logger directly is the same as .info(), so it can be passed as a log_fn.
+    """
+    __slots__ = ("component",)
+
+    def __init__(self, component: str):
+        self.component = component
+
+    def debug(self, msg: str, **fields):
+        _emit("debug", self.component, msg, fields)
+
+    def info(self, msg: str, **fields):
+        _emit("info", self.component, msg, fields)
+
+    __call__ = info
+
+    def warning(self, msg: str, **fields):
+        _emit("warning", self.component, msg, fields)
+
+    def error(self, msg: str, **fields):
+        _emit("error", self.component, msg, fields)
+
+    def exception(self, msg: str, **fields):
+        fields["exc"] = traceback.format_exc()
+        _emit("error", self.component, msg, fields)
+
+    @contextmanager
+    def timed(self, msg: str, **fields):
+        """Log `msg` with a duration_ms field once the block finishes (or fails)."""
+        t0 = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as ex:
+            fields["error"] = repr(ex)
+            raise
+        finally:
+            fields["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            _emit("error" if "error" in fields else "info", self.component, msg, fields)
+
+
+_loggers: Dict[str, Logger] = {}
+
+
+def get_logger(component: str) -> Logger:
+    lg = _loggers.get(component)
+    if lg is None:
+        lg = _loggers.setdefault(component, Logger(component))
+    return lg
+
+
+def log(message: str, component: str = "app", **fields) -> None:
+    _emit("info", component, message, fields)
@@ -0,0 +1,285 @@
+import bisect, json, math, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .log import APP_DIR, get_logger
+
+METRICS_PATH = os.path.join(APP_DIR, "metrics.jsonl")
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+
+# seconds; wide enough for a 5 ms cache hit and a 2 min upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+WINDOW = 2048  # recent samples kept per histogram series for live percentiles
+
+_log = get_logger("metrics")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]  # nearest-rank
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name, self.help = name, help
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, n: float = 1, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + n
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_fmt_labels(k)} {v}" for k, v in self._values.items()]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {_fmt_labels(k) or "_": v for k, v in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, v: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = v
+
+    def dec(self, n: float = 1, **labels):
+        self.inc(-n, **labels)
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "count", "recent")
+
+    def __init__(self, nbuckets: int):
+        self.counts = [0] * (nbuckets + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=WINDOW)   # (monotonic ts, value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, _Series] = {}
+
+    def observe(self, v: float, **labels):
+        k = _key(labels)
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = _Series(len(self.buckets))
+            s.counts[i] += 1
+            s.sum += v
+            s.count += 1
+            s.recent.append((time.monotonic(), v))
+
+    def recent(self, window_s: Optional[float] = None, **labels) -> List[float]:
+        s = self._series.get(_key(labels))
+        if s is None:
+            return []
+        with self._lock:
+            items = list(s.recent)
+        if window_s is not None:
+            cutoff = time.monotonic() - window_s
+            items = [it for it in items if it[0] >= cutoff]
+        return [v for _, v in items]
+
+    def label_sets(self) -> List[Dict[str, str]]:
+        return [dict(k) for k in list(self._series)]
+
+    def render(self) -> List[str]:
+        out = []
+        with self._lock:
+            for k, s in self._series.items():
+                cum = 0
+                for le, c in zip(self.buckets + ("+Inf",), s.counts):
+                    cum += c
+                    le_label = 'le="%s"' % le
+                    out.append(f"{self.name}_bucket{_fmt_labels(k, le_label)} {cum}")
+                out.append(f"{self.name}_sum{_fmt_labels(k)} {s.sum}")
+                out.append(f"{self.name}_count{_fmt_labels(k)} {s.count}")
+        return out
+
+    def snapshot(self) -> Dict:
+        out = {}
+        for labels in self.label_sets():
+            vals = self.recent(**labels)
+            s = self._series[_key(labels)]
+            out[_fmt_labels(_key(labels)) or "_"] = {
+                "count": s.count, "sum": round(s.sum, 6),
+                "p50": percentile(vals, 0.50), "p95": percentile(vals, 0.95),
+            }
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _get(self, cls, name, help, **kw):
+        m = self._metrics.get(name)
+        if m is None:
+            with self._lock:
+                m = self._metrics.get(name)
+                if m is None:
+                    m = self._metrics[name] = cls(name, help, **kw)
+        return m
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for m in list(self._metrics.values()):
+            if m.help:
+                lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        return {name: m.snapshot() for name, m in list(self._metrics.items())}
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("sloan_stage_seconds", "Duration of pipeline stages")
+HTTP_RESPONSES = REGISTRY.counter("sloan_http_responses_total", "HTTP responses by service/method/status")
+HTTP_RETRIES = REGISTRY.counter("sloan_http_retries_total", "HTTP retries (throttling, 5xx, auth refresh)")
+BYTES = REGISTRY.counter("sloan_bytes_total", "Bytes transferred by service and direction")
+QUEUE_DEPTH = REGISTRY.gauge("sloan_queue_depth", "Items waiting per queue")
+ITEMS = REGISTRY.counter("sloan_items_total", "Items through each pipeline by outcome")
+
+
+def observe_stage(stage: str, seconds: float, **labels) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+
+
+@contextmanager
+def span(stage: str, **labels):
+    """Time a pipeline stage into sloan_stage_seconds{stage=...}.
+    Failures are also counted in sloan_items_total{stage=..., outcome="error"}."""
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, stage=stage, **labels)
+        if outcome == "error":
+            ITEMS.inc(stage=stage, outcome=outcome)
+
+
+def stage_summary(stage: str, window_s: float = 3600) -> Dict:
+    """count / per-hour rate / p50 / p95 over the last `window_s` seconds for one stage."""
+    vals = STAGE_SECONDS.recent(window_s, stage=stage)
+    return {
+        "count": len(vals),
+        "per_hour": len(vals) * 3600.0 / window_s,
+        "p50": percentile(vals, 0.50),
+        "p95": percentile(vals, 0.95),
+    }
+
+
+def format_summary(stage: str, label: str, window_s: float = 3600) -> str:
+    s = stage_summary(stage, window_s)
+    if not s["count"]:
+        return f"{label}: idle"
+    return f"{label}: {s['count']} in last {int(window_s // 60)} min · p50 {s['p50']:.1f}s · p95 {s['p95']:.1f}s"
+
+
+class MetricsExporter(threading.Thread):
+    """
+    Appends a JSON snapshot of the registry to metrics.jsonl every interval
+    (rolled over at METRICS_MAX_BYTES) and, if http_port is set, serves
+    Prometheus text at http://127.0.0.1:<port>/metrics.
+    """
+    def __init__(self, cfg, stop_evt: threading.Event):
+        super().__init__(name="sloan-metrics", daemon=True)
+        m = cfg.get("metrics", {}) or {}
+        self.interval = float(m.get("file_interval_seconds", 60))
+        self.port = int(m.get("http_port", 0) or 0)
+        self.stop_evt = stop_evt
+        self._server = None
+
+    def _start_http(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404); return
+                body = REGISTRY.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        except OSError as ex:
+            _log.warning(f"Metrics endpoint not started on port {self.port}: {ex}")
+            return
+        threading.Thread(target=self._server.serve_forever, name="sloan-metrics-http", daemon=True).start()
+        _log.info(f"Metrics at http://127.0.0.1:{self.port}/metrics")
+
+    def _write_snapshot(self):
+        try:
+            if os.path.exists(METRICS_PATH) and os.path.getsize(METRICS_PATH) > METRICS_MAX_BYTES:
+                os.replace(METRICS_PATH, METRICS_PATH + ".1")
+            line = json.dumps({"ts": time.time(), "metrics": REGISTRY.snapshot()}, default=str)
+            with open(METRICS_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as ex:
+            _log.warning(f"Metrics snapshot failed: {ex}")
+
+    def run(self):
+        if self.port:
+            self._start_http()
+        while not self.stop_evt.wait(self.interval):
+            self._write_snapshot()
+        self._write_snapshot()
+        if self._server:
+            self._server.shutdown()
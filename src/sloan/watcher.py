@@ -1,6 +1,13 @@
 # src/sloan/watcher.py
 import os, time, threading
+from typing import Iterable, Mapping, Set
 from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .utils.metrics import QUEUE_DEPTH, REGISTRY, observe_stage
+from .utils.profiling import hot_path
+
+WATCH_EVENTS = REGISTRY.counter("sloan_watch_events_total", "Filesystem events seen by the watcher")
 
 # Common temp/incomplete patterns
 TEMP_EXT = {".crdownload", ".opdownload", ".part", ".tmp"}
@@ -19,6 +26,7 @@ def _looks_temp(path: str) -> bool:
         return True
     return any(name.startswith(pfx) for pfx in TEMP_PREFIXES)
 
+@hot_path("watch.is_file_stable")
 def _is_file_stable(path: str, quiet_seconds: float = 1.5, checks: int = 6, delay: float = 0.4) -> bool:
     """
     A file is 'stable' if:
@@ -69,6 +77,7 @@ class CreatedModifiedHandler(FileSystemEventHandler):
     def _schedule_check(self, path: str):
         if not path or not os.path.isfile(path):
             return
+        seen_at = time.monotonic()
 
         # Cancel any pending checker for this path
         ev = self._inflight.pop(path, None)
@@ -86,21 +95,27 @@ class CreatedModifiedHandler(FileSystemEventHandler):
                 return
             if _is_file_stable(path, quiet_seconds=self.quiet_seconds):
                 if not cancel.is_set() and self.on_file_ready:
+                    observe_stage("watch_ready", time.monotonic() - seen_at)
                     self.on_file_ready(path)
-            self._inflight.pop(path, None)
+            if self._inflight.get(path) is cancel:
+                self._inflight.pop(path, None)
+            QUEUE_DEPTH.set(len(self._inflight), queue="watch_checks")
 
+        QUEUE_DEPTH.set(len(self._inflight), queue="watch_checks")
         threading.Thread(target=worker, daemon=True).start()
 
     # New files or files moved into the folder
     def on_created(self, event):
         if event.is_directory:
             return
+        WATCH_EVENTS.inc(kind="created")
         self._schedule_check(event.src_path)
 
     # Downloads often end with a rename: *.crdownload -> final.ext
     def on_moved(self, event):
         if event.is_directory:
             return
+        WATCH_EVENTS.inc(kind="moved")
         # Final name is event.dest_path
         self._schedule_check(event.dest_path)
 
@@ -108,6 +123,57 @@ class CreatedModifiedHandler(FileSystemEventHandler):
     def on_modified(self, event):
         if event.is_directory:
             return
+        WATCH_EVENTS.inc(kind="modified")
         self._schedule_check(event.src_path)
 
 
+class FolderWatcher:
+    """
+    Owns the watchdog Observer and the debounced handler for the watch folder.
+    reconfigure() applies config changes to the running observer: a new folder
+    is scheduled before the old watch is dropped and the handler (with its
+    in-flight stability checks) is kept.
+    """
+    def __init__(self, cfg: Mapping, on_file_ready):
+        self.handler = CreatedModifiedHandler(on_file_ready, quiet_seconds=self._quiet(cfg))
+        self.observer = Observer()
+        self.folder = None
+        self._watch = None
+        self._folder_cfg = cfg.get("watch_folder")
+
+    @staticmethod
+    def _quiet(cfg: Mapping) -> float:
+        return float(cfg.get("watch", {}).get("quiet_seconds", 1.5))
+
+    def start(self):
+        self._schedule(self._folder_cfg)
+        self.observer.start()
+
+    def _schedule(self, folder: str):
+        folder = os.path.abspath(folder)
+        if folder == self.folder:
+            return
+        os.makedirs(folder, exist_ok=True)
+        new_watch = self.observer.schedule(self.handler, folder, recursive=False)
+        if self._watch is not None:
+            try: self.observer.unschedule(self._watch)
+            except Exception: pass
+        self._watch, self.folder = new_watch, folder
+
+    def recheck(self, paths: Iterable[str]):
+        """Files found without an event (the start-up scan) get the same temp filter and stability wait."""
+        for path in paths:
+            if not _looks_temp(path):
+                self.handler._schedule_check(path)
+
+    def reconfigure(self, cfg: Mapping, changed: Set[str]):
+        if "watch.quiet_seconds" in changed:
+            self.handler.quiet_seconds = self._quiet(cfg)
+        if "watch_folder" in changed and cfg.get("watch_folder"):
+            self._schedule(cfg.get("watch_folder"))
+
+    def stop(self, timeout: float = 2):
+        try:
+            self.observer.stop(); self.observer.join(timeout)
+        except Exception:
+            pass
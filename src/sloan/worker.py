@@ -0,0 +1,424 @@
+"""
+The tray app's worker process. It owns GraphClient, Organizer, the Jotform
+poller, the watch folder and the transform pool. The Qt process keeps the
+tray, the dialogs and the thumbnails, so slow HTTP, JSON parsing and file
+copies never compete with the UI for the GIL.
+
+The two processes talk over a multiprocessing Pipe in typed messages (the
+dataclasses below). Messages carry file paths and a few ids, never file
+contents: the worker reads the files itself. WorkerSupervisor runs in the Qt
+process. It starts the worker with the "spawn" context and reads its events
+on a background thread. If the worker dies, it is restarted with backoff;
+uploads that were in flight are reported back as failed, and uploads sent
+while it was down go out once it is ready again.
+"""
+import multiprocessing, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .utils.log import flush, get_logger, log_to
+
+WORKER_LOG = "worker.log"
+
+_log = get_logger("worker")
+
+
+# -------------------- GUI -> worker --------------------
+@dataclass
+class Upload:
+    """Upload a renamed file and move it into the customer folder (speculation `job` first, if any)."""
+    job: int
+    path: str
+    customer: str
+    keyword_acr: str
+    t_detected: float  # time.time() on both sides: monotonic clocks are per process on some platforms
+    t_accept: float
+
+
+@dataclass
+class Speculate:
+    job: int
+    path: str
+    customer: str
+
+
+@dataclass
+class Abandon:
+    job: int
+
+
+@dataclass
+class Reload:
+    """config.json changed; pick it up now rather than on the next poll."""
+
+
+@dataclass
+class Profile:
+    seconds: float
+
+
+@dataclass
+class Stop:
+    drain_seconds: float = 30.0
+
+
+# -------------------- worker -> GUI --------------------
+@dataclass
+class Ready:
+    pid: int
+    services_s: float
+
+
+@dataclass
+class FileReady:
+    path: str
+    t_detected: float
+
+
+@dataclass
+class UploadDone:
+    job: int
+    item: Optional[Dict] = None  # id/name/parentReference only
+    error: Optional[str] = None
+
+
+@dataclass
+class Status:
+    summary: List[str] = field(default_factory=list)
+    stages: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ProfileSaved:
+    path: str
+
+
+@dataclass
+class WorkerDown:
+    """Synthesised by the supervisor, not sent by the worker."""
+    exitcode: Optional[int]
+    restart_in: float
+
+
+# -------------------- worker process --------------------
+class WorkerService:
+    def __init__(self, conn, started_at: float):
+        from .config import current_config
+        self.conn = conn
+        self.cfg = current_config()
+        self.started_at = started_at
+        self.stop_evt = threading.Event()
+        self.jf_stop = threading.Event()
+        self._send_lock = threading.Lock()
+        self._specs = {}
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.baseline = set()
+        self.graph = self.organizer = self.jf_thread = self.watcher = self.transformer = None
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sloan-upload")
+
+    def send(self, msg):
+        try:
+            with self._send_lock:
+                self.conn.send(msg)
+        except (OSError, EOFError):
+            self.stop_evt.set()  # the GUI is gone
+
+    def start(self):
+        t0 = time.perf_counter()
+        from .config import get_store
+        from .services.graph_client import GraphClient
+        from .services.jotform_poller import JotformPoller
+        from .services.organizer import Organizer
+        from .services.transform import shared_transformer
+        from .utils.metrics import MetricsExporter
+        from .utils.profiling import SamplingProfiler, profile_from_env
+        from .watcher import FolderWatcher
+
+        env_profile = profile_from_env()
+        if env_profile:
+            # the GUI's Profile message would arrive before we are ready; the env var reaches us too
+            SamplingProfiler(env_profile[1], on_done=lambda path: self.send(ProfileSaved(path))).start()
+        watch = self.cfg.get("watch_folder")
+        missed = []
+        if watch and os.path.isdir(watch):
+            # files from before the app started are ignored; newer ones arrived while no worker was watching
+            for e in os.scandir(os.path.abspath(watch)):
+                if not e.is_file():
+                    continue
+                if e.stat().st_mtime < self.started_at:
+                    self.baseline.add(e.path)
+                else:
+                    missed.append(e.path)
+        self.graph = GraphClient(self.cfg)
+        self.organizer = Organizer(self.cfg, self.graph)
+        self.transformer = shared_transformer(self.cfg)
+        MetricsExporter(self.cfg, self.stop_evt).start()
+        self.jf_thread = JotformPoller(self.cfg, self.graph, self.jf_stop, log_fn=get_logger("jotform"))
+        self.jf_thread.start()
+        self.watcher = FolderWatcher(self.cfg, self.on_file_ready)
+        self.watcher.start()
+        get_store().subscribe(self._apply_config)
+        services_s = time.perf_counter() - t0
+        _log.info(f"Worker ready. Watching: {watch}", pid=os.getpid(), services_ms=round(services_s * 1000, 1))
+        self.send(Ready(os.getpid(), services_s))
+        # a download or save may still be in progress; the GUI skips the files it has already handled
+        self.watcher.recheck(missed)
+        threading.Thread(target=self._status_loop, name="sloan-status", daemon=True).start()
+
+    def _apply_config(self, cfg, changed):
+        self.cfg = cfg
+        _log.info(f"Config v{cfg.version} changed", changed=sorted(changed))
+        for comp in (self.watcher, self.graph, self.organizer, self.jf_thread, self.transformer):
+            if comp is None:
+                continue
+            try:
+                comp.reconfigure(cfg, changed)
+            except Exception as ex:
+                _log.exception(f"Reconfigure failed for {type(comp).__name__}: {ex}")
+
+    def on_file_ready(self, path: str):
+        path = os.path.abspath(path)
+        if path in self.baseline and not self.cfg.get("watch", {}).get("process_existing_on_start", False):
+            return
+        self.send(FileReady(path, time.time()))
+
+    def _status_loop(self):
+        from .config import current_config
+        while not self.stop_evt.wait(5):
+            current_config()  # pick up hand edits to config.json (one stat() per tick)
+            self.send(self.status())
+
+    def status(self) -> Status:
+        from .utils.httpcache import cache_stats
+        from .utils.metrics import STAGE_SECONDS, format_summary
+        summary = [format_summary("sync", "Files"), format_summary("jf_submission", "Jotform")]
+        c = cache_stats()
+        if c["hit"] or c["miss"]:
+            summary.append(f"HTTP cache: {int(c['hit'])} hits / {int(c['miss'])} misses ({c['hit_ratio']:.0%})")
+        leases = self.jf_thread.leases if self.jf_thread is not None else None
+        if leases is not None and leases.enabled:
+            held = leases.held()
+            summary.append(f"Jotform leases: {', '.join(held)}" if held else "Jotform: standby (another PC holds the forms)")
+        stages = [format_summary(l["stage"], l["stage"])
+                  for l in sorted(STAGE_SECONDS.label_sets(), key=lambda l: l.get("stage", ""))
+                  if set(l) == {"stage"}]
+        return Status(summary, stages)
+
+    # -------------------- commands --------------------
+    def handle(self, msg):
+        if isinstance(msg, Upload):
+            with self._pending_lock:
+                self._pending += 1
+            self.pool.submit(self._upload, msg, self._specs.pop(msg.job, None))
+        elif isinstance(msg, Speculate):
+            from .services.speculation import Speculation
+            if Speculation.enabled(self.cfg):
+                spec = Speculation(self.cfg, self.graph, self.organizer, self.transformer)
+                spec.start(msg.path, msg.customer)
+                self._specs[msg.job] = spec
+        elif isinstance(msg, Abandon):
+            spec = self._specs.pop(msg.job, None)
+            if spec is not None:
+                spec.abandon()
+        elif isinstance(msg, Reload):
+            from .config import current_config
+            current_config()
+        elif isinstance(msg, Profile):
+            from .utils.profiling import SamplingProfiler
+            SamplingProfiler(msg.seconds, on_done=lambda path: self.send(ProfileSaved(path))).start()
+
+    def _upload(self, msg: Upload, spec):
+        from .utils.metrics import ITEMS, observe_stage
+        try:
+            # the upload usually finished while the dialog was open: one move and we're done
+            moved = spec.commit(msg.path, msg.customer, msg.keyword_acr) if spec is not None else None
+            if moved is None:
+                dl = self.cfg.get("organizer", {}).get("downloads_folder_path", "/Downloads")
+                src = self.transformer.process(msg.path, msg.keyword_acr)
+                try:
+                    up = self.graph.upload_small(f"{dl}/{os.path.basename(msg.path)}", src,
+                                                 priority="interactive")  # someone is waiting on this one
+                finally:
+                    self.transformer.cleanup(msg.path, src)
+                moved = self.organizer.move_uploaded_to_customer(up, msg.customer, msg.keyword_acr) or up
+        except Exception as ex:
+            _log.exception(f"Upload failed for {msg.path}: {ex}")
+            ITEMS.inc(stage="pipeline", outcome="error")
+            self.send(UploadDone(msg.job, error=str(ex)))
+            return
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+        done = time.time()
+        observe_stage("sync", done - msg.t_accept)          # accept -> file in customer folder
+        observe_stage("pipeline", done - msg.t_detected)    # detected -> file in customer folder
+        ITEMS.inc(stage="pipeline", outcome="ok")
+        item = {k: moved.get(k) for k in ("id", "name", "parentReference")}
+        self.send(UploadDone(msg.job, item=item))
+
+    def run(self) -> int:
+        try:
+            self.start()
+        except Exception as ex:
+            _log.exception(f"Worker start-up failed: {ex}")
+            return 1
+        drain = 0.0
+        while not self.stop_evt.is_set():
+            try:
+                msg = self.conn.recv()
+            except (OSError, EOFError):
+                break  # the GUI exited without saying goodbye
+            if isinstance(msg, Stop):
+                drain = msg.drain_seconds
+                break
+            try:
+                self.handle(msg)
+            except Exception as ex:
+                _log.exception(f"Worker failed to handle {type(msg).__name__}: {ex}")
+        self.shutdown(drain)
+        return 0
+
+    def shutdown(self, drain_seconds: float):
+        self.stop_evt.set()
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.jf_stop.set()
+        if self.jf_thread is not None and self.jf_thread.is_alive():
+            self.jf_thread.wake()
+        for spec in self._specs.values():
+            spec.abandon()
+        # in-flight uploads finish within the drain budget
+        deadline = time.monotonic() + drain_seconds
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if self._pending:
+            _log.warning(f"Drain timed out with {self._pending} uploads in flight")
+        self.pool.shutdown(wait=False)
+        if self.transformer is not None:
+            self.transformer.shutdown()
+        if self.jf_thread is not None:
+            self.jf_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        _log.info("Worker stopped")
+        flush()
+
+
+def worker_main(conn, started_at: float):
+    """Entry point of the spawned process."""
+    log_to(WORKER_LOG)  # the GUI process keeps sloan.log and rotates it
+    raise SystemExit(WorkerService(conn, started_at).run())
+
+
+# -------------------- GUI side --------------------
+class WorkerSupervisor(threading.Thread):
+    """
+    Starts the worker process, forwards its events to on_event (from this
+    thread) and restarts it when it dies. Backoff doubles from 1 s up to
+    max_backoff and resets once a worker has stayed up for a minute.
+    """
+    def __init__(self, on_event: Callable[[object], None], started_at: float, max_backoff: float = 30.0):
+        super().__init__(name="sloan-supervisor", daemon=True)
+        self.on_event = on_event
+        self.started_at = started_at
+        self.max_backoff = max_backoff
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._proc = None
+        self._ready = False
+        self._backlog: List[Upload] = []          # uploads sent while the worker was down
+        self._inflight: Dict[int, Upload] = {}    # uploads the worker has not answered yet
+        self._stopping = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def send(self, msg) -> bool:
+        """Deliver msg to the worker. Uploads wait for the next worker if it is down; anything else is dropped."""
+        with self._lock:
+            if isinstance(msg, Upload):
+                self._inflight[msg.job] = msg
+            if self._ready:
+                try:
+                    self._conn.send(msg)
+                    return True
+                except (OSError, EOFError):
+                    pass  # the reader notices the broken pipe and restarts the worker
+            if isinstance(msg, Upload):
+                self._inflight.pop(msg.job, None)
+                self._backlog.append(msg)
+            return False
+
+    def _spawn(self):
+        ours, theirs = self._ctx.Pipe(duplex=True)
+        proc = self._ctx.Process(target=worker_main, args=(theirs, self.started_at), name="sloan-worker", daemon=True)
+        proc.start()
+        theirs.close()  # so recv() on ours raises EOFError once the worker is gone
+        with self._lock:
+            self._conn, self._proc, self._ready = ours, proc, False
+        _log.info("Worker started", pid=proc.pid, restarts=self.restarts)
+        return ours, proc
+
+    def _on_ready(self):
+        with self._lock:
+            self._ready = True
+            backlog, self._backlog = self._backlog, []
+            for msg in backlog:
+                self._inflight[msg.job] = msg
+                self._conn.send(msg)
+
+    def run(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            conn, proc = self._spawn()
+            t_up = time.monotonic()
+            while True:
+                try:
+                    ev = conn.recv()
+                except (OSError, EOFError):
+                    break
+                if isinstance(ev, Ready):
+                    self._on_ready()
+                elif isinstance(ev, UploadDone):
+                    with self._lock:
+                        self._inflight.pop(ev.job, None)
+                self.on_event(ev)
+            with self._lock:
+                self._ready = False
+                lost, self._inflight = list(self._inflight.values()), {}
+            proc.join(5)
+            conn.close()
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - t_up > 60:
+                backoff = 1.0
+            _log.warning("Worker exited; restarting", exitcode=proc.exitcode, restart_in=backoff,
+                         lost_uploads=len(lost))
+            for msg in lost:
+                self.on_event(UploadDone(msg.job, error="The background worker stopped during the upload; "
+                                                        f"the file is still at {msg.path}"))
+            self.on_event(WorkerDown(proc.exitcode, backoff))
+            if self._stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, self.max_backoff)
+            self.restarts += 1
+
+    def stop(self, drain_seconds: float = 30.0):
+        """Ask the worker to finish in-flight uploads and exit; kill it if it doesn't."""
+        self._stopping.set()
+        with self._lock:
+            conn, proc = self._conn, self._proc
+        if proc is None:
+            return
+        try:
+            conn.send(Stop(drain_seconds))
+        except (OSError, EOFError):
+            pass
+        proc.join(drain_seconds + 5)
+        if proc.is_alive():
+            _log.warning("Worker did not exit; terminating", pid=proc.pid)
+            proc.terminate()
+            proc.join(5)
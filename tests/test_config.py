@@ -0,0 +1,40 @@
+import json, os, threading
+
+from sloan.config import ConfigStore
+
+
+def _hand_edit(store, **jotform):
+    with open(store.path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    cfg["jotform"].update(jotform)
+    with open(store.path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, indent=1)  # a different size, so the stat stamp moves
+    st = os.stat(store.path)
+    os.utime(store.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_update_publishes_a_hand_edit_outside_the_lock(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    store.snapshot()
+    _hand_edit(store, poll_seconds=61)
+    seen = []
+
+    def listener(snap, changed):
+        # another thread touching the store must not block on a lock held by our caller
+        t = threading.Thread(target=store.update, args=(lambda cfg: None,))
+        t.start()
+        t.join(2)
+        seen.append((sorted(changed), not t.is_alive()))
+    store.subscribe(listener)
+
+    snap = store.update(lambda cfg: cfg["jotform"].update(poll_seconds=62))
+    assert snap["jotform"]["poll_seconds"] == 62
+    assert seen == [(["jotform.poll_seconds"], True), (["jotform.poll_seconds"], True)]
+
+
+def test_update_keeps_a_concurrent_hand_edit(tmp_path):
+    store = ConfigStore(str(tmp_path / "config.json"))
+    store.snapshot()
+    _hand_edit(store, api_key="edited")
+    snap = store.update(lambda cfg: cfg["jotform"].update(poll_seconds=62))
+    assert (snap["jotform"]["api_key"], snap["jotform"]["poll_seconds"]) == ("edited", 62)
@@ -0,0 +1,15 @@
+import os, subprocess, sys
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+
+def test_gui_import_leaves_graph_to_the_worker(tmp_path):
+    # the tray starts on sloan.app alone; requests/msal load in the worker process
+    code = ("import sys, sloan.app; "
+            "print(' '.join(m for m in ('requests', 'msal', 'sloan.services.graph_client') if m in sys.modules))")
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env = dict(os.environ, HOME=str(tmp_path), USERPROFILE=str(tmp_path), PYTHONPATH=src)
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
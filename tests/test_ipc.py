@@ -0,0 +1,57 @@
+import os, sys, threading
+
+import pytest
+
+from sloan import ipc
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="uses a unix socket path under tmp_path")
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ipc, "APP_DIR", str(tmp_path))
+    monkeypatch.setattr(ipc, "KEY_PATH", str(tmp_path / "instance.key"))
+    monkeypatch.setattr(ipc, "_address", lambda: str(tmp_path / "instance.sock"))
+    return tmp_path
+
+
+def test_concurrent_first_runs_agree_on_the_key(app_dir):
+    keys, start = [], threading.Barrier(8)
+
+    def launch():
+        start.wait()
+        keys.append(ipc._authkey())
+    threads = [threading.Thread(target=launch) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(keys) == 8 and len(set(keys)) == 1
+    assert (app_dir / "instance.key").read_bytes() == keys[0]
+
+
+def test_short_key_is_replaced(app_dir, monkeypatch):
+    (app_dir / "instance.key").write_bytes(b"half")
+    monkeypatch.setattr(ipc, "KEY_WAIT", 0.1)
+    assert len(ipc._authkey()) == 32
+
+
+def test_forward_reaches_the_server(app_dir):
+    got = []
+    server = ipc.InstanceServer(got.append)
+    server.start()
+    try:
+        assert ipc.forward(["a.jpg"], timeout=2)
+    finally:
+        server.stop()
+    assert got == [[os.path.abspath("a.jpg")]]
+
+
+def test_forward_with_the_wrong_key_gives_up(app_dir):
+    server = ipc.InstanceServer(lambda paths: None)
+    server.start()
+    try:
+        (app_dir / "instance.key").write_bytes(os.urandom(32))  # replaced under the running primary
+        assert ipc.forward(["a.jpg"], timeout=0.5) is False
+    finally:
+        server.stop()
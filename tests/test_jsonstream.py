@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from sloan.utils.jsonstream import JsonArrayStream
+
+PAGE = {"responseCode": 200, "content": [{"id": "1", "name": "Zoë Ång"}, {"id": "2", "n": 12345},
+                                         {"id": "3", "tags": ["a", {"b": [1, 2]}]}],
+        "resultSet": {"offset": 0, "limit": 20, "count": 3}}
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 1 << 20])
+def test_items_and_meta_whatever_the_chunking(size):
+    # 1-byte chunks split the UTF-8 sequences and the number 12345
+    data = json.dumps(PAGE, ensure_ascii=False, indent=1).encode("utf-8")
+    page = JsonArrayStream(_chunks(data, size), "content")
+    assert list(page) == PAGE["content"]
+    assert page.count == 3
+    assert page.meta == {"responseCode": 200, "resultSet": PAGE["resultSet"]}
+
+
+def test_items_come_before_the_body_is_read():
+    reads = []
+
+    def chunks():
+        for c in _chunks(b'{"content": [{"id": 1}, {"id": 2}], "more": true}', 4):
+            reads.append(c)
+            yield c
+
+    items = iter(JsonArrayStream(chunks(), "content"))
+    assert next(items) == {"id": 1}
+    assert b'"more"' not in b"".join(reads)
+
+
+@pytest.mark.parametrize("text, meta", [
+    ('{}', {}),
+    ('{"content": []}', {}),
+    ('{"content": [], "x": null}', {"x": None}),
+    ('{"content": 5}', {"content": 5}),
+])
+def test_no_items(text, meta):
+    page = JsonArrayStream([text.encode()], "content")
+    assert list(page) == []
+    assert page.count == 0
+    assert page.meta == meta
+
+
+def test_cut_off_stream_raises_after_the_complete_items():
+    page = JsonArrayStream([b'{"content": [{"id": 1}, {"id": 2}, {"id"'], "content")
+    got = []
+    with pytest.raises(ValueError):
+        for item in page:
+            got.append(item)
+    assert got == [{"id": 1}, {"id": 2}]
+    assert page.count == 2
+
+
+def test_malformed_separator():
+    with pytest.raises(ValueError):
+        list(JsonArrayStream([b'{"content": [1 2]}'], "content"))
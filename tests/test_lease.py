@@ -0,0 +1,107 @@
+import json, os, threading, time
+
+import pytest
+
+from sloan.services import lease
+from sloan.services.lease import FileLeaseStore, LeaseManager
+
+
+def _cfg(folder, ttl=90):
+    return {"coordination": {"enabled": True, "backend": "file", "file_folder": str(folder), "ttl_seconds": ttl}}
+
+
+def _doc(folder, key):
+    with open(os.path.join(folder, f"jotform-{key}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def short_ttl(monkeypatch):
+    """ttl 0.6 s, of which the holder gives up the last 0.1 s."""
+    monkeypatch.setattr(lease, "MARGIN", 0.1)
+
+    def make(folder, name):
+        m = LeaseManager(_cfg(folder), instance_id=name, stop_evt=threading.Event())
+        m.ttl = 0.6
+        return m
+    yield make
+
+
+def test_one_of_two_contenders_wins(tmp_path):
+    a = LeaseManager(_cfg(tmp_path), instance_id="a")
+    b = LeaseManager(_cfg(tmp_path), instance_id="b")
+    got = {}
+    threads = [threading.Thread(target=lambda m=m: got.__setitem__(m.instance_id, m.claim(["F"]))) for m in (a, b)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got.values()) == [[], ["F"]]
+    winner = "a" if got["a"] else "b"
+    assert _doc(tmp_path, "F")["holder"] == winner
+
+
+def test_seed_cursor_and_advance(tmp_path):
+    a = LeaseManager(_cfg(tmp_path), instance_id="a")
+    assert a.claim(["F"], {"F": "100"}) == ["F"]
+    assert a.cursor("F") == "100"
+    assert a.advance("F", "105")
+    assert _doc(tmp_path, "F")["cursor"] == "105"
+
+
+def test_takeover_after_ttl(tmp_path, short_ttl):
+    a, b = short_ttl(tmp_path, "a"), short_ttl(tmp_path, "b")
+    assert a.claim(["F"], {"F": "7"}) == ["F"]
+    assert b.claim(["F"]) == []            # first sighting of a's version
+    time.sleep(0.4)
+    assert b.claim(["F"]) == []            # a renewed (every ttl/3) in the meantime
+    a.stop_evt.set()                       # a hangs: no more renewals
+    time.sleep(0.7)
+    assert not a.holds("F")                # a gives up first...
+    b.claim(["F"])                         # ...b sees the last version...
+    time.sleep(0.7)
+    assert b.claim(["F"]) == ["F"]         # ...and takes over once it stayed put for the ttl
+    assert b.cursor("F") == "7"
+    assert not a.advance("F", "8")         # a's late write loses
+    assert _doc(tmp_path, "F")["holder"] == "b"
+
+
+def test_renew_racing_advance(tmp_path):
+    class SlowStore(FileLeaseStore):
+        def write(self, name, doc, token):
+            time.sleep(0.5)
+            return super().write(name, doc, token)
+
+    a = LeaseManager(_cfg(tmp_path), instance_id="a")
+    assert a.claim(["F"]) == ["F"]
+    a.store = SlowStore(str(tmp_path))
+    renewal = threading.Thread(target=a._update, args=("F",))
+    renewal.start()
+    time.sleep(0.1)                        # renewal's write is in flight
+    assert a.advance("F", "42")
+    renewal.join()
+    assert a.holds("F")
+    doc = _doc(tmp_path, "F")
+    assert (doc["holder"], doc["cursor"]) == ("a", "42")
+
+
+def test_release_hands_over_at_once(tmp_path):
+    a = LeaseManager(_cfg(tmp_path), instance_id="a")
+    b = LeaseManager(_cfg(tmp_path), instance_id="b")
+    assert a.claim(["F"], {"F": "3"}) == ["F"]
+    assert a.advance("F", "9")
+    a.release_all()
+    assert not a.holds("F")
+    assert _doc(tmp_path, "F")["holder"] == ""
+    assert b.claim(["F"]) == ["F"]         # no ttl wait after a release
+    assert b.cursor("F") == "9"
+
+
+def test_file_store_compare_and_swap(tmp_path):
+    store = FileLeaseStore(str(tmp_path))
+    assert store.read("x") == (None, None)
+    tok = store.write("x", {"version": "v1"}, None)
+    assert tok == "v1"
+    assert store.write("x", {"version": "v2"}, None) is None     # create-only on an existing lease
+    assert store.write("x", {"version": "v2"}, "stale") is None
+    assert store.write("x", {"version": "v2"}, tok) == "v2"